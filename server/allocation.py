@@ -0,0 +1,174 @@
+import bisect
+import itertools
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_MAX_WEIGHT = 0.25     # Largest share of the budget one stock may take
+DEFAULT_NODE_LIMIT = 100_000  # Search nodes before the best allocation so far is returned
+DEFAULT_GAP = 1e-4            # Relative distance from the optimum that counts as solved
+
+
+class Allocation:
+    """Integer share quantities chosen for a list of candidates"""
+
+    def __init__(self, quantities: np.ndarray, prices: np.ndarray, objective: float, nodes: int, optimal: bool):
+        self.quantities = quantities
+        self.amounts = quantities * prices
+        self.invested = float(self.amounts.sum())
+        self.objective = objective
+        self.nodes = nodes
+        self.optimal = optimal
+
+    def __repr__(self):
+        return (f"Allocation(stocks={int((self.quantities > 0).sum())}, invested={self.invested:.2f}, "
+                f"objective={self.objective:.4f}, nodes={self.nodes}, optimal={self.optimal})")
+
+
+def rank_weights(ranks: Sequence[float], max_rank: float) -> np.ndarray:
+    """Value of one rupee invested in a stock: 1 for rank 1, falling linearly to 1/max_rank"""
+    return (max_rank + 1 - np.asarray(ranks, dtype=float)) / max_rank
+
+
+def allocate(prices: Sequence[float], weights: Sequence[float], budget: float, max_stocks: int,
+             max_weight: Optional[float] = DEFAULT_MAX_WEIGHT,
+             node_limit: int = DEFAULT_NODE_LIMIT, gap: float = DEFAULT_GAP) -> Allocation:
+    """Choose share quantities maximizing sum(weight * price * quantity).
+
+    Subject to: total cost <= budget, at most `max_stocks` stocks with a
+    non-zero quantity, and each stock's cost <= max_weight * budget (a single
+    share is always allowed, so small budgets still get their top stocks).
+
+    Depth-first branch-and-bound over the candidates in decreasing weight
+    order. Each node is bounded by the smaller of two relaxations of the
+    remaining candidates: the fractional knapsack ignoring the stock count,
+    and the best `slots` candidates each valued as if it got the whole
+    remaining budget. That is tight enough that ~30 candidates solve in a
+    few milliseconds. The greedy fill is the starting incumbent;
+    branches that cannot beat it by more than `gap` (relative) are pruned, as
+    in a MIP solver's optimality gap; without it, candidates with equal
+    weights make the search chase the last few rupees of leftover through
+    every permutation. If `node_limit` is reached the best allocation found
+    so far is returned with optimal=False, which keeps hundreds of
+    candidates tractable.
+    """
+    prices = np.asarray(prices, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    n = len(prices)
+    quantities = np.zeros(n, dtype=np.int64)
+    if n == 0 or budget <= 0 or max_stocks <= 0:
+        return Allocation(quantities, prices, 0.0, 0, True)
+
+    cap = budget if max_weight is None else max_weight * budget
+    buyable = (prices > 0) & (prices <= budget) & (weights > 0)
+    order = [i for i in np.argsort(-weights, kind='stable') if buyable[i]]
+
+    # Per candidate, in search order: price, value per share, max shares
+    price = [float(prices[i]) for i in order]
+    value = [float(weights[i] * prices[i]) for i in order]
+    density = [float(weights[i]) for i in order]
+    limit = [max(1, math.floor(cap / p)) for p in price]
+    limit = [min(q, math.floor(budget / p)) for q, p in zip(limit, price)]
+    m = len(order)
+
+    def affordable(j: int, remaining: float) -> int:
+        q = min(limit[j], int(remaining // price[j]))
+        while q > 0 and q * price[j] > remaining:
+            q -= 1
+        return q
+
+    # Prefix sums of each candidate's capped cost and value, for an O(log n) budget_bound
+    capped = [q * p for q, p in zip(limit, price)]
+    cost_prefix = list(itertools.accumulate(capped, initial=0.0))
+    value_prefix = list(itertools.accumulate((d * c for d, c in zip(density, capped)), initial=0.0))
+
+    def budget_bound(start: int, remaining: float) -> float:
+        """Fractional knapsack of candidates start.. ignoring the stock count"""
+        if remaining <= 0:
+            return 0.0
+        target = cost_prefix[start] + remaining
+        full = bisect.bisect_right(cost_prefix, target, lo=start) - 1  # candidates start..full-1 fit whole
+        total = value_prefix[full] - value_prefix[start]
+        if full < m:
+            total += density[full] * (target - cost_prefix[full])
+        return total
+
+    density_array = np.array(density)
+    capped_array = np.array(capped)
+
+    def slots_bound(start: int, remaining: float, slots: int) -> float:
+        """Best `slots` candidates start.., each as if it alone got the remaining budget"""
+        if slots <= 0:
+            return 0.0
+        values = density_array[start:] * np.minimum(capped_array[start:], remaining)
+        if slots < len(values):
+            values = np.partition(values, len(values) - slots)[len(values) - slots:]
+        return float(values.sum())
+
+    # Greedy incumbent: fill the best candidates in order
+    chosen = [0] * m
+    best_value, remaining, slots = 0.0, float(budget), max_stocks
+    for j in range(m):
+        if slots == 0:
+            break
+        q = affordable(j, remaining)
+        if q > 0:
+            chosen[j] = q
+            best_value += q * value[j]
+            remaining -= q * price[j]
+            slots -= 1
+    best = list(chosen)
+
+    current = [0] * m
+    nodes = 0
+    exhausted = True
+    epsilon = 1e-9 * max(1.0, budget)
+    # Bound a branch must exceed to be explored
+    threshold = best_value * (1 + gap) + epsilon
+
+    def search(j: int, value_so_far: float, remaining: float, slots: int):
+        nonlocal best_value, best, threshold, nodes, exhausted
+        nodes += 1
+        if nodes > node_limit:
+            exhausted = False
+            return
+        if value_so_far > best_value + epsilon:
+            best_value, best = value_so_far, list(current)
+            threshold = best_value * (1 + gap) + epsilon
+        if j == m or slots == 0 or remaining <= 0:
+            return
+        if (value_so_far + budget_bound(j, remaining) <= threshold or
+                value_so_far + slots_bound(j, remaining, slots) <= threshold):
+            return
+
+        # Most shares first. budget_bound can only shrink as q decreases, so once
+        # it prunes a q every smaller q is pruned too; slots_bound prunes one q at a time.
+        q = affordable(j, remaining)
+        while q > 0:
+            cost = q * price[j]
+            gain = q * value[j]
+            if value_so_far + gain + budget_bound(j + 1, remaining - cost) <= threshold:
+                break
+            if value_so_far + gain + slots_bound(j + 1, remaining - cost, slots - 1) > threshold:
+                current[j] = q
+                search(j + 1, value_so_far + gain, remaining - cost, slots - 1)
+                current[j] = 0
+                if not exhausted:
+                    return
+            q -= 1
+        search(j + 1, value_so_far, remaining, slots)
+
+    search(0, 0.0, float(budget), max_stocks)
+
+    for j, q in enumerate(best):
+        quantities[order[j]] = q
+    return Allocation(quantities, prices, best_value, nodes, exhausted)
+
+
+def allocate_candidates(candidates: List[dict], budget: float, max_stocks: int, max_rank: float,
+                        max_weight: Optional[float] = DEFAULT_MAX_WEIGHT) -> Allocation:
+    """allocate() over stock dicts carrying 'price' and 'rank'"""
+    prices = [stock['price'] for stock in candidates]
+    weights = rank_weights([stock['rank'] for stock in candidates], max_rank)
+    return allocate(prices, weights, budget, max_stocks, max_weight)
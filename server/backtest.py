@@ -0,0 +1,351 @@
+"""Vectorized backtests of the generated baskets over the local price history.
+
+A Market holds what every backtest needs, computed once:
+
+- closes: a (days x symbols) matrix of forward-filled closes;
+- ranks: per snapshot day (every rebalance day of the requested
+  schedules), each theme's ranks, scored from the fundamentals known
+  on that day with the same rules and tie-breaking as the pipeline.
+
+A run replays generate_baskets() on each rebalance day of one schedule and
+collects the holdings. NAV, drawdown, turnover and Sharpe ratio are then
+array operations over every (holding, day) pair and the (baskets x days)
+NAV matrix; nothing loops over days.
+
+Theme membership is taken from today's theme files, so delisted stocks
+that left a theme are missing from the past (survivorship bias).
+"""
+import contextlib
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import basket_generator
+import batch_scoring
+import price_history
+from scoring_rules import load_rules, DEFAULT_RULES_FILE
+from stock_universe import SymbolTable, Universe
+
+TRADING_DAYS = 252
+
+# Rebalance on the first trading day of each period; the key maps a day ordinal to its period
+SCHEDULES = {
+    'weekly': lambda days: (days - 1) // 7,  # Ordinal 1 is a Monday
+    'monthly': lambda days: _months(days),
+    'quarterly': lambda days: _months(days) // 3,
+    'yearly': lambda days: _months(days) // 12,
+}
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def _months(days):
+    return (np.asarray(days, dtype=np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def rebalance_days(days: np.ndarray, schedule: str) -> np.ndarray:
+    """Indices into `days` of the first trading day of each period of a schedule"""
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown schedule {schedule!r}; expected one of {'/'.join(SCHEDULES)}")
+    periods = SCHEDULES[schedule](days)
+    starts = np.ones(len(days), dtype=bool)
+    starts[1:] = periods[1:] != periods[:-1]
+    return np.flatnonzero(starts)
+
+
+def forward_fill(matrix: np.ndarray, at: Optional[np.ndarray] = None) -> np.ndarray:
+    """Carry each column's last value down over NaN rows; only rows `at` if given"""
+    rows = np.where(~np.isnan(matrix), np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    if at is not None:
+        rows = rows[at]
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def _numeric_rule_columns(rules) -> List[str]:
+    """Input columns of every binned (numeric) metric, over all theme profiles"""
+    profiles = [rules.profile()] + [rules.profile(theme) for theme in rules.theme_overrides]
+    columns = [column for profile in profiles for metric in profile.metrics
+               if not hasattr(metric, 'categories') for column in metric.columns]
+    return list(dict.fromkeys(columns))
+
+
+class Market:
+    """Prices and per-snapshot theme ranks shared by every backtest run"""
+
+    def __init__(self, theme_columns: Dict[str, dict], schedules=('monthly',), start=None, end=None,
+                 root: str = price_history.DEFAULT_HISTORY_DIR, rules=None):
+        rules = rules or load_rules(DEFAULT_RULES_FILE)
+        self.themes = list(theme_columns)
+        self.symbols = SymbolTable()
+        self.names = SymbolTable()
+        row_theme, row_symbol, row_name = [], [], []
+        for theme_id, columns in enumerate(theme_columns.values()):
+            row_theme.append(np.full(len(columns['symbol']), theme_id, dtype=np.int32))
+            row_symbol.append(self.symbols.intern_all(columns['symbol']))
+            row_name.append(self.names.intern_all(columns['name']))
+        # One row per (theme, stock), rows of a theme contiguous, as in a Universe
+        self.row_theme = np.concatenate(row_theme)
+        self.row_symbol = np.concatenate(row_symbol)
+        self.row_name = np.concatenate(row_name)
+
+        store = price_history.PriceHistory(root)
+        end = price_history.as_day(end or datetime.date.today())
+        start = price_history.as_day(start) if start is not None else min(
+            (datetime.date(part['year'], 1, 1).toordinal() for part in store.parts), default=end)
+        self.days, fields = store.read(self.symbols.values, start, end, ['Close'])
+        if len(self.days) == 0:
+            raise ValueError(f"{root}: no closes for these symbols between the given days")
+        self.closes = forward_fill(fields['Close'])
+
+        self.schedules = {schedule: rebalance_days(self.days, schedule) for schedule in schedules}
+        self.snapshots = np.unique(np.concatenate(list(self.schedules.values()) or [np.empty(0, dtype=np.int64)]))
+        self.ranks = self._rank_snapshots(store, rules)
+
+    def _rank_snapshots(self, store, rules) -> np.ndarray:
+        """(snapshots x rows) ranks within each theme; NaN where a stock had no price yet"""
+        scoring = batch_scoring.load_scoring()
+        snapshot_count, row_count = len(self.snapshots), len(self.row_theme)
+        prices = self.closes[self.snapshots][:, self.row_symbol]
+        listed = np.isfinite(prices) & (prices > 0)
+        snapshot_of, row_of = np.nonzero(listed)
+
+        frame = pd.DataFrame({
+            'Theme': np.array(self.themes, dtype=object)[self.row_theme[row_of]],
+            'Current Price': prices[snapshot_of, row_of],
+            # Rank within each (snapshot, theme)
+            'Group': snapshot_of * len(self.themes) + self.row_theme[row_of],
+        })
+        for column in _numeric_rule_columns(rules):
+            if column == 'Current Price':
+                continue
+            if column in store.fields:
+                # Values known on each snapshot day: the last one stored on or before it
+                _, values = store.read(self.symbols.values, self.days[0], self.days[-1], [column])
+                known = forward_fill(values[column], self.snapshots)
+                frame[column] = known[:, self.row_symbol][snapshot_of, row_of]
+            else:
+                frame[column] = np.nan
+        for metric in rules.profile().metrics:
+            for column in metric.columns:
+                if column not in frame.columns:
+                    frame[column] = np.nan  # Text columns (recommendations, sentiment) are not stored
+
+        _, totals = rules.score(frame)
+        frame['Total Score'] = totals
+        ranked = scoring.rank_stock_data(frame, by='Group')
+
+        ranks = np.full((snapshot_count, row_count), np.nan)
+        ranks[snapshot_of, row_of] = ranked['Rank'].to_numpy()
+        return ranks
+
+    def universe(self, snapshot: int) -> Universe:
+        """The ranked universe generate_baskets() would have seen on a snapshot day"""
+        ranks = self.ranks[snapshot]
+        rows = np.flatnonzero(np.isfinite(ranks))
+        prices = self.closes[self.snapshots[snapshot], self.row_symbol[rows]]
+        arrays = {
+            'theme_id': self.row_theme[rows],
+            'symbol_id': self.row_symbol[rows],
+            'name_id': self.row_name[rows],
+            'price': prices,
+            'rank': ranks[rows],
+            'low': np.zeros(len(rows)),
+            'high': np.zeros(len(rows)),
+        }
+        return Universe(self.themes, arrays, self.symbols, self.names, [True] * len(self.themes),
+                        basket_generator.MAX_RANK, as_of=int(self.days[self.snapshots[snapshot]]))
+
+
+class BacktestResult:
+    """NAV, drawdown and turnover of every basket of one backtest run"""
+
+    def __init__(self, config: dict, baskets: List[str], days: np.ndarray, nav: np.ndarray,
+                 rebalances: np.ndarray, turnover: np.ndarray):
+        self.config = config
+        self.baskets = baskets
+        self.days = days
+        self.nav = nav
+        self.rebalances = rebalances
+        self.turnover = turnover
+        self.drawdown = nav / np.maximum.accumulate(nav, axis=1) - 1.0
+
+    def summary(self, risk_free: float = 0.0) -> Dict[str, dict]:
+        """Per basket: total return, CAGR, volatility, Sharpe, max drawdown and turnover"""
+        returns = self.nav[:, 1:] / self.nav[:, :-1] - 1.0
+        excess = returns - risk_free / TRADING_DAYS
+        volatility = returns.std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS) if returns.shape[1] > 1 else np.zeros(len(self.nav))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(volatility > 0, excess.mean(axis=1) * TRADING_DAYS / volatility, np.nan)
+        years = max((self.days[-1] - self.days[0]) / 365.25, 1e-9) if len(self.days) else 1e-9
+        summary = {}
+        for i, basket in enumerate(self.baskets):
+            summary[basket] = {
+                'total_return': float(self.nav[i, -1] - 1.0),
+                'cagr': float(self.nav[i, -1] ** (1 / years) - 1.0),
+                'volatility': float(volatility[i]),
+                'sharpe': float(sharpe[i]),
+                'max_drawdown': float(self.drawdown[i].min()),
+                'turnover_per_year': float(self.turnover[i].sum() / years),
+            }
+        return summary
+
+
+def _basket_holdings(market: Market, schedule: str, income: float, risk: str, mode: str):
+    """Replay basket generation on each rebalance day.
+
+    Returns (names, holdings, cash): holdings are parallel arrays
+    (basket, rebalance, symbol id, weight), one entry per stock bought, and
+    cash is (baskets x rebalances); weights and cash are fractions of the
+    basket's investment.
+    """
+    names = market.themes + ['Hybrid']
+    index = {name: i for i, name in enumerate(names)}
+    snapshot_of = np.searchsorted(market.snapshots, market.schedules[schedule])
+    entries = []
+    cash = np.ones((len(names), len(snapshot_of)))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for k, snapshot in enumerate(snapshot_of.tolist()):
+            for basket in basket_generator.generate_baskets(income, risk, market.universe(snapshot), mode):
+                b = index[basket['theme']]
+                investment = basket['investment']
+                for stock in basket['stocks']:
+                    amount = stock.get('amount', stock['price'])
+                    entries.append((b, k, market.symbols.ids[stock['symbol']], amount / investment))
+                cash[b, k] = basket['remaining'] / investment
+
+    columns = list(zip(*entries)) or [(), (), (), ()]
+    holdings = tuple(np.array(column, dtype=dtype) for column, dtype in zip(columns, (np.int64,) * 3 + (float,)))
+    return names, holdings, cash
+
+
+def _group_sum(keys, values, size):
+    return np.bincount(keys, weights=values, minlength=size)
+
+
+def run_backtest(market: Market, schedule: str = 'monthly', income: float = 500000, risk: str = 'medium',
+                 mode: str = 'greedy', cost_bps: float = 0.0) -> BacktestResult:
+    """Backtest every basket of one configuration from the first rebalance day on.
+
+    Between rebalances each basket buys and holds: a position's value follows
+    its close relative to the rebalance day, cash earns nothing. Each
+    rebalance trades to the new weights, paying `cost_bps` on the value traded.
+    A basket holds at most MAX_STOCKS stocks, so every quantity is computed
+    from the holdings themselves (days x holdings values) rather than from
+    dense (days x symbols) weight matrices.
+    """
+    config = {'schedule': schedule, 'income': income, 'risk': risk, 'mode': mode, 'cost_bps': cost_bps}
+    rebalances = market.schedules[schedule]
+    if len(rebalances) == 0:
+        raise ValueError(f"No rebalance day in the price history for schedule {schedule!r}")
+    names, (basket, rebalance, symbol, weight), cash = _basket_holdings(market, schedule, income, risk, mode)
+    baskets, count = len(names), len(rebalances)
+
+    first = rebalances[0]
+    prices = market.closes[first:]
+    days = market.days[first:]
+    steps = rebalances - first
+
+    # Segment k holds the weights set on rebalance k, valued on each day after it up to and
+    # including rebalance k + 1 (before trading); day 0 is the first rebalance itself
+    segment = np.maximum(np.searchsorted(steps, np.arange(len(days)), side='left') - 1, 0)
+    segment_end = np.append(steps[1:], len(days) - 1)
+    units = weight / prices[steps[rebalance], symbol]  # Shares per unit of NAV
+
+    # Every (holding, day) pair of its segment, valued at once
+    lengths = segment_end[rebalance] - steps[rebalance]
+    holding = np.repeat(np.arange(len(weight)), lengths)
+    day = steps[rebalance][holding] + 1 + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    value = units[holding] * prices[day, symbol[holding]]
+    growth = cash[:, segment] + _group_sum(basket[holding] * len(days) + day, value, baskets * len(days)).reshape(baskets, len(days))
+    growth[:, 0] = 1.0
+
+    # Growth of each segment up to the next rebalance, and the turnover there: half the summed
+    # differences between the new weights and the drifted old ones (cash included)
+    segment_growth = growth[:, steps[1:]]
+    carried = rebalance < count - 1
+    moved = rebalance[carried]
+    drifted = -units[carried] * prices[steps[moved + 1], symbol[carried]] / segment_growth[basket[carried], moved]
+    keys = np.concatenate([(basket * count + rebalance) * len(market.symbols) + symbol,
+                           ((basket * count + rebalance + 1) * len(market.symbols) + symbol)[carried]])
+    unique_keys, position = np.unique(keys, return_inverse=True)
+    differences = np.abs(_group_sum(position, np.concatenate([weight, drifted]), len(unique_keys)))
+    before_cash = np.concatenate([np.ones((baskets, 1)), cash[:, :-1] / segment_growth], axis=1)
+    turnover = 0.5 * (_group_sum(unique_keys // len(market.symbols), differences, baskets * count).reshape(baskets, count)
+                      + np.abs(cash - before_cash))
+
+    # NAV on each rebalance day after trading costs, then within segments
+    costs = 1.0 - (cost_bps / 1e4) * 2 * turnover
+    level = np.cumprod(np.concatenate([np.ones((baskets, 1)), segment_growth], axis=1) * costs, axis=1)
+    nav = level[:, segment] * growth
+    nav[:, 0] = level[:, 0]
+    return BacktestResult(config, names, days, nav, market.days[rebalances], turnover)
+
+
+_market: Optional[Market] = None
+
+
+def _init_worker(market):
+    global _market
+    _market = market
+
+
+def _run_config(config):
+    return run_backtest(_market, **config)
+
+
+def run_sweep(market: Market, configs: List[dict], workers: int = 0) -> List[BacktestResult]:
+    """run_backtest() for every config (keyword arguments); in a process pool when workers > 1"""
+    if workers and workers > 1 and len(configs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(market,)) as pool:
+            return list(pool.map(_run_config, configs))
+    return [run_backtest(market, **config) for config in configs]
+
+
+def load_market(theme_files: List[str], schedules=('monthly',), start=None, end=None,
+                root: str = price_history.DEFAULT_HISTORY_DIR) -> Market:
+    """Market over the stocks of the theme files the basket generator uses"""
+    theme_columns = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for theme_file in theme_files:
+            theme_columns[os.path.splitext(os.path.basename(theme_file))[0]] = basket_generator.load_theme_columns(theme_file)
+    return Market(theme_columns, schedules, start, end, root)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Backtest the generated baskets over the price history")
+    parser.add_argument('--income', type=float, default=500000)
+    parser.add_argument('--risk', action='append', choices=['low', 'medium', 'high'])
+    parser.add_argument('--schedule', action='append', choices=list(SCHEDULES))
+    parser.add_argument('--mode', action='append', choices=list(basket_generator.ALLOCATION_MODES))
+    parser.add_argument('--cost-bps', type=float, default=10.0, help="Trading cost per rebalance, in basis points")
+    parser.add_argument('--start', help="First day (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=0, help="Run the configurations in this many processes")
+    args = parser.parse_args()
+
+    schedules = args.schedule or ['monthly']
+    start_time = time.perf_counter()
+    market = load_market(basket_generator.THEME_FILES, schedules,
+                         start=datetime.date.fromisoformat(args.start) if args.start else None)
+    print(f"Loaded {len(market.days)} days x {len(market.symbols)} symbols in {time.perf_counter() - start_time:.2f}s")
+
+    configs = [{'schedule': schedule, 'income': args.income, 'risk': risk, 'mode': mode, 'cost_bps': args.cost_bps}
+               for schedule in schedules for risk in args.risk or ['medium'] for mode in args.mode or ['greedy']]
+    start_time = time.perf_counter()
+    results = run_sweep(market, configs, args.workers)
+    print(f"Ran {len(results)} backtests in {time.perf_counter() - start_time:.2f}s")
+
+    for result in results:
+        config = result.config
+        print(f"\n{config['schedule']} | {config['risk']} | {config['mode']} | {len(result.rebalances)} rebalances")
+        print(f"  {'Basket':<26}{'Return':>9}{'CAGR':>8}{'Vol':>8}{'Sharpe':>8}{'MaxDD':>8}{'Turn/yr':>9}")
+        for basket, stats in result.summary().items():
+            print(f"  {basket:<26}{stats['total_return']:>9.1%}{stats['cagr']:>8.1%}{stats['volatility']:>8.1%}"
+                  f"{stats['sharpe']:>8.2f}{stats['max_drawdown']:>8.1%}{stats['turnover_per_year']:>9.2f}")
@@ -0,0 +1,101 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// Allocation modes basket_generator.py accepts (ALLOCATION_MODES)
+const ALLOCATION_MODES = ['greedy', 'optimal', 'mean_variance', 'risk_parity'];
+
+// Client for the resident Python basket worker (basket_worker.py).
+// Requests and responses are JSON lines tagged with an id, so concurrent
+// /generate calls share one warm process without touching baskets.json.
+class BasketWorker {
+  constructor(options = {}) {
+    this.python = options.python || process.env.PYTHON || 'python';
+    this.script = path.join(__dirname, 'basket_worker.py');
+    this.timeoutMs = options.timeoutMs || 30000;
+    this.nextId = 1;
+    this.pending = new Map();
+    this.child = null;
+  }
+
+  start() {
+    if (this.child) return;
+
+    const child = spawn(this.python, [this.script], {
+      cwd: __dirname,
+      stdio: ['pipe', 'pipe', 'inherit']
+    });
+    this.child = child;
+
+    readline.createInterface({ input: child.stdout }).on('line', (line) => {
+      let message;
+      try {
+        message = JSON.parse(line);
+      } catch (err) {
+        console.error('Unparseable worker output:', line);
+        return;
+      }
+      const entry = this.pending.get(message.id);
+      if (!entry) return;
+      this.pending.delete(message.id);
+      clearTimeout(entry.timer);
+      if (message.error) {
+        entry.reject(new Error(message.error));
+      } else {
+        entry.resolve(message);
+      }
+    });
+
+    // A failed spawn (e.g. python missing) or a write to a dead worker (EPIPE)
+    // emits 'error'; without handlers it would crash the server
+    child.on('error', (err) => {
+      console.error('Basket worker error:', err.message);
+      this.fail(child, new Error(`Basket worker error: ${err.message}`));
+    });
+    child.stdin.on('error', (err) => {
+      console.error('Basket worker stdin error:', err.message);
+      this.fail(child, new Error(`Basket worker error: ${err.message}`));
+    });
+
+    child.on('exit', (code, signal) => {
+      console.error(`Basket worker exited (code: ${code}, signal: ${signal})`);
+      this.fail(child, new Error('Basket worker exited'));
+    });
+  }
+
+  // Rejects every pending request and forgets the worker, so the next request starts a new one
+  fail(child, err) {
+    if (this.child !== child) return;
+    this.child = null;
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(err);
+    }
+    this.pending.clear();
+    child.kill();
+  }
+
+  request(payload) {
+    this.start();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error('Basket worker timed out'));
+      }, this.timeoutMs);
+      this.pending.set(id, { resolve, reject, timer });
+      this.child.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+    });
+  }
+
+  async generate(income, risk, mode = 'greedy') {
+    const { baskets } = await this.request({ op: 'generate', income, risk, mode });
+    return baskets;
+  }
+
+  stop() {
+    if (this.child) this.child.kill();
+  }
+}
+
+module.exports = { BasketWorker, ALLOCATION_MODES };
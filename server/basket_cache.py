@@ -0,0 +1,98 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import List, Optional
+
+import basket_generator
+import price_history
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def theme_data_version(theme_files: List[str]) -> str:
+    """Content hash of the theme CSVs; changes whenever scoring republishes ranks"""
+    digest = hashlib.sha1()
+    for path in theme_files:
+        digest.update(path.encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b'<missing>')
+    return digest.hexdigest()
+
+
+def price_history_manifest(root: str = price_history.DEFAULT_HISTORY_DIR) -> str:
+    return os.path.join(root, price_history.MANIFEST_FILE)
+
+
+def price_history_version(root: str = price_history.DEFAULT_HISTORY_DIR) -> str:
+    """Content hash of the price history manifest; every append or compaction swaps in a new one"""
+    try:
+        with open(price_history_manifest(root), 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return '<missing>'
+
+
+class BasketCache:
+    """LRU cache of generated baskets keyed by (per-basket investment, risk, mode, data version).
+
+    Results only depend on the effective per-basket investment, the risk
+    label, the allocation mode and the ranked universe, so popular amounts are served without
+    recomputation. The portfolio modes also depend on the price history, so
+    their keys carry its version too. Entries from an older data version are
+    dropped as soon as a new version is seen, and portfolio-mode entries as
+    soon as a new price history version is. Cached lists are shared between
+    callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, List[dict]]" = OrderedDict()
+        self.data_version: Optional[str] = None
+        self.history_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, data_version: Optional[str] = None):
+        self.entries.clear()
+        self.data_version = data_version
+        self.history_version = None
+
+    def get_or_generate(self, income: float, risk: str, universe: 'basket_generator.Universe',
+                        data_version: str, mode: str = 'greedy',
+                        history_version: Optional[str] = None) -> List[dict]:
+        if data_version != self.data_version:
+            self.invalidate(data_version)
+        if mode in basket_generator.PORTFOLIO_MODES:
+            if history_version != self.history_version:
+                for key in [key for key in self.entries if key[2] in basket_generator.PORTFOLIO_MODES]:
+                    del self.entries[key]
+                self.history_version = history_version
+            data_version = (data_version, history_version)
+
+        risk = risk.lower()
+        key = (round(basket_generator.basket_investment_for(income, risk), 2), risk, mode, data_version)
+        baskets = self.entries.get(key)
+        if baskets is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return baskets
+
+        self.misses += 1
+        baskets = basket_generator.generate_baskets(income, risk, universe, mode)
+        self.entries[key] = baskets
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return baskets
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'data_version': self.data_version,
+            'history_version': self.history_version,
+        }
@@ -1,8 +1,48 @@
 import csv
+import math
 import os
 import json
 import sys
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+if DATA_DIR not in sys.path:
+    sys.path.append(DATA_DIR)
+
+import snapshot_store
+from stock_universe import Universe, theme_sources
+from allocation import allocate, rank_weights
+from portfolio_optimizer import RISK_TARGET_VOLS, target_weights
+import price_history
+
+THEME_FILES = [
+    "Largecap.csv", "Midcap.csv", "Smallcap.csv",
+    "Realty.csv", "Healthcare.csv", "Auto.csv",
+    "Consumer durables.csv", "IT.csv",
+    "Consumer Discretionary.csv"
+]
+
+RISK_MULTIPLIERS = {'low': 0.1, 'medium': 0.2, 'high': 0.3}
+
+MAX_RANK = 15    # Only stocks ranked 1..MAX_RANK in their theme are eligible
+MAX_STOCKS = 10  # Maximum stocks per basket
+MAX_WEIGHT = 0.25  # Largest share of a basket one stock may take (all modes but 'greedy')
+
+# 'greedy' buys one share per stock in rank order; 'optimal' picks share
+# quantities that maximize rank-weighted investment (see allocation.py);
+# 'mean_variance' and 'risk_parity' weight the candidates from their price
+# history so the basket's volatility follows the risk level (see portfolio_optimizer.py)
+PORTFOLIO_MODES = ('mean_variance', 'risk_parity')
+ALLOCATION_MODES = ('greedy', 'optimal') + PORTFOLIO_MODES
+
+def basket_investment_for(income: float, risk: str) -> float:
+    """Amount each basket gets for a given income and risk level"""
+    return income * RISK_MULTIPLIERS.get(risk.lower(), 0.2)
+
+# Columns the baskets need; a snapshot loads only these
+SNAPSHOT_COLUMNS = ['Stock Symbol', 'Full Name', 'Current Price', 'Rank', '52-Week Low', '52-Week High']
 
 def load_stocks_from_csv(filepath: str) -> List[Dict[str, Union[str, float]]]:
     """Load stock data from CSV file with validation"""
@@ -49,7 +89,116 @@ def load_stocks_from_csv(filepath: str) -> List[Dict[str, Union[str, float]]]:
         print(f"Fatal error reading {filepath}: {str(e)}")
         return []
 
-def generate_pure_basket(investment: float, stocks: List[dict], theme: str, risk: str) -> dict:
+def load_theme_columns(filepath: str) -> dict:
+    """Columns of one theme file for the universe: memory-mapped from its snapshot, else parsed from the CSV"""
+    if snapshot_store.is_current(filepath):
+        try:
+            path = snapshot_store.snapshot_path(filepath)
+            print(f"\nLoading {path}...")
+            data = snapshot_store.load_columns(path, SNAPSHOT_COLUMNS)
+            symbols = np.array([s.strip() if isinstance(s, str) else '' for s in data['Stock Symbol']], dtype=object)
+            rank = data['Rank']
+            # Same rows the CSV loader accepts: a symbol and a rank are required
+            valid = (symbols != '') & ~np.isnan(rank.astype(float))
+            if not valid.all():
+                print(f"  Skipped {int((~valid).sum())} rows without a symbol or rank")
+            columns = {
+                'symbol': symbols[valid].tolist(),
+                'name': [n.strip() if isinstance(n, str) else '' for n in data['Full Name'][valid]],
+                'rank': rank[valid],
+                'integer_ranks': rank.dtype.kind in 'iu',
+            }
+            for field, column in (('price', 'Current Price'), ('low', '52-Week Low'), ('high', '52-Week High')):
+                columns[field] = np.nan_to_num(np.asarray(data[column][valid], dtype=float), nan=0.0)
+            print(f"  Loaded {len(columns['symbol'])} valid stocks from {path}")
+            return columns
+        except (OSError, KeyError, ValueError) as e:
+            print(f"  Snapshot unusable, reading CSV instead: {e}")
+
+    stocks = load_stocks_from_csv(filepath)
+    return {
+        'symbol': [s['symbol'] for s in stocks],
+        'name': [s['name'] for s in stocks],
+        'price': [s['price'] for s in stocks],
+        'rank': [s['rank'] for s in stocks],
+        'low': [s['52_week_low'] for s in stocks],
+        'high': [s['52_week_high'] for s in stocks],
+        'integer_ranks': bool(stocks) and all(isinstance(s['rank'], int) for s in stocks),
+    }
+
+def allocate_basket(basket: dict, universe: Universe, rows: List[int]) -> dict:
+    """Fill a basket with optimal share quantities of the candidate rows"""
+    allocation = allocate(universe.price[rows], rank_weights(universe.rank[rows], MAX_RANK),
+                          basket['investment'], MAX_STOCKS, MAX_WEIGHT)
+    for row, quantity in zip(rows, allocation.quantities.tolist()):
+        if quantity:
+            stock = universe.record(row)
+            stock['quantity'] = quantity
+            stock['amount'] = quantity * stock['price']
+            basket['stocks'].append(stock)
+            basket['count'] += 1
+            print(f"  Added {quantity} x {stock['symbol']} from {stock['theme']} (Rank {stock['rank']}, ₹{stock['amount']:,.2f})")
+    basket['remaining'] = basket['investment'] - allocation.invested
+    basket['mode'] = 'optimal'
+    if not allocation.optimal:
+        print(f"  Search stopped after {allocation.nodes} nodes; using the best allocation found")
+    return basket
+
+def weight_basket(basket: dict, universe: Universe, rows: List[int], mode: str) -> bool:
+    """Fill a basket with price-history-optimized weights of the candidate rows.
+
+    Returns False if fewer than two candidates have enough history to
+    estimate their risk. The basket is then left empty for the greedy fill,
+    with 'mode' set to 'greedy' and 'fallback' saying why the requested mode
+    was not applied.
+    """
+    target_vol = RISK_TARGET_VOLS.get(basket['risk'].lower(), RISK_TARGET_VOLS['medium'])
+    symbols = [universe.symbols[universe.symbol_id[row]] for row in rows]
+    _, closes = price_history.load_closes(symbols, end=universe.as_of)
+    weights, usable = target_weights(closes, mode, target_vol, MAX_WEIGHT)
+    if usable.sum() < 2:
+        print(f"  Only {int(usable.sum())} candidates have price history; falling back to greedy")
+        basket['mode'] = 'greedy'
+        basket['fallback'] = f"{mode}: only {int(usable.sum())} candidates have enough price history"
+        return False
+
+    held = np.flatnonzero(weights > 1e-6)
+    if len(held) > MAX_STOCKS:
+        # Keep the largest positions and re-solve over them
+        held = np.sort(held[np.argsort(-weights[held], kind='stable')[:MAX_STOCKS]])
+        rows = [rows[i] for i in held]
+        weights, _ = target_weights(closes[:, held], mode, target_vol, MAX_WEIGHT)
+
+    for row, weight in zip(rows, weights.tolist()):
+        price = universe.price[row].item()
+        quantity = math.floor(weight * basket['investment'] / price) if price > 0 else 0
+        if quantity:
+            stock = universe.record(row)
+            stock['quantity'] = quantity
+            stock['amount'] = quantity * price
+            stock['weight'] = round(weight, 4)
+            basket['stocks'].append(stock)
+            basket['remaining'] -= stock['amount']
+            basket['count'] += 1
+            print(f"  Added {quantity} x {stock['symbol']} from {stock['theme']} ({weight:.1%}, ₹{stock['amount']:,.2f})")
+    basket['mode'] = mode
+    basket['target_volatility'] = target_vol
+    return True
+
+def hybrid_candidates(universe: Universe) -> List[int]:
+    """Rows in hybrid order (rank 1 of every theme, then rank 2, ...), each symbol once"""
+    seen = set()
+    candidates = []
+    for rank in range(1, MAX_RANK + 1):
+        for theme_id in range(len(universe.themes)):
+            for row in universe.by_rank[theme_id].get(rank, ()):
+                symbol_id = int(universe.symbol_id[row])
+                if symbol_id not in seen:
+                    seen.add(symbol_id)
+                    candidates.append(row)
+    return candidates
+
+def generate_pure_basket(investment: float, universe: Universe, theme: str, risk: str, mode: str = 'greedy') -> dict:
     """Generate basket for a single theme with debugging"""
     print(f"\nGenerating {theme} basket (₹{investment:,.2f})...")
     
@@ -63,29 +212,36 @@ def generate_pure_basket(investment: float, stocks: List[dict], theme: str, risk
         'risk': risk
     }
     
-    eligible_stocks = [s for s in stocks if s['rank'] <= 15]
-    print(f"  Found {len(eligible_stocks)} eligible stocks (rank ≤ 15)")
-    
-    sorted_stocks = sorted(eligible_stocks, key=lambda x: x['rank'])
+    sorted_rows = universe.eligible[universe.theme_ids[theme]]
+    print(f"  Found {len(sorted_rows)} eligible stocks (rank ≤ {MAX_RANK})")
     
-    for stock in sorted_stocks:
-        if basket['count'] >= 10:
-            print(f"  Reached max 10 stocks for {theme}")
-            break
-        if stock['price'] <= basket['remaining']:
-            basket['stocks'].append(stock)
-            basket['remaining'] -= stock['price']
-            basket['count'] += 1
-            print(f"  Added {stock['symbol']} (₹{stock['price']:.2f})")
-        else:
-            print(f"  Skipped {stock['symbol']} (₹{stock['price']:.2f} - insufficient funds)")
+    filled = False
+    if mode in PORTFOLIO_MODES:
+        filled = weight_basket(basket, universe, sorted_rows, mode)
+    elif mode == 'optimal':
+        allocate_basket(basket, universe, sorted_rows)
+        filled = True
+    if not filled:
+        for row in sorted_rows:
+            symbol = universe.symbols[universe.symbol_id[row]]
+            price = universe.price[row].item()
+            if basket['count'] >= MAX_STOCKS:
+                print(f"  Reached max {MAX_STOCKS} stocks for {theme}")
+                break
+            if price <= basket['remaining']:
+                basket['stocks'].append(universe.record(row))
+                basket['remaining'] -= price
+                basket['count'] += 1
+                print(f"  Added {symbol} (₹{price:.2f})")
+            else:
+                print(f"  Skipped {symbol} (₹{price:.2f} - insufficient funds)")
     
     basket['invested'] = investment - basket['remaining']
     print(f"  Final: {len(basket['stocks'])} stocks, ₹{basket['invested']:,.2f} invested")
     return basket
 
-def generate_hybrid_basket(investment: float, theme_files: List[str], risk: str) -> dict:
-    """Generate hybrid basket with detailed logging"""
+def generate_hybrid_basket(investment: float, universe: Universe, risk: str, mode: str = 'greedy') -> dict:
+    """Generate hybrid basket: rank 1 of every theme, then rank 2, ... via the rank index"""
     print(f"\nGenerating Hybrid basket (₹{investment:,.2f})...")
     
     basket = {
@@ -98,35 +254,41 @@ def generate_hybrid_basket(investment: float, theme_files: List[str], risk: str)
         'risk': risk
     }
     
-    all_stocks = []
-    theme_stocks = {}
+    for theme_id, theme_name in enumerate(universe.themes):
+        print(f"  {theme_name}: {len(universe.eligible[theme_id])} eligible stocks")
     
-    for theme_file in theme_files:
-        theme_name = os.path.splitext(theme_file)[0]
-        stocks = load_stocks_from_csv(theme_file)
-        filtered = [s for s in stocks if s['rank'] <= 15]
-        theme_stocks[theme_name] = sorted(filtered, key=lambda x: x['rank'])
-        print(f"  {theme_name}: {len(filtered)} eligible stocks")
-        all_stocks.extend(stocks)
-    
-    max_rank = 15
+    filled = False
+    if mode in PORTFOLIO_MODES:
+        filled = weight_basket(basket, universe, hybrid_candidates(universe), mode)
+    elif mode == 'optimal':
+        allocate_basket(basket, universe, hybrid_candidates(universe))
+        filled = True
+    if filled:
+        basket['invested'] = investment - basket['remaining']
+        print(f"  Final: {len(basket['stocks'])} stocks, ₹{basket['invested']:,.2f} invested")
+        return basket
+
+    # Interned symbol ids, so a stock listed in several themes is only picked once
     used_symbols = set()
-    
-    for rank in range(1, max_rank + 1):
-        for theme, stocks in theme_stocks.items():
-            if basket['count'] >= 10:
+
+    for rank in range(1, MAX_RANK + 1):
+        if basket['count'] >= MAX_STOCKS:
+            break
+        for theme_id, theme in enumerate(universe.themes):
+            if basket['count'] >= MAX_STOCKS:
                 break
             
-            for stock in stocks:
-                if (stock['rank'] == rank and 
-                    stock['symbol'] not in used_symbols and 
-                    stock['price'] <= basket['remaining']):
+            for row in universe.by_rank[theme_id].get(rank, ()):
+                symbol_id = int(universe.symbol_id[row])
+                price = universe.price[row].item()
+                if (symbol_id not in used_symbols and 
+                    price <= basket['remaining']):
                     
-                    basket['stocks'].append(stock)
-                    used_symbols.add(stock['symbol'])
-                    basket['remaining'] -= stock['price']
+                    basket['stocks'].append(universe.record(row))
+                    used_symbols.add(symbol_id)
+                    basket['remaining'] -= price
                     basket['count'] += 1
-                    print(f"  Added {stock['symbol']} from {theme} (Rank {rank}, ₹{stock['price']:.2f})")
+                    print(f"  Added {universe.symbols[symbol_id]} from {theme} (Rank {rank}, ₹{price:.2f})")
                     break
     
     basket['invested'] = investment - basket['remaining']
@@ -162,35 +324,61 @@ def export_baskets_to_json(baskets: List[dict], filename: str = 'baskets.json'):
         print(f"\nERROR exporting JSON: {str(e)}")
         raise
 
-def main(income: float, risk: str, theme_files: List[str]):
-    """Main function with enhanced logging"""
-    print(f"\n{' STARTING BASKET GENERATOR ':=^80}")
-    print(f"Income: ₹{income:,.2f} | Risk: {risk} | Themes: {len(theme_files)}")
-    
-    risk_multiplier = {'low': 0.1, 'medium': 0.2, 'high': 0.3}.get(risk.lower(), 0.2)
-    basket_investment = income * risk_multiplier  # Full amount for each basket
+def load_universe(theme_files: List[str], cache_path: Optional[str] = None) -> Universe:
+    """Load every theme file once into an array-backed universe, keyed by theme name
+
+    With `cache_path` the compiled universe is saved there and reopened
+    memory-mapped on later loads, as long as no theme file changed.
+    """
+    sources = theme_sources(theme_files)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            universe = Universe.open(cache_path, MAX_RANK)
+            if universe.sources == sources:
+                print(f"Opened compiled universe {cache_path} ({len(universe)} stocks)")
+                return universe
+        except (OSError, KeyError, ValueError) as e:
+            print(f"  Compiled universe unusable, rebuilding: {e}")
+
+    theme_columns = {}
+    for theme_file in theme_files:
+        theme_name = os.path.splitext(os.path.basename(theme_file))[0]
+        theme_columns[theme_name] = load_theme_columns(theme_file)
+    universe = Universe.from_columns(theme_columns, MAX_RANK, sources)
+    if cache_path:
+        universe.save(cache_path)
+    return universe
+
+def generate_baskets(income: float, risk: str, universe: Universe, mode: str = 'greedy') -> List[dict]:
+    """Generate the pure theme baskets plus the hybrid basket from a loaded universe"""
+    basket_investment = basket_investment_for(income, risk)  # Full amount for each basket
     print(f"Investment per basket: ₹{basket_investment:,.2f}")
 
     # Generate pure theme baskets (each gets full investment amount)
     pure_baskets = []
-    print(f"\nGenerating {len(theme_files)} pure baskets (₹{basket_investment:,.2f} each)")
+    print(f"\nGenerating {len(universe.themes)} pure baskets (₹{basket_investment:,.2f} each)")
     
-    for theme_file in theme_files:
-        theme_name = os.path.splitext(theme_file)[0]
-        stocks = load_stocks_from_csv(theme_file)
-        if stocks:
-            basket = generate_pure_basket(basket_investment, stocks, theme_name, risk)
+    for theme_id, theme_name in enumerate(universe.themes):
+        if universe.theme_size(theme_id):
+            basket = generate_pure_basket(basket_investment, universe, theme_name, risk, mode)
             pure_baskets.append(basket)
         else:
             print(f"  Skipping {theme_name} - no valid stocks")
 
     # Generate hybrid basket (also gets full investment amount)
     print(f"\nGenerating hybrid basket (₹{basket_investment:,.2f})")
-    hybrid_basket = generate_hybrid_basket(basket_investment, theme_files, risk)
+    hybrid_basket = generate_hybrid_basket(basket_investment, universe, risk, mode)
+    
+    return pure_baskets + [hybrid_basket]
+
+def main(income: float, risk: str, theme_files: List[str], output_file: str = 'baskets.json', mode: str = 'greedy'):
+    """Main function with enhanced logging"""
+    print(f"\n{' STARTING BASKET GENERATOR ':=^80}")
+    print(f"Income: ₹{income:,.2f} | Risk: {risk} | Themes: {len(theme_files)} | Mode: {mode}")
     
     # Combine and export
-    all_baskets = pure_baskets + [hybrid_basket]
-    export_baskets_to_json(all_baskets)
+    all_baskets = generate_baskets(income, risk, load_universe(theme_files), mode)
+    export_baskets_to_json(all_baskets, output_file)
     
     print("\n=== FINAL SUMMARY ===")
     for i, basket in enumerate(all_baskets):
@@ -200,32 +388,28 @@ def main(income: float, risk: str, theme_files: List[str]):
     return all_baskets
 
 if __name__ == "__main__":
-    if len(sys.argv) == 3:
+    if len(sys.argv) in (3, 4):
         try:
             INCOME = float(sys.argv[1])
             RISK = sys.argv[2].lower()
+            MODE = sys.argv[3].lower() if len(sys.argv) == 4 else 'greedy'
             if RISK not in ['low', 'medium', 'high']:
                 raise ValueError("Risk must be low/medium/high")
-                
-            THEME_FILES = [
-                "Largecap.csv", "Midcap.csv", "Smallcap.csv", 
-                "Realty.csv", "Healthcare.csv", "Auto.csv",
-                "Consumer durables.csv", "IT.csv", 
-                "Consumer Discretionary.csv"
-            ]
-            
+            if MODE not in ALLOCATION_MODES:
+                raise ValueError(f"Mode must be one of {'/'.join(ALLOCATION_MODES)}")
+
             # Verify all CSV files exist
             missing_files = [f for f in THEME_FILES if not os.path.exists(f)]
             if missing_files:
                 raise FileNotFoundError(f"Missing CSV files: {missing_files}")
             
-            main(INCOME, RISK, THEME_FILES)
+            main(INCOME, RISK, THEME_FILES, mode=MODE)
             
         except Exception as e:
             print(f"\nError: {str(e)}")
-            print("Usage: python basket_generator.py <income> <risk>")
+            print("Usage: python basket_generator.py <income> <risk> [greedy|optimal|mean_variance|risk_parity]")
             print("Example: python basket_generator.py 500000 high")
             sys.exit(1)
     else:
-        print("Usage: python basket_generator.py <income> <risk>")
+        print("Usage: python basket_generator.py <income> <risk> [greedy|optimal|mean_variance|risk_parity]")
         print("Example: python basket_generator.py 500000 high")
\ No newline at end of file
@@ -0,0 +1,135 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+import basket_generator
+from basket_cache import BasketCache, price_history_manifest, price_history_version, theme_data_version
+
+VALID_RISKS = ('low', 'medium', 'high')
+
+# Compiled, memory-mappable copy of the universe; rebuilt whenever a theme file changes
+UNIVERSE_CACHE = 'universe.snapshot'
+
+
+class BasketWorker:
+    """Keeps the ranked universe in memory and answers generation requests.
+
+    The theme CSVs are loaded once and re-loaded only when one of them
+    changes on disk (checked by mtime/size on each request), so scoring runs
+    that republish the CSVs are picked up without restarting the worker.
+    Results are memoized in a BasketCache keyed on the CSVs' content hash, so
+    a reload with new ranks invalidates every cached basket. The price
+    history manifest is watched the same way, so new closes invalidate the
+    mean_variance and risk_parity baskets that were weighted from the old ones.
+    """
+
+    def __init__(self, theme_files, verbose=False):
+        self.theme_files = theme_files
+        self.verbose = verbose
+        self._devnull = open(os.devnull, 'w')
+        self.universe = None
+        self.signature = None
+        self.data_version = None
+        self.history_signature = None
+        self.history_version = None
+        self.cache = BasketCache()
+        self.reloads = 0
+        self.requests = 0
+        self.reload_if_changed()
+
+    def _log_target(self):
+        # stdout carries the protocol, so generator logging goes elsewhere
+        return sys.stderr if self.verbose else self._devnull
+
+    def _files_signature(self, paths):
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload_if_changed(self):
+        history_signature = self._files_signature([price_history_manifest()])
+        if history_signature != self.history_signature:
+            self.history_signature = history_signature
+            self.history_version = price_history_version()
+
+        signature = self._files_signature(self.theme_files)
+        if signature == self.signature:
+            return False
+        with contextlib.redirect_stdout(self._log_target()):
+            self.universe = basket_generator.load_universe(self.theme_files, UNIVERSE_CACHE)
+        self.signature = signature
+        self.data_version = theme_data_version(self.theme_files)
+        self.reloads += 1
+        print(f"Loaded universe: {len(self.universe)} stocks "
+              f"across {len(self.universe.themes)} themes", file=sys.stderr)
+        return True
+
+    def generate(self, income, risk, mode='greedy'):
+        self.reload_if_changed()
+        with contextlib.redirect_stdout(self._log_target()):
+            return self.cache.get_or_generate(income, risk, self.universe, self.data_version, mode,
+                                              self.history_version)
+
+    def handle(self, request):
+        """Process one decoded request and return the response dict."""
+        op = request.get('op', 'generate')
+        if op == 'ping':
+            return {'ok': True}
+        if op == 'stats':
+            return {'requests': self.requests, 'reloads': self.reloads, 'cache': self.cache.stats()}
+        if op == 'reload':
+            self.signature = self.history_signature = None
+            self.reload_if_changed()
+            return {'ok': True}
+        if op != 'generate':
+            raise ValueError(f"Unknown op: {op}")
+
+        income = float(request['income'])
+        risk = str(request['risk']).lower()
+        if income <= 0:
+            raise ValueError("Income must be positive")
+        if risk not in VALID_RISKS:
+            raise ValueError("Risk must be low/medium/high")
+        mode = str(request.get('mode', 'greedy')).lower()
+        if mode not in basket_generator.ALLOCATION_MODES:
+            raise ValueError(f"Mode must be one of {'/'.join(basket_generator.ALLOCATION_MODES)}")
+
+        self.requests += 1
+        start = time.perf_counter()
+        baskets = self.generate(income, risk, mode)
+        return {'baskets': baskets, 'elapsed_ms': (time.perf_counter() - start) * 1000}
+
+    def serve(self, stdin=sys.stdin, stdout=sys.stdout):
+        """JSON-lines loop: one request per input line, one response per output line."""
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get('id')
+                response = self.handle(request)
+            except Exception as e:
+                response = {'error': str(e)}
+            response['id'] = request_id
+            stdout.write(json.dumps(response) + '\n')
+            stdout.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resident basket generation worker (JSON lines on stdin/stdout)")
+    parser.add_argument('--verbose', action='store_true', help="Send generator logging to stderr")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    BasketWorker(basket_generator.THEME_FILES, verbose=args.verbose).serve()
@@ -1,165 +1,10 @@
 import pandas as pd
 import numpy as np
 
-# Scoring functions (unchanged)
-def score_revenue_growth(value):
-    """Score revenue growth based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 20:
-        return 10
-    elif value > 10:
-        return 8
-    elif value > 5:
-        return 6
-    elif value > 1:
-        return 4
-    else:
-        return 2
-
-def score_eps_growth(value):
-    """Score EPS growth based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 25:
-        return 10
-    elif value > 15:
-        return 8
-    elif value > 5:
-        return 6
-    elif value > 0:
-        return 4
-    else:
-        return 1
-
-def score_rsi(value):
-    """Score RSI based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif 30 <= value <= 50:
-        return 10
-    elif 50 < value <= 70:
-        return 8
-    else:
-        return 4
-
-def score_analyst_target_price(current_price, analyst_target_price):
-    """Score analyst target price based on potential upside."""
-    if pd.isna(current_price) or pd.isna(analyst_target_price) or current_price == '-' or analyst_target_price == '-':
-        return 0
-    potential_upside = (analyst_target_price - current_price) / current_price * 100
-    if potential_upside > 30:
-        return 10
-    elif potential_upside > 20:
-        return 8
-    elif potential_upside > 10:
-        return 6
-    elif potential_upside > 0:
-        return 4
-    else:
-        return 2
-
-def score_beta(value):
-    """Score Beta based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif 0.8 <= value <= 1.2:
-        return 10
-    elif 0.5 <= value < 0.8:
-        return 8
-    elif 1.2 < value <= 1.5:
-        return 6
-    else:
-        return 4
-
-def score_profit_margin(value):
-    """Score profit margin based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 25:
-        return 10
-    elif value > 18:
-        return 8
-    elif value > 12:
-        return 6
-    elif value > 5:
-        return 4
-    else:
-        return 2
-
-def score_ebitda_margin(value):
-    """Score EBITDA margin based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 25:
-        return 10
-    elif value > 18:
-        return 8
-    elif value > 12:
-        return 6
-    elif value > 5:
-        return 4
-    else:
-        return 2
-
-def score_roe(value):
-    """Score Return on Equity (ROE) based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 25:
-        return 10
-    elif value > 15:
-        return 8
-    elif value > 10:
-        return 6
-    elif value > 5:
-        return 4
-    else:
-        return 2
-
-def score_debt_equity(value):
-    """Score Debt/Equity ratio based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value < 0.5:
-        return 10
-    elif value <= 1:
-        return 8
-    elif value <= 1.5:
-        return 6
-    elif value <= 2:
-        return 4
-    else:
-        return 2
-
-def score_roa(value):
-    """Score Return on Assets (ROA) based on predefined thresholds."""
-    if pd.isna(value) or value == '-':
-        return 0
-    elif value > 10:
-        return 10
-    elif value > 7:
-        return 8
-    elif value > 4:
-        return 6
-    elif value > 1:
-        return 4
-    else:
-        return 2
-    
-def score_expert_recommendation(value):
-    """Score Expert Recommendation based on predefined categories."""
-    if pd.isna(value):
-        return 0
-    scores = {'strong buy': 10, 'buy': 8, 'hold': 6, 'underperform': 4, 'sell': 2}
-    return scores.get(value, 0)
-
-def score_news_sentiment(value):
-    """Score News Sentiment based on predefined categories."""
-    if pd.isna(value):
-        return 0
-    scores = {'Positive': 10, 'Neutral': 6, 'Negative': 2}
-    return scores.get(value, 0)    
+from scoring_rules import load_rules, DEFAULT_RULES_FILE
+
+# Thresholds and weights live in scoring_rules.json, compiled once at import
+RULES = load_rules(DEFAULT_RULES_FILE)
 
 # Function to preprocess percentage values (unchanged)
 def preprocess_percentage_columns(data, columns):
@@ -170,15 +15,8 @@ def preprocess_percentage_columns(data, columns):
             data[col] = data[col].replace('%', '', regex=True).astype(float)
     return data
 
-# Main function to process stock data
-def process_stock_data_csv(input_file, output_file):
-    """Process stock data, calculate scores, and save the results."""
-    try:
-        data = pd.read_csv(input_file)
-    except Exception as e:
-        print(f"Error reading the input file: {e}")
-        return
-
+def prepare_stock_data(data):
+    """Turn percentage strings and numeric columns of a freshly read frame into floats."""
     # Preprocess percentage columns
     percentage_columns = [
         'Profit Margin', 'EBITDA Margin', 'Return on Equity (ROE)',
@@ -190,47 +28,51 @@ def process_stock_data_csv(input_file, output_file):
     for col in data.columns:
         if col not in ['Stock Symbol', 'Theme','Full Name','Expert Recommendation','News Sentiment']:
             data[col] = pd.to_numeric(data[col], errors='coerce')
+    return data
+
+def rank_stock_data(data, by=None):
+    """Rank by Total Score (1 = best) with ties broken by row order; optionally within groups."""
+    if by is None:
+        # Rank the stocks with unique ranks
+        data['Rank'] = data['Total Score'].rank(ascending=False, method='min')
+
+        # Adjust ranks to ensure uniqueness
+        data['Rank'] = data['Rank'] + data.groupby('Rank').cumcount()
+    else:
+        groups = data.groupby(by, dropna=False, sort=False)['Total Score']
+        data['Rank'] = groups.rank(ascending=False, method='min')
+        data['Rank'] = data['Rank'] + data.groupby([by, 'Rank'], dropna=False, sort=False).cumcount()
+    return data
+
+def score_stock_data(data, rules=None, rank_by=None):
+    """Add score columns, Total Score and Rank to a prepared frame using a rule set.
+
+    Different rule sets can be applied to the same in-memory frame without
+    re-reading or re-parsing the CSV. Pass rank_by='Theme' to rank each theme
+    separately when the frame holds the whole universe.
+    """
+    rules = rules or RULES
 
     # Apply scoring logic
-    data['Revenue Growth (YoY) Score'] = data['Revenue Growth (YoY)'].apply(score_revenue_growth)
-    data['EPS Growth Score'] = data['EPS Growth'].apply(score_eps_growth)
-    data['RSI Score'] = data['RSI'].apply(score_rsi)
-    data['Analyst Target Price Score'] = data.apply(
-        lambda row: score_analyst_target_price(row['Current Price'], row['Analyst Target Price']), axis=1
-    )
-    data['Beta Score'] = data['Beta'].apply(score_beta)
-    data['Profit Margin Score'] = data['Profit Margin'].apply(score_profit_margin)
-    data['EBITDA Margin Score'] = data['EBITDA Margin'].apply(score_ebitda_margin)
-    data['Return on Equity (ROE) Score'] = data['Return on Equity (ROE)'].apply(score_roe)
-    data['Debt/Equity Ratio Score'] = data['Debt / Equity'].apply(score_debt_equity)
-    data['Return on Assets (ROA) Score'] = data['Return on Assets (ROA)'].apply(score_roa)
-    data['Expert Recommendation Score'] = data['Expert Recommendation'].apply(score_expert_recommendation)
-    data['News Sentiment Score'] = data['News Sentiment'].apply(score_news_sentiment)
-
-    # Define weights for scoring
-    weights = {
-        'Revenue Growth (YoY) Score': 0.15,
-        'EPS Growth Score': 0.15,
-        'RSI Score': 0.1,
-        'Analyst Target Price Score': 0.1,
-        'Beta Score': 0.05,
-        'Profit Margin Score': 0.1,
-        'EBITDA Margin Score': 0.1,
-        'Return on Equity (ROE) Score': 0.1,
-        'Debt/Equity Ratio Score': 0.05,
-        'Return on Assets (ROA) Score': 0.1,
-        'Expert Recommendation Score': 0.03,
-        'News Sentiment Score': 0.03
-    }
+    score_matrix, totals = rules.score(data)
+    for name, scores in zip(rules.names, score_matrix):
+        data[name] = scores
 
     # Calculate total score
-    data['Total Score'] = sum([data[col] * weight for col, weight in weights.items()])
+    data['Total Score'] = totals
 
-    # Rank the stocks with unique ranks
-    data['Rank'] = data['Total Score'].rank(ascending=False, method='min')
+    return rank_stock_data(data, rank_by)
+
+# Main function to process stock data
+def process_stock_data_csv(input_file, output_file, rules=None):
+    """Process stock data, calculate scores, and save the results."""
+    try:
+        data = pd.read_csv(input_file)
+    except Exception as e:
+        print(f"Error reading the input file: {e}")
+        return
 
-    # Adjust ranks to ensure uniqueness
-    data['Rank'] = data['Rank'] + data.groupby('Rank').cumcount()
+    data = score_stock_data(prepare_stock_data(data), rules)
 
     # Save to the same CSV file (overwrite)
     try:
@@ -244,5 +86,18 @@ def process_stock_data_csv(input_file, output_file):
     print("\nRanked Stock Symbols:")
     print(ranked_stocks.to_string(index=False))
 
-# Example usage
-process_stock_data_csv("Smallcap.csv", "Smallcap.csv")
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    import batch_scoring
+
+    parser = argparse.ArgumentParser(description="Score and rank stocks")
+    parser.add_argument('files', nargs='*', help="Theme CSVs to score in place (default: every theme in sm.csv)")
+    parser.add_argument('--snapshot', help="Score a whole raw snapshot such as Stock_Data.csv, ranking per theme")
+    parser.add_argument('--output-dir', default='.', help="Where --snapshot writes the theme files")
+    parser.add_argument('--workers', type=int, default=0, help="Score theme files in this many processes")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        batch_scoring.score_snapshot(args.snapshot, args.output_dir)
+    else:
+        batch_scoring.score_theme_files(args.files or batch_scoring.default_theme_files('sm.csv'), args.workers)
@@ -0,0 +1,111 @@
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import preprocess
+import snapshot_store
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_scoring = None
+
+
+def load_scoring():
+    """Import 'Scoring and Ranking.py' (not a valid module name) once per process."""
+    global _scoring
+    if _scoring is None:
+        spec = importlib.util.spec_from_file_location('scoring_and_ranking', os.path.join(DATA_DIR, 'Scoring and Ranking.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scoring = module
+    return _scoring
+
+
+def write_csvs_atomically(frames):
+    """Write {path: frame} so that readers see either every old file or every new one.
+
+    Each frame goes to a temp file next to its target first; the renames only
+    start once all of them were written successfully.
+    """
+    pending = []
+    try:
+        for path, frame in frames.items():
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            frame.to_csv(tmp_path, index=False)
+            pending.append((tmp_path, path))
+    except Exception:
+        for tmp_path, _ in pending:
+            os.remove(tmp_path)
+        raise
+    for tmp_path, path in pending:
+        os.replace(tmp_path, path)
+
+
+def write_tables(frames):
+    """Write {csv path: frame} as CSV exports plus the typed snapshots later stages read."""
+    write_csvs_atomically(frames)
+    for path, frame in frames.items():
+        snapshot_store.write_snapshot(frame, snapshot_store.snapshot_path(path), source_csv=path)
+
+
+def default_theme_files(snapshot_csv='sm.csv', output_dir='.'):
+    """Theme CSVs preprocess.py produces for the themes present in a snapshot."""
+    themes = pd.read_csv(snapshot_csv, usecols=['Theme'])['Theme'].dropna().str.strip().str.lower().unique()
+    return [path for path in (preprocess.theme_filename(theme, output_dir) for theme in themes)
+            if os.path.exists(path)]
+
+
+def score_theme_file(input_file, scorer=None):
+    """Read, score and rank one theme file; returns the scored frame.
+
+    `scorer` is an optional incremental_scoring.IncrementalScorer that keeps
+    the previous run of this file and only rescores the rows that changed.
+    """
+    scoring = load_scoring()
+    data = scoring.prepare_stock_data(snapshot_store.read_frame(input_file))
+    if scorer is not None:
+        return scorer.score(data)
+    return scoring.score_stock_data(data)
+
+
+def score_theme_files(theme_files, workers=0, scorers=None):
+    """Score every theme file from one data snapshot and replace them together.
+
+    With workers > 1 the themes are scored in a process pool. Passing a dict
+    of {path: IncrementalScorer} scores in-process and reuses the previous
+    run's scores for unchanged stocks.
+    """
+    if scorers is not None:
+        scored = {path: score_theme_file(path, scorers.get(path)) for path in theme_files}
+    elif workers and workers > 1 and len(theme_files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scored = dict(zip(theme_files, pool.map(score_theme_file, theme_files)))
+    else:
+        scored = {path: score_theme_file(path) for path in theme_files}
+
+    write_tables(scored)
+    for path, data in scored.items():
+        print(f"Processed data saved to {path} ({len(data)} stocks)")
+    return scored
+
+
+def score_snapshot(snapshot_csv, output_dir='.'):
+    """Clean and score a whole raw snapshot in one pass, ranking within each theme."""
+    scoring = load_scoring()
+
+    df = pd.read_csv(snapshot_csv)
+    df['Theme'] = df['Theme'].str.strip().str.lower()
+    df = df[df['Theme'].notna()]
+
+    data = scoring.score_stock_data(scoring.prepare_stock_data(preprocess.clean_frame(df)), rank_by='Theme')
+
+    frames = {
+        preprocess.theme_filename(theme, output_dir): group
+        for theme, group in data.groupby('Theme', sort=False)
+    }
+    write_tables(frames)
+    for path, group in frames.items():
+        print(f"Processed data saved to {path} ({len(group)} stocks)")
+    return frames
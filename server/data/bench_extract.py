@@ -0,0 +1,206 @@
+"""Parity check and benchmark for html_extract against the old BeautifulSoup lookups.
+
+Reads saved pages from a fixture directory with one subdirectory per
+page kind (quote, financials, ratios, statistics, analysis), each holding
+<symbol>.html. Without a directory, synthetic pages shaped like the real
+ones are generated. Every page is extracted with the old per-label
+BeautifulSoup code and with html_extract's parsers. The results must be
+equal, and the script prints parse-and-extract time per page. Empty and
+whitespace-only bodies are checked the same way for every page kind.
+
+Usage: python bench_extract.py [fixture dir] [synthetic pages per kind]   (default: synthetic, 20)
+"""
+import glob
+import os
+import random
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import html_extract
+
+
+# The extraction data_update.py did before html_extract, kept as the reference
+def reference_stock_data(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    metrics = { 'Current Price': 'N/A', 'P/E Ratio': 'N/A', 'Beta': 'N/A',
+                'RSI': 'N/A', 'EPS (ttm)': 'N/A', '52-Week Low': 'N/A', '52-Week High': 'N/A' }
+    price = soup.find('div', class_='text-4xl font-bold transition-colors duration-300 inline-block')
+    if price:
+        metrics['Current Price'] = price.text.strip()
+    rows = soup.find_all('tr', class_='flex flex-col border-b border-default py-1 sm:table-row sm:py-0')
+    for row in rows:
+        cols = row.find_all('td')
+        if len(cols) > 1:
+            key, value = cols[0].text.strip(), cols[1].text.strip()
+            if 'PE Ratio' in key: metrics['P/E Ratio'] = value
+            elif 'Beta' in key: metrics['Beta'] = value
+            elif 'RSI' in key: metrics['RSI'] = value
+            elif 'EPS (ttm)' in key: metrics['EPS (ttm)'] = value
+            elif '52-Week Range' in key:
+                try:
+                    low, high = value.split('-')
+                    metrics['52-Week Low'] = low.strip()
+                    metrics['52-Week High'] = high.strip()
+                except ValueError:
+                    metrics['52-Week Low'] = metrics['52-Week High'] = 'N/A'
+    return metrics
+
+
+def reference_financial_data(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def fetch_growth_value(label):
+        growth_section = soup.find(string=label)
+        if growth_section:
+            return growth_section.find_parent('tr').find_all('td')[1].text.strip()
+        return "Data not found"
+
+    return {label: fetch_growth_value(label)
+            for label in ("Revenue Growth (YoY)", "EPS Growth", "Profit Margin", "EBITDA Margin")}
+
+
+def reference_stock_ratios(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def fetch_ratio(ratio_name):
+        row = soup.find(string=ratio_name)
+        if row:
+            columns = row.find_parent('tr').find_all('td')
+            if len(columns) > 1:
+                return columns[2].text.strip() if columns[1].text.strip() == '-' and len(columns) > 2 else columns[1].text.strip()
+        return None
+
+    return {ratio: fetch_ratio(ratio) or "Data not found"
+            for ratio in ("Quick Ratio", "Current Ratio", "Return on Equity (ROE)", "Return on Assets (ROA)",
+                          "Market Cap Growth")}
+
+
+def _reference_labelled_values(html, labels):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def fetch_stat_value(label):
+        for row in soup.find_all('tr'):
+            cols = row.find_all('td')
+            if len(cols) > 1 and label in row.get_text():
+                return cols[1].text.strip()
+        return None
+
+    return {name: fetch_stat_value(label) or "N/A" for name, label in labels.items()}
+
+
+def reference_stock_statistics(html):
+    return _reference_labelled_values(html, {"PB Ratio": 'PB Ratio', "Debt / Equity": 'Debt / Equity'})
+
+
+def reference_analyst_data(html):
+    return _reference_labelled_values(html, {"Expert Recommendation": "Recommendation Rating",
+                                             "Analyst Target Price": "1 Year Target Price"})
+
+
+EXTRACTORS = {
+    'quote': (reference_stock_data, html_extract.extract_stock_data),
+    'financials': (reference_financial_data, html_extract.extract_financial_data),
+    'ratios': (reference_stock_ratios, html_extract.extract_stock_ratios),
+    'statistics': (reference_stock_statistics, html_extract.extract_stock_statistics),
+    'analysis': (reference_analyst_data, html_extract.extract_analyst_data),
+}
+
+# Labels on each synthetic page; the extracted ones are mixed into many others
+PAGE_LABELS = {
+    'quote': ['Market Cap', 'Revenue (ttm)', 'Net Income (ttm)', 'Shares Out', 'EPS (ttm)', 'PE Ratio',
+              'Forward PE', 'Dividend', 'Ex-Dividend Date', 'Volume', 'Open', 'Previous Close', "Day's Range",
+              '52-Week Range', 'Beta', 'RSI', 'Earnings Date'],
+    'financials': ['Revenue', 'Revenue Growth (YoY)', 'Cost of Revenue', 'Gross Profit', 'Operating Expenses',
+                   'Operating Income', 'Pretax Income', 'Net Income', 'EPS (Basic)', 'EPS (Diluted)', 'EPS Growth',
+                   'Free Cash Flow', 'Gross Margin', 'Operating Margin', 'Profit Margin', 'EBITDA',
+                   'EBITDA Margin', 'EBIT', 'EBIT Margin', 'Effective Tax Rate'],
+    'ratios': ['Market Capitalization', 'Market Cap Growth', 'Enterprise Value', 'PE Ratio', 'PS Ratio',
+               'PB Ratio', 'Debt / Equity Ratio', 'Quick Ratio', 'Current Ratio', 'Asset Turnover',
+               'Return on Equity (ROE)', 'Return on Assets (ROA)', 'Return on Capital (ROIC)', 'Earnings Yield',
+               'Dividend Yield', 'Payout Ratio'],
+    'statistics': ['Market Cap', 'Enterprise Value', 'Shares Outstanding', 'PE Ratio', 'Forward PE', 'PS Ratio',
+                   'PB Ratio', 'P/FCF Ratio', 'EV / Sales', 'EV / EBITDA', 'Current Ratio', 'Quick Ratio',
+                   'Debt / Equity', 'Debt / EBITDA', 'Return on Equity (ROE)', 'Beta (5Y)', 'RSI', 'Altman Z-Score'],
+    'analysis': ['Number of Analysts', 'Avg. Estimate', 'Low Estimate', 'High Estimate', 'Year Ago EPS',
+                 'Recommendation Rating', '1 Year Target Price', 'Current Qtr.', 'Next Qtr.', 'Current Year'],
+}
+
+# Bodies a 200 response can carry with nothing in them
+EMPTY_PAGES = ['', ' \n\t ']
+
+
+def synthetic_page(kind, rng):
+    """A page with the markup shape of the real one: navigation, scripts, one or more tables"""
+    parts = ['<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Stock</title>',
+             '<script>', 'window.__data = {"k": [%s]};' % ','.join(str(rng.random()) for _ in range(2000)),
+             '</script></head><body><nav class="flex items-center">']
+    parts += [f'<a class="px-3 py-2 hover:underline" href="/stocks/{i}/">Link &amp; {i}</a>' for i in range(300)]
+    parts.append('</nav><main>')
+    if kind == 'quote':
+        parts.append('<div class="text-4xl font-bold transition-colors duration-300 inline-block">'
+                     f'{rng.uniform(10, 5000):,.2f}</div>')
+    columns = 8 if kind in ('financials', 'ratios') else 1
+    row_class = html_extract.METRIC_ROW_CLASS if kind == 'quote' else 'border-b'
+    for table in range(2):
+        parts.append('<table class="w-full"><thead><tr><th>Field</th>%s</tr></thead><tbody>'
+                     % ''.join(f'<th>FY {2024 - c}</th>' for c in range(columns)))
+        for label in PAGE_LABELS[kind][table::2]:
+            if label == '52-Week Range':
+                values = [f'{rng.uniform(10, 500):.2f} - {rng.uniform(500, 900):.2f}']
+            else:
+                values = ['-' if rng.random() < 0.1 else f'{rng.uniform(-50, 90):.2f}%' for _ in range(columns)]
+            cells = ''.join(f'<td class="px-1 text-right">{value}</td>' for value in values)
+            parts.append(f'<tr class="{row_class}"><td class="px-1"><span>{label}</span></td>{cells}</tr>')
+        parts.append('</tbody></table>')
+    parts.append('</main><footer>' + '<p>Disclaimer text.</p>' * 50 + '</footer></body></html>')
+    return ''.join(parts)
+
+
+def load_pages(fixture_dir, per_kind):
+    pages = {}
+    if fixture_dir:
+        for kind in EXTRACTORS:
+            pages[kind] = []
+            for path in sorted(glob.glob(os.path.join(fixture_dir, kind, '*.html'))):
+                with open(path, 'r', encoding='utf-8') as f:
+                    pages[kind].append(f.read())
+    else:
+        rng = random.Random(0)
+        pages = {kind: [synthetic_page(kind, rng) for _ in range(per_kind)] for kind in EXTRACTORS}
+    return pages
+
+
+def main(fixture_dir=None, per_kind=20):
+    pages = load_pages(fixture_dir, per_kind)
+    parsers = ['html.parser'] + (['lxml'] if html_extract.lxml is not None else [])
+    print(f"{'page':<12}{'pages':>6}{'KB/page':>9}{'bs4 ms':>9}" + ''.join(f"{p + ' ms':>15}" for p in parsers))
+    for kind, (reference, extract) in EXTRACTORS.items():
+        if not pages[kind]:
+            continue
+        start = time.perf_counter()
+        expected = [reference(html) for html in pages[kind]]
+        timings = [(time.perf_counter() - start) / len(pages[kind]) * 1000]
+        for parser in parsers:
+            start = time.perf_counter()
+            results = [extract(html, parser=parser) for html in pages[kind]]
+            timings.append((time.perf_counter() - start) / len(pages[kind]) * 1000)
+            for i, (result, wanted) in enumerate(zip(results, expected)):
+                assert result == wanted, f"{kind} page {i} with {parser}: {result} != {wanted}"
+        size = sum(len(html) for html in pages[kind]) / len(pages[kind]) / 1024
+        print(f"{kind:<12}{len(pages[kind]):>6}{size:>9.0f}" + ''.join(f"{t:>9.1f}" if i == 0 else f"{t:>15.1f}"
+                                                                       for i, t in enumerate(timings)))
+    for kind, (reference, extract) in EXTRACTORS.items():
+        for html in EMPTY_PAGES:
+            for parser in parsers:
+                result, wanted = extract(html, parser=parser), reference(html)
+                assert result == wanted, f"empty {kind} page {html!r} with {parser}: {result} != {wanted}"
+    print("Extracted values match the BeautifulSoup reference on every page")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    fixture_dir = args[0] if args and not args[0].isdigit() else None
+    numbers = [int(a) for a in args if a.isdigit()]
+    main(fixture_dir, *numbers[:1])
@@ -0,0 +1,95 @@
+"""Parity check and benchmark for the news fetcher against the stand-in NewsAPI.
+
+Fetches every company serially (the old one-requests.get-per-row loop) and
+concurrently through the paced FetchEngine, checks both see the same
+articles, then publishes a few new articles and checks the next run only
+fetches and scores those. A keyword classifier stands in for the model.
+
+Usage: python bench_news.py [companies] [latency ms] [server rate/s]   (default: 100 200 10)
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+import news
+from news_store import NewsStore
+from newsapi_standin import StandInNewsAPI
+from sentiment import SentimentCache
+
+API_KEY = 'bench'
+
+
+class KeywordClassifier:
+    """Stand-in for the transformers pipeline that counts the texts it is given"""
+
+    def __init__(self):
+        self.texts = 0
+
+    def __call__(self, texts, **kwargs):
+        self.texts += len(texts)
+        labels = []
+        for text in texts:
+            if any(word in text for word in ('rally', 'record', 'wins')):
+                labels.append({'label': 'positive'})
+            elif any(word in text for word in ('misses', 'probe')):
+                labels.append({'label': 'negative'})
+            else:
+                labels.append({'label': 'neutral'})
+        return labels
+
+
+def main(company_count, latency_ms, rate):
+    server = StandInNewsAPI(latency=latency_ms / 1000, rate=rate, burst=rate).start()
+    news.NEWSAPI_BASE = server.base_url
+    news.NEWSAPI_RATE = (rate, rate)
+    names = [f"Company {i} Ltd" for i in range(company_count)]
+    root = tempfile.mkdtemp(prefix='news_')
+    try:
+        start = time.perf_counter()
+        serial = {}
+        for name in names:
+            serial[name] = news.fetch_news(name, API_KEY)
+            time.sleep(max(0.0, 1 / rate - latency_ms / 1000))  # Stay under the server's limit
+        print(f"Serial fetch of {company_count} companies: {time.perf_counter() - start:.2f}s")
+
+        store = NewsStore(f"{root}/store")
+        server.requests = server.rate_limited = 0
+        start = time.perf_counter()
+        new = news.fetch_new_articles(names, API_KEY, store)
+        print(f"Concurrent fetch: {time.perf_counter() - start:.2f}s "
+              f"({server.requests} requests, {server.rate_limited} rate-limited)")
+        for name in names:
+            assert [a['url'] for a in new[name]] == [a['url'] for a in serial[name]], name
+            assert store.articles(name) == new[name], name
+        print("Concurrent fetch matches the serial one for every company")
+
+        classifier = KeywordClassifier()
+        cache = SentimentCache(f"{root}/cache.json")
+        news.score_stored_articles(store, names, classifier, cache)
+        expected = news.sentiment_by_stock(serial, classifier)
+        for name in names:
+            store.save(name)
+            assert news.stored_sentiment(store, name) == expected[name], name
+        print("Stored sentiment matches scoring the serial fetch")
+
+        published = {name: 1 + i % 3 for i, name in enumerate(names[::10])}
+        for name, count in published.items():
+            server.publish(name, count)
+        store = NewsStore(f"{root}/store")  # Reload from disk, as the next run would
+        classifier.texts = 0
+        start = time.perf_counter()
+        new = news.fetch_new_articles(names, API_KEY, store)
+        scored = news.score_stored_articles(store, names, classifier, cache)
+        print(f"Incremental run: {time.perf_counter() - start:.2f}s, "
+              f"{sum(len(a) for a in new.values())} new articles, {classifier.texts} texts through the model")
+        assert {name: len(a) for name, a in new.items() if a} == published
+        assert classifier.texts <= scored == sum(published.values())
+    finally:
+        server.shutdown()
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [100, 200, 10][len(args):]))
@@ -0,0 +1,93 @@
+"""Parity check and benchmark: per-theme cleaning loop vs the single-pass cleaner.
+
+Usage: python bench_preprocess.py [rows ...]   (default: 100000)
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import preprocess
+
+THEMES = ['Largecap', 'Midcap', 'Smallcap', 'IT', 'Auto', 'Healthcare', 'Realty',
+          'Consumer durables', 'Consumer Discretionary', ' banking ']
+
+
+def synthetic_snapshot(rows, seed=0):
+    """Random raw snapshot shaped like sm.csv: thousands separators, '%', placeholders and blanks."""
+    rng = np.random.default_rng(seed)
+
+    def text(values, suffix=''):
+        out = np.array([f"{v:,.2f}{suffix}" for v in values], dtype=object)
+        picks = rng.random(rows)
+        out[picks < 0.05] = rng.choice(preprocess.PLACEHOLDERS + ['N/A'], int((picks < 0.05).sum()))
+        out[picks > 0.98] = None
+        return out
+
+    def integers(values):
+        # Whole numbers with separators, so some themes convert to int64 on their own
+        return np.array([f"{v:,d}" for v in values], dtype=object)
+
+    return pd.DataFrame({
+        'Stock Symbol': [f"SYM{i}" for i in range(rows)],
+        'Full Name': [f"Company {i}, Ltd" for i in range(rows)],
+        'Theme': rng.choice(THEMES + [None], rows, p=[0.095] * 10 + [0.05]),
+        'Current Price': text(rng.uniform(1, 90000, rows)),
+        'P/E Ratio': rng.uniform(1, 90, rows).round(2),
+        'Beta': rng.uniform(-0.5, 3, rows).round(3),
+        '52-Week High': text(rng.uniform(1, 90000, rows)),
+        'Employees': integers(rng.integers(10, 5_000_000, rows)),
+        'Revenue Growth (YoY)': text(rng.uniform(-50, 80, rows), '%'),
+        'EPS Growth': text(rng.uniform(-80, 120, rows), '%'),
+        'Profit Margin': text(rng.uniform(-30, 60, rows), '%'),
+        'Return on Equity (ROE)': text(rng.uniform(-30, 60, rows), '%'),
+        'Debt / Equity': text(rng.uniform(0, 4, rows)),
+        'Expert Recommendation': rng.choice(['Buy', 'Hold', 'Sell', 'n/a'], rows),
+        'News Sentiment': rng.choice(['Positive', 'Neutral', 'Negative', '-'], rows),
+    })
+
+
+def legacy_split(df):
+    """The original loop: filter, replace, two apply passes and to_numeric, once per theme."""
+    df = df.copy()
+    df['Theme'] = df['Theme'].str.strip().str.lower()
+    themes = {}
+    for theme in df['Theme'].unique():
+        if pd.isna(theme):
+            continue
+        filtered_df = df[df['Theme'] == theme].copy()
+        filtered_df = filtered_df.replace(preprocess.PLACEHOLDERS, np.nan)
+        filtered_df = filtered_df.apply(lambda x: x.str.replace(',', '', regex=True) if x.dtype == 'object' else x)
+        filtered_df = filtered_df.apply(lambda x: x.str.replace('%', '', regex=True) if x.dtype == 'object' else x)
+        for column in filtered_df.columns:
+            if column not in preprocess.EXCLUDE_COLUMNS:
+                filtered_df[column] = pd.to_numeric(filtered_df[column], errors='coerce').round(2)
+        themes[theme] = filtered_df
+    return themes
+
+
+def run(rows):
+    df = synthetic_snapshot(rows)
+
+    start = time.perf_counter()
+    legacy = legacy_split(df)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single_pass = preprocess.split_frame_by_theme(df)
+    single_time = time.perf_counter() - start
+
+    # Compare what split_by_theme would write
+    assert list(legacy) == list(single_pass), "themes differ"
+    for theme in legacy:
+        if legacy[theme].to_csv(index=False) != single_pass[theme].to_csv(index=False):
+            raise AssertionError(f"{theme}: CSV output differs at {rows} rows")
+
+    print(f"{rows:>9,} rows  {len(legacy)} themes  per-theme {legacy_time:7.3f}s  single pass {single_time:7.3f}s  "
+          f"speedup {legacy_time / single_time:5.1f}x  (parity ok)")
+
+
+if __name__ == "__main__":
+    for rows in [int(arg) for arg in sys.argv[1:]] or [100_000]:
+        run(rows)
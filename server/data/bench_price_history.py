@@ -0,0 +1,86 @@
+"""Parity check and benchmark for the price history store.
+
+Backfills synthetic OHLCV for many symbols, appends daily fundamentals in
+small batches (triggering compaction), checks reads against a dict of
+every value appended, and times a one-year read of every symbol.
+
+Usage: python bench_price_history.py [symbols] [years]   (default: 1000 5)
+"""
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import price_history
+from price_history import PriceHistory, PRICE_FIELDS
+
+
+def main(symbol_count, years):
+    rng = np.random.default_rng(0)
+    root = tempfile.mkdtemp(prefix='price_history_')
+    try:
+        symbols = [f"SYM{i}" for i in range(symbol_count)]
+        end = datetime.date.today().toordinal()
+        days = np.arange(end - years * 365, end - 30)
+        days = days[(days % 7) < 5]  # Weekdays only
+        expected = {}
+
+        # Backfill: one bulk append of every symbol's OHLCV, in shuffled row order
+        sym, day = np.repeat(np.arange(symbol_count), len(days)), np.tile(days, symbol_count)
+        order = rng.permutation(len(day))
+        sym, day = sym[order], day[order]
+        fields = {field: rng.uniform(10, 1000, len(day)).round(2) for field in PRICE_FIELDS}
+        start = time.perf_counter()
+        PriceHistory(root).append([symbols[s] for s in sym], day, fields)
+        print(f"Backfilled {len(day):,} rows in {time.perf_counter() - start:.2f}s")
+        for i in range(len(day)):
+            expected[(sym[i], day[i])] = {field: fields[field][i] for field in PRICE_FIELDS}
+
+        # Daily refreshes: close and a fundamental, some values missing, some days repeated
+        store = PriceHistory(root)
+        start = time.perf_counter()
+        for day in list(range(end - 29, end + 1)) + [end - 3, end]:
+            close = rng.uniform(10, 1000, symbol_count).round(2)
+            beta = rng.uniform(0, 2, symbol_count).round(2)
+            beta[rng.random(symbol_count) < 0.2] = np.nan
+            store.append(symbols, [day] * symbol_count, {'Close': close, 'Beta': beta})
+            for s in range(symbol_count):
+                row = expected.setdefault((s, day), {})
+                row['Close'] = close[s]
+                if not np.isnan(beta[s]):
+                    row['Beta'] = beta[s]
+        print(f"Appended 32 daily batches in {time.perf_counter() - start:.2f}s, {len(store.parts)} parts")
+
+        # Parity: a random subset of symbols over a window spanning the backfill and the refreshes
+        picked = sorted(rng.choice(symbol_count, min(50, symbol_count), replace=False).tolist())
+        read_days, read = PriceHistory(root).read([symbols[s] for s in picked] + ['UNKNOWN'],
+                                                  end - 400, end, PRICE_FIELDS + ['Beta'])
+        for field, matrix in read.items():
+            assert np.isnan(matrix[:, -1]).all()
+            for j, s in enumerate(picked):
+                for i, d in enumerate(read_days.tolist()):
+                    want = expected.get((s, d), {}).get(field, np.nan)
+                    got = matrix[i, j]
+                    assert (np.isnan(want) and np.isnan(got)) or want == got, (field, s, d, want, got)
+        assert set(read_days.tolist()) == {d for (s, d) in expected if s in picked and d >= end - 400}
+        print("Reads match every appended value")
+
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            read_days, closes = price_history.load_closes(symbols, 365, end, root=root)
+            elapsed = time.perf_counter() - start
+            print(f"  1 year x {symbol_count} symbols ({label}): {elapsed * 1000:.1f} ms, "
+                  f"{closes.shape[0]} days, {int(np.isnan(closes).sum())} gaps")
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        print(f"Store size: {size / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [1000, 5][len(args):]))
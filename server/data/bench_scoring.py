@@ -0,0 +1,333 @@
+"""Parity check and benchmark: per-cell score_* functions vs the compiled scoring rules.
+
+Also scores a frame with a Theme column under an IT override (its own Beta
+bands and weights) and checks that only the IT rows' Beta score and totals
+change.
+
+Usage: python bench_scoring.py [rows ...]   (default: 10000 1000000)
+"""
+import copy
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_scoring():
+    spec = importlib.util.spec_from_file_location('scoring_and_ranking', os.path.join(DATA_DIR, 'Scoring and Ranking.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The per-cell score_* functions Scoring and Ranking.py had before scoring_rules.json,
+# frozen here as the parity reference for the compiled rules
+def score_revenue_growth(value):
+    """Score revenue growth based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 20:
+        return 10
+    elif value > 10:
+        return 8
+    elif value > 5:
+        return 6
+    elif value > 1:
+        return 4
+    else:
+        return 2
+
+
+def score_eps_growth(value):
+    """Score EPS growth based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 25:
+        return 10
+    elif value > 15:
+        return 8
+    elif value > 5:
+        return 6
+    elif value > 0:
+        return 4
+    else:
+        return 1
+
+
+def score_rsi(value):
+    """Score RSI based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif 30 <= value <= 50:
+        return 10
+    elif 50 < value <= 70:
+        return 8
+    else:
+        return 4
+
+
+def score_analyst_target_price(current_price, analyst_target_price):
+    """Score analyst target price based on potential upside."""
+    if pd.isna(current_price) or pd.isna(analyst_target_price) or current_price == '-' or analyst_target_price == '-':
+        return 0
+    potential_upside = (analyst_target_price - current_price) / current_price * 100
+    if potential_upside > 30:
+        return 10
+    elif potential_upside > 20:
+        return 8
+    elif potential_upside > 10:
+        return 6
+    elif potential_upside > 0:
+        return 4
+    else:
+        return 2
+
+
+def score_beta(value):
+    """Score Beta based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif 0.8 <= value <= 1.2:
+        return 10
+    elif 0.5 <= value < 0.8:
+        return 8
+    elif 1.2 < value <= 1.5:
+        return 6
+    else:
+        return 4
+
+
+def score_profit_margin(value):
+    """Score profit margin based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 25:
+        return 10
+    elif value > 18:
+        return 8
+    elif value > 12:
+        return 6
+    elif value > 5:
+        return 4
+    else:
+        return 2
+
+
+def score_ebitda_margin(value):
+    """Score EBITDA margin based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 25:
+        return 10
+    elif value > 18:
+        return 8
+    elif value > 12:
+        return 6
+    elif value > 5:
+        return 4
+    else:
+        return 2
+
+
+def score_roe(value):
+    """Score Return on Equity (ROE) based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 25:
+        return 10
+    elif value > 15:
+        return 8
+    elif value > 10:
+        return 6
+    elif value > 5:
+        return 4
+    else:
+        return 2
+
+
+def score_debt_equity(value):
+    """Score Debt/Equity ratio based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value < 0.5:
+        return 10
+    elif value <= 1:
+        return 8
+    elif value <= 1.5:
+        return 6
+    elif value <= 2:
+        return 4
+    else:
+        return 2
+
+
+def score_roa(value):
+    """Score Return on Assets (ROA) based on predefined thresholds."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif value > 10:
+        return 10
+    elif value > 7:
+        return 8
+    elif value > 4:
+        return 6
+    elif value > 1:
+        return 4
+    else:
+        return 2
+
+
+def score_expert_recommendation(value):
+    """Score Expert Recommendation based on predefined categories."""
+    if pd.isna(value):
+        return 0
+    scores = {'strong buy': 10, 'buy': 8, 'hold': 6, 'underperform': 4, 'sell': 2}
+    return scores.get(value, 0)
+
+
+def score_news_sentiment(value):
+    """Score News Sentiment based on predefined categories."""
+    if pd.isna(value):
+        return 0
+    scores = {'Positive': 10, 'Neutral': 6, 'Negative': 2}
+    return scores.get(value, 0)
+
+
+# Override used by check_theme_override: IT stocks trade at lower betas, so the bands shift down
+IT_OVERRIDE = {
+    'metrics': {'Beta Score': {'bins': [
+        {'ge': 0.6, 'le': 1.0, 'score': 10},
+        {'ge': 0.4, 'lt': 0.6, 'score': 8},
+        {'gt': 1.0, 'le': 1.3, 'score': 6},
+    ]}},
+    'weights': {'Beta Score': 0.1, 'RSI Score': 0.05},
+}
+
+
+def score_beta_it(value):
+    """score_beta under IT_OVERRIDE's bands."""
+    if pd.isna(value) or value == '-':
+        return 0
+    elif 0.6 <= value <= 1.0:
+        return 10
+    elif 0.4 <= value < 0.6:
+        return 8
+    elif 1.0 < value <= 1.3:
+        return 6
+    else:
+        return 4
+
+
+def synthetic_frame(rows, seed=0):
+    """Random universe covering every threshold boundary, NaNs and the categorical labels."""
+    rng = np.random.default_rng(seed)
+
+    def column(low, high, boundaries):
+        values = rng.uniform(low, high, rows).round(2)
+        picks = rng.random(rows)
+        values[picks < 0.1] = rng.choice(boundaries, int((picks < 0.1).sum()))
+        values[picks > 0.95] = np.nan
+        return values
+
+    return pd.DataFrame({
+        'Stock Symbol': [f"SYM{i}" for i in range(rows)],
+        'Current Price': column(0, 5000, [0.0, 100.0]),
+        'Analyst Target Price': column(0, 6000, [0.0, 110.0, 120.0, 130.0]),
+        'Revenue Growth (YoY)': column(-50, 80, [1, 5, 10, 20]),
+        'EPS Growth': column(-80, 120, [0, 5, 15, 25]),
+        'RSI': column(0, 100, [30, 50, 70]),
+        'Beta': column(-0.5, 3, [0.5, 0.8, 1.2, 1.5]),
+        'Profit Margin': column(-30, 60, [5, 12, 18, 25]),
+        'EBITDA Margin': column(-30, 60, [5, 12, 18, 25]),
+        'Return on Equity (ROE)': column(-30, 60, [5, 10, 15, 25]),
+        'Debt / Equity': column(0, 4, [0.5, 1, 1.5, 2]),
+        'Return on Assets (ROA)': column(-10, 30, [1, 4, 7, 10]),
+        'Expert Recommendation': rng.choice(['strong buy', 'buy', 'hold', 'underperform', 'sell', 'Buy', None], rows),
+        'News Sentiment': rng.choice(['Positive', 'Neutral', 'Negative', 'No News', None], rows),
+    })
+
+
+def legacy_scores(scoring, data):
+    """The original Series.apply / row-wise apply path over the reference functions."""
+    out = pd.DataFrame(index=data.index)
+    out['Revenue Growth (YoY) Score'] = data['Revenue Growth (YoY)'].apply(score_revenue_growth)
+    out['EPS Growth Score'] = data['EPS Growth'].apply(score_eps_growth)
+    out['RSI Score'] = data['RSI'].apply(score_rsi)
+    out['Analyst Target Price Score'] = data.apply(
+        lambda row: score_analyst_target_price(row['Current Price'], row['Analyst Target Price']), axis=1
+    )
+    out['Beta Score'] = data['Beta'].apply(score_beta)
+    out['Profit Margin Score'] = data['Profit Margin'].apply(score_profit_margin)
+    out['EBITDA Margin Score'] = data['EBITDA Margin'].apply(score_ebitda_margin)
+    out['Return on Equity (ROE) Score'] = data['Return on Equity (ROE)'].apply(score_roe)
+    out['Debt/Equity Ratio Score'] = data['Debt / Equity'].apply(score_debt_equity)
+    out['Return on Assets (ROA) Score'] = data['Return on Assets (ROA)'].apply(score_roa)
+    out['Expert Recommendation Score'] = data['Expert Recommendation'].apply(score_expert_recommendation)
+    out['News Sentiment Score'] = data['News Sentiment'].apply(score_news_sentiment)
+    weights = dict(zip(scoring.RULES.names, scoring.RULES.profile().weights))
+    out['Total Score'] = sum([out[col] * weight for col, weight in weights.items()])
+    return out
+
+
+def vectorized_scores(scoring, data):
+    matrix, totals = scoring.RULES.score(data)
+    out = pd.DataFrame(matrix.T, columns=scoring.RULES.names, index=data.index)
+    out['Total Score'] = totals
+    return out
+
+
+def run(rows):
+    scoring = load_scoring()
+    # Analyst scoring is row-wise in the legacy path; keep prices non-zero so it cannot divide by zero
+    data = synthetic_frame(rows)
+    data.loc[data['Current Price'] == 0, 'Current Price'] = 1.0
+
+    start = time.perf_counter()
+    legacy = legacy_scores(scoring, data)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = vectorized_scores(scoring, data)
+    vector_time = time.perf_counter() - start
+
+    for column in legacy.columns:
+        if not np.array_equal(legacy[column].to_numpy(), vectorized[column].to_numpy()):
+            mismatches = int((legacy[column] != vectorized[column]).sum())
+            raise AssertionError(f"{column}: {mismatches} rows differ at {rows} rows")
+
+    print(f"{rows:>9,} rows  legacy {legacy_time:8.3f}s  vectorized {vector_time:8.4f}s  "
+          f"speedup {legacy_time / vector_time:7.1f}x  (parity ok)")
+    check_theme_override(scoring, data, legacy)
+
+
+def check_theme_override(scoring, data, legacy):
+    """Score under IT_OVERRIDE; only IT rows' Beta score and totals may differ from the legacy scores."""
+    spec = copy.deepcopy(scoring.RULES.spec)
+    spec['themes'] = {'IT': IT_OVERRIDE}
+    rules = type(scoring.RULES)(spec)
+    data = data.assign(Theme=np.random.default_rng(1).choice(['IT', ' it ', 'Auto', 'Healthcare', None], len(data)))
+    matrix, totals = rules.score(data)
+    themed = pd.DataFrame(matrix.T, columns=rules.names, index=data.index)
+    themed['Total Score'] = totals
+
+    it = data['Theme'].astype(str).str.strip().str.lower().to_numpy() == 'it'
+    expected = legacy.copy()
+    expected.loc[it, 'Beta Score'] = data.loc[it, 'Beta'].apply(score_beta_it)
+    weights = dict(zip(rules.names, scoring.RULES.profile().weights), **IT_OVERRIDE['weights'])
+    expected.loc[it, 'Total Score'] = sum([expected.loc[it, col] * weight for col, weight in weights.items()])
+    for column in expected.columns:
+        if not np.allclose(expected[column].to_numpy(float), themed[column].to_numpy(float), rtol=0, atol=1e-9):
+            mismatches = int((~np.isclose(expected[column], themed[column], rtol=0, atol=1e-9)).sum())
+            raise AssertionError(f"{column}: {mismatches} rows differ under the IT override")
+    changed = int((themed['Beta Score'] != legacy['Beta Score']).sum())
+    print(f"{'':>9}  IT override on {int(it.sum()):,} rows: {changed:,} Beta scores changed, other themes untouched")
+
+
+if __name__ == "__main__":
+    for rows in [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000]:
+        run(rows)
@@ -0,0 +1,211 @@
+"""Scraper benchmark suite over replayed fixtures.
+
+Serves a fixture directory (see fixture_server.py) with the given
+latency, jitter and error rate, and points data_update at it. Every
+stock is then scraped under several setups:
+- serially, the way data_update used to work;
+- through a FetchEngine at each per-host concurrency limit;
+- through an HTTPCache, cold and then warm;
+- with each installed HTML parser.
+
+For each setup the suite prints:
+- symbols per second;
+- p50 and p95 latency of the pages fetched over the network;
+- requests, errors and bytes sent by the server;
+- mean parse-and-extract time per page for each fetcher.
+
+Without injected errors, every setup must extract the same values.
+Without a fixture directory, synthetic pages for --symbols stocks are
+generated.
+
+Usage: python bench_scraper.py [fixture dir] [--symbols 50] [--latency-ms 80] [--jitter-ms 40]
+                               [--error-rate 0] [--limits 2,8,16]
+"""
+import argparse
+import glob
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+import data_update
+import html_extract
+from bench_extract import synthetic_page
+from fetch_engine import FetchEngine
+from fixture_server import FixtureServer, PAGE_PATHS, fixture_path
+from http_cache import HTTPCache
+
+EXTRACTORS = {
+    'quote': 'extract_stock_data',
+    'financials': 'extract_financial_data',
+    'ratios': 'extract_stock_ratios',
+    'statistics': 'extract_stock_statistics',
+    'analysis': 'extract_analyst_data',
+}
+
+
+class TimedSession:
+    """Session wrapper recording the latency of each request that goes over the wire.
+
+    requests' `elapsed` runs from sending the request to parsing the response
+    headers, so time spent queueing for the engine's per-host limit is left out.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        response = self.session.get(url, headers=headers, **kwargs)
+        elapsed = response.elapsed
+        with self._lock:
+            self.latencies.append(elapsed.total_seconds())
+        return response
+
+
+class ParseTimer:
+    """Wraps html_extract's extract_* functions to total their CPU time per page kind.
+
+    Thread CPU time rather than wall time, so pages parsed on other threads
+    at the same moment are not counted against each other.
+    """
+
+    def __init__(self):
+        self.seconds = {kind: 0.0 for kind in EXTRACTORS}
+        self.pages = {kind: 0 for kind in EXTRACTORS}
+        self._lock = threading.Lock()
+        self._originals = {name: getattr(html_extract, name) for name in EXTRACTORS.values()}
+        for kind, name in EXTRACTORS.items():
+            setattr(html_extract, name, self._timed(kind, self._originals[name]))
+
+    def _timed(self, kind, extract):
+        def timed(html, parser=None):
+            start = time.thread_time()
+            try:
+                return extract(html, parser)
+            finally:
+                with self._lock:
+                    self.seconds[kind] += time.thread_time() - start
+                    self.pages[kind] += 1
+        return timed
+
+    def reset(self):
+        with self._lock:
+            self.seconds = dict.fromkeys(self.seconds, 0.0)
+            self.pages = dict.fromkeys(self.pages, 0)
+
+    def per_page_ms(self):
+        return {kind: 1000 * self.seconds[kind] / self.pages[kind] if self.pages[kind] else None
+                for kind in EXTRACTORS}
+
+    def restore(self):
+        for name, extract in self._originals.items():
+            setattr(html_extract, name, extract)
+
+
+def write_synthetic_fixtures(fixture_dir, count):
+    rng = random.Random(0)
+    for i in range(count):
+        for kind in PAGE_PATHS:
+            path = fixture_path(fixture_dir, kind, f"SYM{i}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(synthetic_page(kind, rng))
+
+
+def fixture_symbols(fixture_dir):
+    return sorted(os.path.splitext(os.path.basename(path))[0]
+                  for path in glob.glob(os.path.join(fixture_dir, 'quote', '*.html')))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * p // 100)] if values else float('nan')
+
+
+def run_scenario(name, symbols, server, timer, fetch):
+    server.reset_stats()
+    timer.reset()
+    start = time.perf_counter()
+    results, latencies = fetch(symbols)
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    parse = timer.per_page_ms()
+    print(f"{name:<24}{len(symbols) / elapsed:>9.1f}{1000 * percentile(latencies, 50):>8.0f}"
+          f"{1000 * percentile(latencies, 95):>8.0f}{stats['requests']:>7}{stats['errors']:>6}"
+          f"{stats['bytes_sent'] / 1e6:>9.2f}  "
+          + ' '.join(f"{kind[:5]} {ms:.1f}" for kind, ms in parse.items() if ms is not None))
+    return results
+
+
+def serial_fetch(symbols):
+    session = TimedSession(requests.Session())
+    results = {symbol: data_update.fetch_all_stock_data(symbol, session) for symbol in symbols}
+    return results, session.latencies
+
+
+def engine_fetch(limit, cache_dir=None):
+    def fetch(symbols):
+        with FetchEngine(per_host_limit=limit) as engine:
+            timed = TimedSession(engine)
+            session = HTTPCache(timed, cache_dir) if cache_dir else timed
+            return data_update.fetch_all_stocks_data(symbols, engine, session=session), timed.latencies
+    return fetch
+
+
+def main(fixture_dir=None, symbol_count=50, latency=0.08, jitter=0.04, error_rate=0.0, limits=(2, 8, 16)):
+    work_dir = tempfile.mkdtemp(prefix='bench_scraper_')
+    if fixture_dir is None:
+        fixture_dir = os.path.join(work_dir, 'fixtures')
+        write_synthetic_fixtures(fixture_dir, symbol_count)
+    symbols = fixture_symbols(fixture_dir)
+    server = FixtureServer(fixture_dir, latency=latency, jitter=jitter, error_rate=error_rate, seed=0).start()
+    data_update.STOCKANALYSIS_BASE = data_update.YAHOO_BASE = server.base_url
+    timer = ParseTimer()
+    default_parser = html_extract.DEFAULT_PARSER
+    print(f"{len(symbols)} symbols from {fixture_dir}, latency {latency * 1000:.0f}±{jitter * 1000:.0f} ms, "
+          f"error rate {error_rate:.0%}, parser {default_parser}")
+    print(f"{'setup':<24}{'sym/s':>9}{'p50 ms':>8}{'p95 ms':>8}{'reqs':>7}{'errs':>6}{'MB sent':>9}  "
+          "parse ms/page")
+    try:
+        runs = {'serial': run_scenario('serial', symbols, server, timer, serial_fetch)}
+        for limit in limits:
+            name = f'engine, {limit} per host'
+            runs[name] = run_scenario(name, symbols, server, timer, engine_fetch(limit))
+        cache_dir = os.path.join(work_dir, 'http_cache')
+        for state in ('cold', 'warm'):
+            name = f'engine {max(limits)} + cache, {state}'
+            runs[name] = run_scenario(name, symbols, server, timer, engine_fetch(max(limits), cache_dir))
+        for parser in ['html.parser'] + (['lxml'] if html_extract.lxml is not None else []):
+            html_extract.DEFAULT_PARSER = parser
+            name = f'engine {max(limits)}, {parser}'
+            runs[name] = run_scenario(name, symbols, server, timer, engine_fetch(max(limits)))
+        html_extract.DEFAULT_PARSER = default_parser
+
+        if error_rate == 0:
+            reference = runs['serial']
+            for name, results in runs.items():
+                assert results == reference, f"{name} extracted different values than the serial scrape"
+            print("Every setup extracted the same values")
+    finally:
+        timer.restore()
+        server.shutdown()
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against replayed fixtures")
+    parser.add_argument('fixture_dir', nargs='?', help="Recorded fixtures (default: synthetic pages)")
+    parser.add_argument('--symbols', type=int, default=50, help="Synthetic stocks to generate")
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    parser.add_argument('--jitter-ms', type=float, default=40.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--limits', default='2,8,16', help="Per-host concurrency limits to compare")
+    args = parser.parse_args()
+    main(args.fixture_dir, args.symbols, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+         [int(limit) for limit in args.limits.split(',')])
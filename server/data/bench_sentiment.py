@@ -0,0 +1,91 @@
+"""Parity check and throughput benchmark for the sentiment backends.
+
+Labels a corpus of headlines with the fp32 pytorch pipeline, then with each
+other backend, and reports load time, articles per second and how many
+labels agree with fp32. Backends whose libraries are not installed are
+skipped. The corpus is the articles in a news store if one is given,
+otherwise synthetic headlines.
+
+Usage: python bench_sentiment.py [articles] [batch size] [threads] [news store dir]
+       (default: 2000 32 all-cores, synthetic headlines)
+"""
+import glob
+import json
+import os
+import resource
+import sys
+import time
+
+import sentiment
+from news import article_text
+
+MIN_AGREEMENT = 0.98
+
+COMPANIES = ['Reliance Industries', 'Tata Motors', 'Infosys', 'HDFC Bank', 'Sun Pharma', 'DLF', 'Titan Company',
+             'Bajaj Auto', 'Havells India', 'Zomato']
+HEADLINES = ['{c} shares rally {n}% after strong quarterly results', '{c} misses estimates as margins shrink by {n} bps',
+             '{c} announces board meeting on {n} October', '{c} wins Rs {n} crore order, stock hits record high',
+             '{c} faces regulatory probe over disclosures in {n} filings', '{c} holds annual general meeting',
+             '{c} cuts revenue guidance by {n}% citing weak demand', '{c} promoters raise stake to {n}%',
+             'Brokerages see {n}% upside in {c} after capacity expansion',
+             '{c} reports {n}% drop in net profit on higher input costs']
+
+
+def load_corpus(count, store_dir=None):
+    if store_dir:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(store_dir, '*.json'))):
+            with open(path, 'r') as f:
+                texts += [article_text(article) for article in json.load(f)['articles']]
+        return [text for text in texts if text][:count]
+    return [HEADLINES[i % len(HEADLINES)].format(c=COMPANIES[i // len(HEADLINES) % len(COMPANIES)], n=3 + i % 97)
+            for i in range(count)]
+
+
+def run(classifier, texts, batch_size):
+    """Labels of texts in length-sorted batches, as classify_texts sends them"""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    labels = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        for i, result in zip(batch, classifier([texts[i] for i in batch], batch_size=len(batch),
+                                               truncation=True, max_length=512)):
+            labels[i] = result['label'].lower()
+    return labels
+
+
+def main(count, batch_size, threads, store_dir=None):
+    texts = load_corpus(count, store_dir)
+    print(f"{len(texts)} articles, batch size {batch_size}, {sentiment.pin_threads(threads)} threads")
+    reference = None
+    for backend in sentiment.BACKENDS:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        try:
+            classifier = sentiment.load_classifier(backend=backend, threads=threads)
+        except ImportError as e:
+            print(f"  {backend:<10} skipped: {e}")
+            continue
+        load_time = time.perf_counter() - start
+        grown = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024
+        run(classifier, texts[:batch_size], batch_size)  # Warm up
+
+        start = time.perf_counter()
+        labels = run(classifier, texts, batch_size)
+        elapsed = time.perf_counter() - start
+        line = (f"  {backend:<10} load {load_time:5.1f}s (+{grown:.0f} MB peak), "
+                f"{len(texts) / elapsed:7.1f} articles/s")
+        if reference is None:
+            reference = labels
+            print(line + " (reference)")
+            continue
+        agreement = sum(a == b for a, b in zip(labels, reference)) / len(texts)
+        print(line + f", {agreement:.1%} of labels match fp32")
+        assert agreement >= MIN_AGREEMENT, f"{backend} disagrees with fp32 on {1 - agreement:.1%} of articles"
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    numbers = [int(a) for a in args[:3]]
+    count, batch_size, threads = numbers + [2000, 32, 0][len(numbers):]
+    main(count, batch_size, threads or None, args[3] if len(args) > 3 else None)
@@ -0,0 +1,88 @@
+"""Benchmark of the sentiment service's micro-batching.
+
+Many concurrent clients send small classify requests. They are timed
+against calling a shared model directly, one request at a time. A
+stand-in model with a fixed cost per call plus a cost per text plays the
+part of the transformer, whose batches cost far less than their texts
+one by one. The script also checks that the service's labels match the
+direct ones and prints the service's metrics.
+
+Usage: python bench_sentiment_service.py [clients] [requests per client] [texts per request]
+       (default: 16 50 1)
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from bench_sentiment import load_corpus
+from bench_news import KeywordClassifier
+from sentiment_service import SentimentClient, SentimentService
+
+CALL_COST = 0.02  # Seconds per model call
+TEXT_COST = 0.001  # Seconds per text in a call
+
+
+class CostlyClassifier(KeywordClassifier):
+    """Keyword labels at roughly a small transformer's batch cost profile on CPU"""
+
+    def __call__(self, texts, **kwargs):
+        time.sleep(CALL_COST + TEXT_COST * len(texts))
+        return super().__call__(texts, **kwargs)
+
+
+def run_clients(clients, work):
+    threads = [threading.Thread(target=work, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main(clients, requests_per_client, texts_per_request):
+    texts = load_corpus(clients * requests_per_client * texts_per_request)
+    chunks = [texts[i:i + texts_per_request] for i in range(0, len(texts), texts_per_request)]
+    total = len(texts)
+
+    classifier = CostlyClassifier()
+    model_lock = threading.Lock()  # A pipeline serves one call at a time
+    direct = {}
+
+    def direct_work(c):
+        for i in range(c, len(chunks), clients):
+            with model_lock:
+                direct[i] = [r['label'] for r in classifier(chunks[i])]
+
+    elapsed = run_clients(clients, direct_work)
+    print(f"Direct: {total} texts from {clients} clients in {elapsed:.2f}s ({total / elapsed:.0f} texts/s)")
+
+    path = os.path.join(tempfile.mkdtemp(prefix='sentiment_service_'), 'sentiment.sock')
+    service = SentimentService(CostlyClassifier(), path).start()
+    served = {}
+    try:
+        def service_work(c):
+            client = SentimentClient(path)
+            for i in range(c, len(chunks), clients):
+                served[i] = client.classify(chunks[i])
+            client.close()
+
+        elapsed = run_clients(clients, service_work)
+        print(f"Service: {total} texts from {clients} clients in {elapsed:.2f}s ({total / elapsed:.0f} texts/s)")
+        assert served == direct, "service labels differ from direct classification"
+        print("Service labels match direct classification")
+        client = SentimentClient(path)
+        print(json.dumps(client.metrics(), indent=2))
+        client.close()
+    finally:
+        service.shutdown()
+        service.server_close()
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [16, 50, 1][len(args):]))
@@ -1,208 +1,300 @@
+import datetime
+import glob
+import os
 import requests
-from bs4 import BeautifulSoup
 import yfinance as yf
 import warnings
+import numpy as np
 import pandas as pd
 
+from fetch_engine import FetchEngine
+from http_cache import HTTPCache, DEFAULT_CACHE_DIR
+import html_extract
+from price_history import PriceHistory, DEFAULT_HISTORY_DIR, PRICE_FIELDS
+import preprocess
+
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+# Base URLs can be pointed at a local stand-in server serving saved pages
+STOCKANALYSIS_BASE = os.environ.get('STOCKANALYSIS_BASE', 'https://stockanalysis.com').rstrip('/')
+YAHOO_BASE = os.environ.get('YAHOO_BASE', 'https://finance.yahoo.com').rstrip('/')
+
 # Function to fetch stock price and key metrics
-def fetch_stock_data(stock_symbol):
-    url = f"https://stockanalysis.com/quote/nse/{stock_symbol}/"
-    response = requests.get(url)
+def fetch_stock_data(stock_symbol, session=requests):
+    url = f"{STOCKANALYSIS_BASE}/quote/nse/{stock_symbol}/"
+    response = session.get(url)
     
     if response.status_code != 200:
         print(f"Failed to fetch data for {stock_symbol}")
         return None
     
-    soup = BeautifulSoup(response.text, 'html.parser')
-    metrics = { 'Current Price': 'N/A', 'P/E Ratio': 'N/A', 'Beta': 'N/A', 
-                'RSI': 'N/A', 'EPS (ttm)': 'N/A', '52-Week Low': 'N/A', '52-Week High': 'N/A' }
-
-    #price = soup.find('div', class_='text-4xl font-bold inline-block')
-    price = soup.find('div', class_='text-4xl font-bold transition-colors duration-300 inline-block')
-
-    if price:
-        metrics['Current Price'] = price.text.strip()
-
-    rows = soup.find_all('tr', class_='flex flex-col border-b border-default py-1 sm:table-row sm:py-0')
-    for row in rows:
-        cols = row.find_all('td')
-        if len(cols) > 1:
-            key, value = cols[0].text.strip(), cols[1].text.strip()
-            if 'PE Ratio' in key: metrics['P/E Ratio'] = value
-            elif 'Beta' in key: metrics['Beta'] = value
-            elif 'RSI' in key: metrics['RSI'] = value
-            elif 'EPS (ttm)' in key: metrics['EPS (ttm)'] = value
-            elif '52-Week Range' in key:
-                try:
-                    low, high = value.split('-')
-                    metrics['52-Week Low'] = low.strip()
-                    metrics['52-Week High'] = high.strip()
-                except ValueError:
-                    metrics['52-Week Low'] = metrics['52-Week High'] = 'N/A'
-
-    return metrics
+    return html_extract.extract_stock_data(response.text)
 
 
 # Function to fetch financial data (Revenue Growth, EPS Growth, Profit Margin, EBITDA Margin)
-def fetch_financial_data(stock_symbol):
-    url = f'https://stockanalysis.com/quote/nse/{stock_symbol}/financials/'
-    response = requests.get(url)
+def fetch_financial_data(stock_symbol, session=requests):
+    url = f'{STOCKANALYSIS_BASE}/quote/nse/{stock_symbol}/financials/'
+    response = session.get(url)
     
     if response.status_code != 200:
         print(f"Failed to fetch data for {stock_symbol}. HTTP Status Code: {response.status_code}")
         return None
     
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    def fetch_growth_value(label):
-        growth_section = soup.find(string=label)
-        if growth_section:
-            value_cell = growth_section.find_parent('tr').find_all('td')[1]
-            return value_cell.text.strip()
-        return "Data not found"
-
-    metrics = {
-        "Revenue Growth (YoY)": fetch_growth_value("Revenue Growth (YoY)"),
-        "EPS Growth": fetch_growth_value("EPS Growth"),
-        "Profit Margin": fetch_growth_value("Profit Margin"),
-        "EBITDA Margin": fetch_growth_value("EBITDA Margin")
-    }
-
-    return metrics
+    return html_extract.extract_financial_data(response.text)
 
 
 # Function to fetch stock ratios (Quick Ratio, Current Ratio, ROE, ROA, Market Cap Growth)
-def fetch_stock_ratios(stock_symbol):
-    url = f'https://stockanalysis.com/quote/nse/{stock_symbol}/financials/ratios/'
-    response = requests.get(url)
-    ratios = {
-        "Quick Ratio": None,
-        "Current Ratio": None,
-        "Return on Equity (ROE)": None,
-        "Return on Assets (ROA)": None,
-        "Market Cap Growth": None
-    }
+def fetch_stock_ratios(stock_symbol, session=requests):
+    url = f'{STOCKANALYSIS_BASE}/quote/nse/{stock_symbol}/financials/ratios/'
+    response = session.get(url)
     
     if response.status_code != 200:
         print(f"Failed to fetch ratios for {stock_symbol}")
-        return ratios
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    def fetch_ratio(ratio_name):
-        row = soup.find(string=ratio_name)
-        if row:
-            columns = row.find_parent('tr').find_all('td')
-            if len(columns) > 1:
-                return columns[2].text.strip() if columns[1].text.strip() == '-' and len(columns) > 2 else columns[1].text.strip()
-        return None
-
-    for ratio in ratios.keys():
-        ratios[ratio] = fetch_ratio(ratio) or "Data not found"
+        return {ratio: None for ratio in ("Quick Ratio", "Current Ratio", "Return on Equity (ROE)",
+                                          "Return on Assets (ROA)", "Market Cap Growth")}
     
-    return ratios
+    return html_extract.extract_stock_ratios(response.text)
 
 
 # Function to fetch PB Ratio and Debt/Equity
-def fetch_stock_statistics(stock_symbol):
-    url = f'https://stockanalysis.com/quote/nse/{stock_symbol}/statistics/'
-    response = requests.get(url)
+def fetch_stock_statistics(stock_symbol, session=requests):
+    url = f'{STOCKANALYSIS_BASE}/quote/nse/{stock_symbol}/statistics/'
+    response = session.get(url)
     if response.status_code != 200:
         print(f"Failed to retrieve data for {stock_symbol}. HTTP Status Code: {response.status_code}")
         return None
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    def fetch_stat_value(label):
-        rows = soup.find_all('tr')
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) > 1 and label in row.get_text():
-                return cols[1].text.strip()
-        return None
-
-    pb_ratio = fetch_stat_value('PB Ratio')
-    debt_equity = fetch_stat_value('Debt / Equity')
-
-    return {
-        "PB Ratio": pb_ratio if pb_ratio else "N/A",
-        "Debt / Equity": debt_equity if debt_equity else "N/A"
-    }
+    return html_extract.extract_stock_statistics(response.text)
 
 
 # Function to fetch analyst data (Recommendation, Target Price)
 
 
-def fetch_analyst_data(stock_symbol):
-    url = f"https://finance.yahoo.com/quote/{stock_symbol}.NS/analysis"
+def fetch_analyst_data(stock_symbol, session=requests):
+    url = f"{YAHOO_BASE}/quote/{stock_symbol}.NS/analysis"
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
     }
-    response = requests.get(url, headers=headers)
+    response = session.get(url, headers=headers)
     if response.status_code != 200:
         print(f"Failed to retrieve data for {stock_symbol}. HTTP Status Code: {response.status_code}")
         return None
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    
-    def fetch_stat_value(label):
-        rows = soup.find_all("tr")
-        for row in rows:
-            cols = row.find_all("td")
-            if len(cols) > 1 and label in row.get_text():
-                return cols[1].text.strip()
-        return None
-
-    expert_recommendation = fetch_stat_value("Recommendation Rating")
-    target_price = fetch_stat_value("1 Year Target Price")
-
-    return {
-        "Expert Recommendation": expert_recommendation if expert_recommendation else "N/A",
-        "Analyst Target Price": target_price if target_price else "N/A"
-    }
+    return html_extract.extract_analyst_data(response.text)
 
 # Example usage:
 # print(fetch_analyst_data("AAPL"))
 
 
 
+# Pages fetched for every stock, keyed by the category name used in the CSV
+PAGE_FETCHERS = {
+    'Price and Metrics': fetch_stock_data,
+    'Financial Data': fetch_financial_data,
+    'Stock Ratios': fetch_stock_ratios,
+    'Stock Statistics': fetch_stock_statistics,
+    'Analyst Data': fetch_analyst_data,
+}
+
+# Field families refreshed together, each at its own cadence (see scheduler.py)
+PAGE_FAMILIES = {
+    'price': ['Price and Metrics'],
+    'ratios': ['Stock Ratios', 'Stock Statistics'],
+    'analyst': ['Analyst Data'],
+    'financials': ['Financial Data'],
+}
+
+
+# Function to fetch and extract one page; any failure is logged and gives None so the other pages still land
+def _fetch_page(category, stock_symbol, session):
+    try:
+        return PAGE_FETCHERS[category](stock_symbol, session=session)
+    except requests.RequestException as e:
+        print(f"Failed to fetch {category} for {stock_symbol}: {e}")
+    except Exception as e:
+        print(f"Failed to extract {category} for {stock_symbol}: {e!r}")
+    return None
+
+
 # Master function to fetch all data for a stock
-def fetch_all_stock_data(stock_symbol):
+def fetch_all_stock_data(stock_symbol, session=requests):
     stock_data = {}
-    stock_data['Price and Metrics'] = fetch_stock_data(stock_symbol)
-    stock_data['Financial Data'] = fetch_financial_data(stock_symbol)
-    stock_data['Stock Ratios'] = fetch_stock_ratios(stock_symbol)
-    stock_data['Stock Statistics'] = fetch_stock_statistics(stock_symbol)
-    stock_data['Analyst Data'] = fetch_analyst_data(stock_symbol)
+    for category in PAGE_FETCHERS:
+        stock_data[category] = _fetch_page(category, stock_symbol, session)
     return stock_data
 
 
-# Function to update the existing CSV file with fetched data
-def update_csv_with_stock_data(company_csv):
-    df = pd.read_csv(company_csv)
-
-    # Loop through rows and fetch data for each stock symbol
+# Fetch every page of every stock at once through a shared FetchEngine.
+# `session` defaults to the engine itself; pass an HTTPCache to serve pages from disk.
+# Only the pages named in `categories` are fetched when it is given.
+def fetch_all_stocks_data(stock_symbols, engine, session=None, categories=None):
+    session = session or engine
+    categories = categories or list(PAGE_FETCHERS)
+    futures = {
+        (stock_symbol, category): engine.submit(_fetch_page, category, stock_symbol, session)
+        for stock_symbol in stock_symbols
+        for category in categories
+    }
+    results = {stock_symbol: {} for stock_symbol in stock_symbols}
+    for (stock_symbol, category), future in futures.items():
+        results[stock_symbol][category] = future.result()
+    return results
+
+
+# Function to append today's scraped prices and fundamentals to the price history.
+# Values are parsed like preprocess does; the scraped price is stored as the day's close.
+def record_price_history(df, day=None, history_dir=DEFAULT_HISTORY_DIR):
+    cleaned = preprocess.clean_frame(df).rename(columns={'Current Price': 'Close'})
+    numeric = [c for c in cleaned.columns
+               if c != 'Stock Symbol' and cleaned[c].dtype.kind in 'fi' and cleaned[c].notna().any()]
+    PriceHistory(history_dir).append_day(day or datetime.date.today(), cleaned[['Stock Symbol'] + numeric])
+
+
+# Function to check whether the price history already has a close for any of these symbols on a day
+def has_price_history(symbols, day=None, history_dir=DEFAULT_HISTORY_DIR):
+    day = day or datetime.date.today()
+    _, fields = PriceHistory(history_dir).read(symbols, day, day, ['Close'])
+    return bool(np.isfinite(fields['Close']).any())
+
+
+# Function to load daily OHLCV history from Yahoo Finance into the price history in one bulk append
+def backfill_price_history(stock_symbols, period='5y', history_dir=DEFAULT_HISTORY_DIR):
+    tickers = {f"{symbol}.NS": symbol for symbol in stock_symbols}
+    data = yf.download(list(tickers), period=period, group_by='ticker', auto_adjust=False, progress=False)
+    symbols, days, fields = [], [], {field: [] for field in PRICE_FIELDS}
+    for ticker, symbol in tickers.items():
+        if ticker not in data.columns.get_level_values(0):
+            print(f"No price history for {symbol}")
+            continue
+        history = data[ticker].dropna(how='all')
+        symbols.extend([symbol] * len(history))
+        days.extend(day.toordinal() for day in history.index.date)
+        for field in PRICE_FIELDS:
+            fields[field].append(history[field].to_numpy(dtype=float))
+    if days:
+        PriceHistory(history_dir).append(symbols, days, {f: np.concatenate(v) for f, v in fields.items()})
+    print(f"Backfilled {len(days)} days of prices for {len(set(symbols))} symbols")
+
+
+# Columns of the change logs written next to the snapshot, one file per day
+CHANGE_LOG_COLUMNS = ['Timestamp', 'Stock Symbol', 'Field', 'Old', 'New']
+CHANGE_LOG_KEEP_DAYS = 30  # Daily change logs older than this are deleted
+
+
+# Function to get a snapshot's change log for a day (sm.csv -> sm.changes.2024-06-03.csv)
+def change_log_path(company_csv, day=None):
+    day = day or datetime.date.today()
+    return f"{os.path.splitext(company_csv)[0]}.changes.{day.isoformat()}.csv"
+
+
+# Function to delete a snapshot's daily change logs older than keep_days
+def prune_change_logs(company_csv, keep_days=CHANGE_LOG_KEEP_DAYS, today=None):
+    oldest = (today or datetime.date.today()) - datetime.timedelta(days=keep_days - 1)
+    prefix = f"{os.path.splitext(company_csv)[0]}.changes."
+    for path in glob.glob(glob.escape(prefix) + '*.csv'):
+        try:
+            day = datetime.date.fromisoformat(path[len(prefix):-len('.csv')])
+        except ValueError:
+            continue
+        if day < oldest:
+            os.remove(path)
+
+
+# Function to turn a scraped or stored value into the text it is compared and saved as
+def _cell_text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    return str(value)
+
+
+# Function to append changes to the change log, writing the header for a new log
+def append_change_log(changes, log_path):
+    if changes.empty:
+        return
+    changes.to_csv(log_path, mode='a', index=False, header=not os.path.exists(log_path))
+
+
+# Function to update the snapshot CSV with freshly scraped data.
+# Every fetched value is compared with the stored text; only cells that differ
+# are written, each change is appended to today's change log, and the CSV is left
+# untouched when nothing moved. Unless history_dir is None, the values fetched
+# in this call (never stale ones from the CSV, so a ratios-only refresh records
+# no Close) are appended to the price history whenever something changed, and
+# also when prices were fetched but today has no history row yet, so unchanged
+# days leave no gaps. Returns the changes (CHANGE_LOG_COLUMNS).
+def update_csv_with_stock_data(company_csv, engine=None, cache_dir=DEFAULT_CACHE_DIR, families=None,
+                               history_dir=DEFAULT_HISTORY_DIR):
+    # Read every value as the text stored, so comparisons are exact and unchanged cells round-trip
+    df = pd.read_csv(company_csv, dtype=str, keep_default_na=False)
+
+    owns_engine = engine is None
+    if owns_engine:
+        engine = FetchEngine()
+    session = HTTPCache(engine, cache_dir) if cache_dir else engine
+    categories = None
+    if families:
+        categories = [category for family in families for category in PAGE_FAMILIES[family]]
+    try:
+        all_stock_data = fetch_all_stocks_data(df['Stock Symbol'].tolist(), engine, session, categories)
+    finally:
+        if owns_engine:
+            engine.close()
+
+    # Compare the fetched data with the corresponding columns
+    timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    changes = []
+    refreshed = {}  # Column -> rows whose value was fetched in this call
     for index, row in df.iterrows():
-        stock_symbol = row['Stock Symbol']
-        stock_data = fetch_all_stock_data(stock_symbol)
-
-        # Update the corresponding columns with fetched data
+        stock_data = all_stock_data[row['Stock Symbol']]
         for category, data in stock_data.items():
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    if key not in df.columns:
-                        df[key] = 'N/A'  # Add missing columns dynamically
-                    df.at[index, key] = value
-            else:
-                if category not in df.columns:
-                    df[category] = 'N/A'
-                df.at[index, category] = data
+            if data is None:
+                continue  # The page failed; keep the stored values
+            values = data.items() if isinstance(data, dict) else [(category, data)]
+            for key, value in values:
+                if key not in df.columns:
+                    df[key] = 'N/A'  # Add missing columns dynamically
+                refreshed.setdefault(key, []).append(index)
+                old, new = df.at[index, key], _cell_text(value)
+                if old != new:
+                    df.at[index, key] = new
+                    changes.append((timestamp, row['Stock Symbol'], key, old, new))
+    changes = pd.DataFrame(changes, columns=CHANGE_LOG_COLUMNS)
+    fetched = pd.DataFrame({'Stock Symbol': df['Stock Symbol'],
+                            **{key: df[key].where(df.index.isin(rows), '') for key, rows in refreshed.items()}})
+
+    if changes.empty:
+        print(f"No scraped value changed; '{company_csv}' left as is")
+        if (history_dir and 'Current Price' in refreshed
+                and not has_price_history(df['Stock Symbol'].tolist(), history_dir=history_dir)):
+            record_price_history(fetched, history_dir=history_dir)
+        return changes
 
     # Write back to the same CSV file
-    df.to_csv(company_csv, index=False)
-
-
-# Example usage
-update_csv_with_stock_data('sm.csv')
+    tmp_path = f"{company_csv}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, company_csv)
+    log_path = change_log_path(company_csv)
+    if not os.path.exists(log_path):
+        prune_change_logs(company_csv)  # A new day's log; drop the expired ones
+    append_change_log(changes, log_path)
+    print(f"{len(changes)} values changed for {changes['Stock Symbol'].nunique()} stocks; "
+          f"logged to '{log_path}'")
+
+    if history_dir:
+        record_price_history(fetched, history_dir=history_dir)
+    return changes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh scraped stock data in sm.csv")
+    parser.add_argument('--family', action='append', choices=list(PAGE_FAMILIES),
+                        help="Only refresh this field family (may be repeated)")
+    parser.add_argument('--backfill', metavar='PERIOD',
+                        help="Instead, load this much daily price history (e.g. 5y) for every stock")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill_price_history(pd.read_csv('sm.csv')['Stock Symbol'].tolist(), args.backfill)
+    else:
+        update_csv_with_stock_data('sm.csv', families=args.family)
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Default number of requests allowed in flight against a single host
+DEFAULT_PER_HOST_LIMIT = 8
+DEFAULT_TIMEOUT = 20
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take one token if available; otherwise return the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. after a 429's Retry-After."""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class FetchEngine:
+    """Bounded thread-pool fetcher with one keep-alive session per host.
+
+    Every host gets its own requests.Session (so connections are reused across
+    symbols) and a semaphore capping how many requests hit it at once. The
+    engine exposes the same get() signature as requests, so the fetch_*
+    functions in data_update.py can be handed an engine as their session.
+    Hosts listed in `host_rates` ({host: requests per second, or
+    (rate, burst)}) are also paced by a TokenBucket.
+    """
+
+    def __init__(self, per_host_limit=DEFAULT_PER_HOST_LIMIT, host_limits=None,
+                 max_workers=None, timeout=DEFAULT_TIMEOUT, host_rates=None):
+        self.per_host_limit = per_host_limit
+        self.host_limits = dict(host_limits or {})
+        self.buckets = {host: TokenBucket(*(rate if isinstance(rate, tuple) else (rate,)))
+                        for host, rate in (host_rates or {}).items()}
+        self.timeout = timeout
+        self._sessions = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        if max_workers is None:
+            max_workers = max([per_host_limit, *self.host_limits.values()]) * 4
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+
+    def _host_state(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                limit = self.host_limits.get(host, self.per_host_limit)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limit)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+                self._semaphores[host] = threading.BoundedSemaphore(limit)
+            return self._sessions[host], self._semaphores[host]
+
+    def get(self, url, headers=None, **kwargs):
+        """Blocking GET through the host's shared session and concurrency limit."""
+        session, semaphore = self._host_state(url)
+        kwargs.setdefault('timeout', self.timeout)
+        bucket = self.buckets.get(urlsplit(url).netloc)
+        if bucket is not None:
+            bucket.acquire()
+        with semaphore:
+            return session.get(url, headers=headers, **kwargs)
+
+    def backoff(self, url, seconds):
+        """Hold back every request to url's host for `seconds` (or sleep if the host is not paced)."""
+        bucket = self.buckets.get(urlsplit(url).netloc)
+        if bucket is not None:
+            bucket.pause(seconds)
+        else:
+            time.sleep(seconds)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the engine's worker pool."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._semaphores.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,231 @@
+"""Record scraped pages once and replay them from a local HTTP server.
+
+A fixture directory holds one subdirectory per page kind, each with
+<symbol>.html:
+
+    fixtures/quote/TCS.html        <- /quote/nse/TCS/
+    fixtures/financials/TCS.html   <- /quote/nse/TCS/financials/
+    fixtures/ratios/TCS.html       <- /quote/nse/TCS/financials/ratios/
+    fixtures/statistics/TCS.html   <- /quote/nse/TCS/statistics/
+    fixtures/analysis/TCS.html     <- /quote/TCS.NS/analysis
+
+(the same layout bench_extract.py reads). RecordingSession wraps a
+session or FetchEngine and saves every page the data_update fetchers
+get. FixtureServer serves those pages back at the paths above, for
+STOCKANALYSIS_BASE and YAHOO_BASE alike. It adds configurable latency,
+jitter and error rates, gzips bodies for clients that accept it, and
+answers conditional GETs with 304 so HTTPCache behaves as it would
+against the real sites. It counts requests, errors and bytes sent for
+bench_scraper.py.
+
+Usage: python fixture_server.py record DIR SYMBOL [SYMBOL ...]
+       python fixture_server.py serve DIR [--port 8766] [--latency-ms 0] [--jitter-ms 0] [--error-rate 0]
+       STOCKANALYSIS_BASE=http://127.0.0.1:8766 YAHOO_BASE=http://127.0.0.1:8766 python data_update.py
+"""
+import email.utils
+import gzip
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+# URL path of each page kind, most specific first
+PAGE_PATHS = {
+    'ratios': '/quote/nse/{symbol}/financials/ratios/',
+    'financials': '/quote/nse/{symbol}/financials/',
+    'statistics': '/quote/nse/{symbol}/statistics/',
+    'quote': '/quote/nse/{symbol}/',
+    'analysis': '/quote/{symbol}.NS/analysis',
+}
+PAGE_PATTERNS = [
+    (kind, re.compile('^' + re.escape(path.rstrip('/')).replace(r'\{symbol\}', '(?P<symbol>[^/]+)') + '/?$'))
+    for kind, path in PAGE_PATHS.items()
+]
+
+ERROR_STATUSES = (500, 502, 503, 429)
+
+
+def page_of(url):
+    """(kind, symbol) of a scraped page's URL, or None if it is not one"""
+    path = unquote(urlsplit(url).path)
+    for kind, pattern in PAGE_PATTERNS:
+        match = pattern.match(path)
+        if match:
+            return kind, match.group('symbol')
+    return None
+
+
+def fixture_path(fixture_dir, kind, symbol):
+    return os.path.join(fixture_dir, kind, f"{symbol}.html")
+
+
+class RecordingSession:
+    """Session wrapper that saves every 200 page it fetches into a fixture directory."""
+
+    def __init__(self, session, fixture_dir):
+        self.session = session
+        self.fixture_dir = fixture_dir
+        self.recorded = 0
+
+    def get(self, url, headers=None, **kwargs):
+        response = self.session.get(url, headers=headers, **kwargs)
+        page = page_of(url)
+        if response.status_code == 200 and page is not None:
+            path = fixture_path(self.fixture_dir, *page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            os.replace(tmp_path, path)
+            self.recorded += 1
+        return response
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixture_dir, port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, compress=True):
+        super().__init__(('127.0.0.1', port), FixtureHandler)
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.compress = compress
+        self.random = random.Random(seed)
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.not_modified = 0
+            self.bytes_sent = 0
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'not_modified': self.not_modified,
+                    'bytes_sent': self.bytes_sent}
+
+    def count(self, sent, error=False, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+            self.errors += error
+            self.not_modified += not_modified
+
+    def delay_and_fail(self):
+        """Sleep for this request's latency; the error status to send, if it is to fail"""
+        with self._lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+            status = self.random.choice(ERROR_STATUSES)
+        time.sleep(delay)
+        return status if fail else None
+
+    def page(self, url_path):
+        """(body, gzipped body, ETag, Last-Modified) of the fixture behind a path, or None"""
+        page = page_of(url_path)
+        if page is None:
+            return None
+        path = fixture_path(self.fixture_dir, *page)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._pages.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                body = f.read()
+            cached = (mtime, body, gzip.compress(body, compresslevel=6),
+                      '"%s"' % hashlib.sha256(body).hexdigest()[:32], email.utils.formatdate(mtime, usegmt=True))
+            with self._lock:
+                self._pages[path] = cached
+        return cached[1:]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real sites
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        error = server.delay_and_fail()
+        if error is not None:
+            body = f"Injected error {error}".encode('utf-8')
+            self._send(error, body, [('Content-Type', 'text/plain'), ('Retry-After', '1')])
+            return server.count(len(body), error=True)
+
+        page = server.page(self.path)
+        if page is None:
+            body = b"No fixture for this page"
+            self._send(404, body, [('Content-Type', 'text/plain')])
+            return server.count(len(body), error=True)
+
+        body, gzipped, etag, last_modified = page
+        validators = [('ETag', etag), ('Last-Modified', last_modified)]
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, headers=validators)
+            return server.count(0, not_modified=True)
+
+        headers = [('Content-Type', 'text/html; charset=utf-8')] + validators
+        if server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzipped
+            headers.append(('Content-Encoding', 'gzip'))
+        self._send(200, body, headers)
+        server.count(len(body))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record scraped pages as fixtures, or replay them locally")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="Fetch every page of these symbols from the live sites")
+    record.add_argument('fixture_dir')
+    record.add_argument('symbols', nargs='+')
+    serve = commands.add_parser('serve', help="Serve recorded pages")
+    serve.add_argument('fixture_dir')
+    serve.add_argument('--port', type=int, default=8766)
+    serve.add_argument('--latency-ms', type=float, default=0.0)
+    serve.add_argument('--jitter-ms', type=float, default=0.0)
+    serve.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 5xx/429")
+    serve.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        import data_update
+        from fetch_engine import FetchEngine
+        with FetchEngine() as engine:
+            recorder = RecordingSession(engine, args.fixture_dir)
+            data_update.fetch_all_stocks_data(args.symbols, engine, session=recorder)
+        print(f"Recorded {recorder.recorded} pages into {args.fixture_dir}")
+    else:
+        server = FixtureServer(args.fixture_dir, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                               args.error_rate, args.seed)
+        print(f"Replaying {args.fixture_dir} on {server.base_url}")
+        server.serve_forever()
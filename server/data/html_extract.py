@@ -0,0 +1,258 @@
+"""Parse-once extraction of the scraped metrics from stockanalysis and Yahoo pages.
+
+Each page is parsed once into a PageIndex, built in a single walk over
+the document. The index holds:
+- every table row, with its class attribute, stripped cell texts and full
+  text;
+- the first row that contains each exact text node;
+- the text of the first element matching each selector the caller asked
+  to capture.
+
+The extract_* functions then read every metric they need from the
+index, instead of searching the whole tree again for each label.
+
+lxml's C parser is used when it is installed. Otherwise a streaming
+html.parser walk builds the same index without building a tree at all.
+Both give the same results as the BeautifulSoup lookups they replace
+(see bench_extract.py).
+"""
+from collections import namedtuple
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:  # Optional: the streaming parser below needs nothing
+    lxml = None
+
+DEFAULT_PARSER = 'lxml' if lxml is not None else 'html.parser'
+
+Row = namedtuple('Row', ['classes', 'cells', 'text'])
+
+PRICE_SELECTOR = ('div', 'text-4xl font-bold transition-colors duration-300 inline-block')
+METRIC_ROW_CLASS = 'flex flex-col border-b border-default py-1 sm:table-row sm:py-0'
+
+
+class PageIndex:
+    """Table rows and captured elements of one page."""
+
+    def __init__(self, rows, row_of_string, captured):
+        self.rows = rows
+        self.row_of_string = row_of_string
+        self.captured = captured
+        self._containing = {}
+
+    def row_for_string(self, text):
+        """The row around the first text node that is exactly `text`, like soup.find(string=text).find_parent('tr')"""
+        i = self.row_of_string.get(text)
+        return None if i is None else self.rows[i]
+
+    def row_containing(self, label):
+        """The first row with at least two cells whose text contains `label`"""
+        if label not in self._containing:
+            self._containing[label] = next(
+                (row for row in self.rows if len(row.cells) > 1 and label in row.text), None)
+        return self._containing[label]
+
+    def rows_with_class(self, classes):
+        return [row for row in self.rows if row.classes == classes]
+
+
+class _IndexBuilder(HTMLParser):
+    """Streaming walk that builds a PageIndex without keeping a tree"""
+
+    def __init__(self, selectors):
+        super().__init__(convert_charrefs=True)
+        self.selectors = set(selectors)
+        self.rows = []
+        self.row_of_string = {}
+        self.captured = {}
+        self._open_rows = []  # [row index, text parts, cells, open cell parts or None, table depth, class]
+        self._captures = []  # [selector, text parts, depth of nested same-name tags]
+        self._table_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for capture in self._captures:
+            if capture[0][0] == tag:
+                capture[2] += 1
+        if tag == 'table':
+            self._table_depth += 1
+        elif tag == 'tr':
+            if self._open_rows and self._open_rows[-1][4] == self._table_depth:
+                self._close_row()  # An unclosed <tr> ends at the next one
+            self.rows.append(None)
+            self._open_rows.append([len(self.rows) - 1, [], [], None, self._table_depth, attrs.get('class')])
+        elif tag == 'td' and self._open_rows:
+            row = self._open_rows[-1]
+            if row[3] is not None:
+                row[2].append(''.join(row[3]).strip())
+            row[3] = []
+        if self.selectors:
+            selector = (tag, attrs.get('class'))
+            if selector in self.selectors and selector not in self.captured:
+                self.captured[selector] = None
+                self._captures.append([selector, [], 1])
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self._open_rows:
+            row = self._open_rows[-1]
+            if row[3] is not None:
+                row[2].append(''.join(row[3]).strip())
+                row[3] = None
+        elif tag == 'tr' and self._open_rows:
+            self._close_row()
+        elif tag == 'table':
+            while self._open_rows and self._open_rows[-1][4] == self._table_depth:
+                self._close_row()
+            self._table_depth = max(0, self._table_depth - 1)
+        for capture in list(self._captures):
+            if capture[0][0] == tag:
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self.captured[capture[0]] = ''.join(capture[1])
+                    self._captures.remove(capture)
+
+    def handle_data(self, data):
+        if self._open_rows:
+            innermost = self._open_rows[-1]
+            self.row_of_string.setdefault(data, innermost[0])
+            if innermost[3] is not None:
+                innermost[3].append(data)
+            for row in self._open_rows:
+                row[1].append(data)
+        for capture in self._captures:
+            capture[1].append(data)
+
+    def _close_row(self):
+        i, text, cells, cell, _, classes = self._open_rows.pop()
+        if cell is not None:
+            cells.append(''.join(cell).strip())
+        self.rows[i] = Row(classes, cells, ''.join(text))
+
+    def close(self):
+        super().close()
+        while self._open_rows:
+            self._close_row()
+        for selector, text, _ in self._captures:
+            self.captured[selector] = ''.join(text)
+
+
+def _index_with_lxml(html, selectors):
+    root = lxml.html.fromstring(html)
+    row_elements = list(root.iter('tr'))
+    position = {element: i for i, element in enumerate(row_elements)}
+    rows = [Row(element.get('class'), [td.text_content().strip() for td in element.iter('td')],
+                element.text_content())
+            for element in row_elements]
+
+    row_of_string = {}
+    for node in root.xpath('//tr//text()'):
+        element = node.getparent()
+        if node.is_tail:
+            element = element.getparent()
+        while element is not None and element.tag != 'tr':
+            element = element.getparent()
+        if element is not None:
+            row_of_string.setdefault(str(node), position[element])
+
+    captured = {}
+    for tag, classes in selectors:
+        for element in root.iter(tag):
+            if element.get('class') == classes:
+                captured[tag, classes] = element.text_content()
+                break
+    return PageIndex(rows, row_of_string, captured)
+
+
+def parse_page(html, selectors=(), parser=None):
+    """PageIndex of a page; `selectors` are (tag, class attribute) pairs whose first element's text is captured.
+
+    `parser` is 'lxml' or 'html.parser'; DEFAULT_PARSER is lxml when it is installed.
+    An empty or whitespace-only page gives an empty index (lxml refuses to parse one).
+    """
+    if not html or html.isspace():
+        return PageIndex([], {}, {})
+    if (parser or DEFAULT_PARSER) == 'lxml':
+        return _index_with_lxml(html, selectors)
+    builder = _IndexBuilder(selectors)
+    builder.feed(html)
+    builder.close()
+    return PageIndex(builder.rows, builder.row_of_string, builder.captured)
+
+
+# Metrics from the stockanalysis quote page
+def extract_stock_data(html, parser=None):
+    page = parse_page(html, [PRICE_SELECTOR], parser)
+    metrics = { 'Current Price': 'N/A', 'P/E Ratio': 'N/A', 'Beta': 'N/A',
+                'RSI': 'N/A', 'EPS (ttm)': 'N/A', '52-Week Low': 'N/A', '52-Week High': 'N/A' }
+
+    price = page.captured.get(PRICE_SELECTOR)
+    if price is not None:
+        metrics['Current Price'] = price.strip()
+
+    for row in page.rows_with_class(METRIC_ROW_CLASS):
+        if len(row.cells) > 1:
+            key, value = row.cells[0], row.cells[1]
+            if 'PE Ratio' in key: metrics['P/E Ratio'] = value
+            elif 'Beta' in key: metrics['Beta'] = value
+            elif 'RSI' in key: metrics['RSI'] = value
+            elif 'EPS (ttm)' in key: metrics['EPS (ttm)'] = value
+            elif '52-Week Range' in key:
+                try:
+                    low, high = value.split('-')
+                    metrics['52-Week Low'] = low.strip()
+                    metrics['52-Week High'] = high.strip()
+                except ValueError:
+                    metrics['52-Week Low'] = metrics['52-Week High'] = 'N/A'
+
+    return metrics
+
+
+# Growth and margin metrics from the stockanalysis financials page
+def extract_financial_data(html, parser=None):
+    page = parse_page(html, parser=parser)
+
+    def growth_value(label):
+        row = page.row_for_string(label)
+        if row and len(row.cells) > 1:
+            return row.cells[1]
+        return "Data not found"
+
+    return {label: growth_value(label)
+            for label in ("Revenue Growth (YoY)", "EPS Growth", "Profit Margin", "EBITDA Margin")}
+
+
+# Ratios from the stockanalysis ratios page; a '-' for the latest period falls back to the one before
+def extract_stock_ratios(html, parser=None):
+    page = parse_page(html, parser=parser)
+    ratios = {}
+    for ratio in ("Quick Ratio", "Current Ratio", "Return on Equity (ROE)", "Return on Assets (ROA)",
+                  "Market Cap Growth"):
+        row = page.row_for_string(ratio)
+        value = None
+        if row and len(row.cells) > 1:
+            cells = row.cells
+            value = cells[2] if cells[1] == '-' and len(cells) > 2 else cells[1]
+        ratios[ratio] = value or "Data not found"
+    return ratios
+
+
+# Function to read the value next to the first row mentioning each label; missing labels get "N/A"
+def _labelled_values(html, labels, parser=None):
+    page = parse_page(html, parser=parser)
+    values = {}
+    for name, label in labels.items():
+        row = page.row_containing(label)
+        values[name] = row.cells[1] if row and row.cells[1] else "N/A"
+    return values
+
+
+# PB Ratio and Debt/Equity from the stockanalysis statistics page
+def extract_stock_statistics(html, parser=None):
+    return _labelled_values(html, {"PB Ratio": 'PB Ratio', "Debt / Equity": 'Debt / Equity'}, parser)
+
+
+# Recommendation and target price from the Yahoo analysis page
+def extract_analyst_data(html, parser=None):
+    return _labelled_values(html, {"Expert Recommendation": "Recommendation Rating",
+                                   "Analyst Target Price": "1 Year Target Price"}, parser)
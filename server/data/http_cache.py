@@ -0,0 +1,152 @@
+import contextlib
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# TTL per page family, matched against the URL path in order.
+# A TTL of 0 means the page is revalidated on every cycle.
+PAGE_TTLS = [
+    (re.compile(r'/financials/ratios/?$'), DAY),
+    (re.compile(r'/financials/?$'), DAY),
+    (re.compile(r'/statistics/?$'), DAY),
+    (re.compile(r'/analysis/?$'), 6 * HOUR),
+    (re.compile(r'/quote/nse/[^/]+/?$'), 0),
+]
+
+DEFAULT_CACHE_DIR = '.http_cache'
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the cache."""
+
+    def __init__(self, url, status_code, text, headers, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+        self.from_cache = from_cache
+        self.content = text.encode('utf-8')
+
+
+class HTTPCache:
+    """On-disk conditional-GET cache in front of a session or FetchEngine.
+
+    Each URL has a small JSON file, named by the SHA-256 of the URL, holding the
+    ETag, Last-Modified, fetch time and the name of its body file. The body is
+    stored gzip-compressed under a name that includes its own hash, and is
+    written before the JSON file that points to it. A reader therefore never
+    pairs new validators with an old body. Fresh
+    entries are served without touching the network; stale ones are
+    revalidated with If-None-Match / If-Modified-Since and a 304 reuses the
+    stored body. Safe to share between FetchEngine pool threads.
+    """
+
+    def __init__(self, session, cache_dir=DEFAULT_CACHE_DIR, ttls=PAGE_TTLS):
+        self.session = session
+        self.cache_dir = cache_dir
+        self.ttls = ttls
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # Guards the counters and _store_locks
+        self._store_locks = {}  # URL key -> lock serializing that URL's writes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url.split('?', 1)[0]):
+                return ttl
+        return 0
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _load(self, url):
+        key = self._key(url)
+        try:
+            with open(os.path.join(self.cache_dir, key + '.json'), 'r') as f:
+                meta = json.load(f)
+            with gzip.open(os.path.join(self.cache_dir, meta.get('body', key + '.gz')), 'rt', encoding='utf-8') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store(self, url, meta, body=None):
+        key = self._key(url)
+        with self._lock:
+            lock = self._store_locks.setdefault(key, threading.Lock())
+        with lock:
+            self._store_locked(key, meta, body)
+
+    def _store_locked(self, key, meta, body):
+        meta_path = os.path.join(self.cache_dir, key + '.json')
+        # Unique per thread, since pool threads may store the same URL at once
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        if body is not None:
+            meta['body'] = f"{key}.{hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]}.gz"
+            body_path = os.path.join(self.cache_dir, meta['body'])
+            tmp_body = f"{body_path}.{suffix}"
+            with gzip.open(tmp_body, 'wt', encoding='utf-8') as f:
+                f.write(body)
+            os.replace(tmp_body, body_path)
+        tmp_meta = f"{meta_path}.{suffix}"
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+        if body is not None:
+            # Drop the URL's earlier bodies; a reader still holding the old JSON file misses and refetches
+            for path in glob.glob(os.path.join(self.cache_dir, f"{key}*.gz")):
+                if os.path.basename(path) != meta['body']:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+
+    def get(self, url, headers=None, **kwargs):
+        meta, body = self._load(url)
+        now = time.time()
+
+        if meta is not None and now - meta['stored_at'] < self.ttl_for(url):
+            with self._lock:
+                self.hits += 1
+            return CachedResponse(url, meta['status'], body, meta.get('headers', {}), True)
+
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.get(url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            with self._lock:
+                self.revalidated += 1
+            meta['stored_at'] = now
+            self._store(url, meta)
+            return CachedResponse(url, meta['status'], body, meta.get('headers', {}), True)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200:
+            meta = {
+                'url': url,
+                'status': response.status_code,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'stored_at': now,
+            }
+            self._store(url, meta, response.text)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
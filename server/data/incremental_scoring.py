@@ -0,0 +1,126 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import load_scoring
+
+
+class RankIndex:
+    """Order-statistics index over Total Score giving the pipeline's unique ranks.
+
+    A row's rank is 1 + (rows with a higher score) + (rows with an equal score
+    earlier in the file), i.e. its position in the list of (-score, row) keys
+    sorted ascending. That matches rank(method='min') plus the cumcount
+    tie-break. Keys live in a sorted list updated with bisect, and only ranks
+    whose key falls between a changed row's old and new keys are rewritten.
+    """
+
+    def __init__(self, totals):
+        self.totals = np.asarray(totals, dtype=float).copy()
+        self.keys = sorted((-total, row) for row, total in enumerate(self.totals))
+        self.ranks = np.empty(len(self.keys), dtype=float)
+        for position, (_, row) in enumerate(self.keys):
+            self.ranks[row] = position + 1
+
+    def update(self, rows, totals):
+        """Move `rows` to their new totals; returns the rows whose rank was rewritten."""
+        if len(rows) == 0:
+            return np.empty(0, dtype=int)
+        low = high = None
+        for row, total in zip(rows, totals):
+            old_key = (-self.totals[row], row)
+            new_key = (-float(total), row)
+            del self.keys[bisect.bisect_left(self.keys, old_key)]
+            bisect.insort(self.keys, new_key)
+            self.totals[row] = total
+            low = min(old_key, new_key) if low is None else min(low, old_key, new_key)
+            high = max(old_key, new_key) if high is None else max(high, old_key, new_key)
+
+        # Keys outside [low, high] kept the same number of smaller keys
+        start = bisect.bisect_left(self.keys, low)
+        stop = bisect.bisect_right(self.keys, high)
+        touched = np.fromiter((row for _, row in self.keys[start:stop]), dtype=int, count=stop - start)
+        self.ranks[touched] = np.arange(start + 1, stop + 1, dtype=float)
+        return touched
+
+
+def _same(old, new):
+    """Element-wise equality that treats two missing values as equal."""
+    old = np.asarray(old, dtype=object)
+    new = np.asarray(new, dtype=object)
+    return (old == new) | (pd.isna(old) & pd.isna(new))
+
+
+class IncrementalScorer:
+    """Keeps the last scored snapshot of one file and rescores only what changed.
+
+    score() returns the same columns as a full score_stock_data() run. When the
+    set or order of symbols differs from the previous snapshot it falls back
+    to a full recompute; otherwise only the (row, metric) cells whose inputs
+    changed are re-evaluated and the ranks are patched through a RankIndex.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules
+        self.symbols = None
+        self.inputs = None
+        self.matrix = None
+        self.rank_index = None
+        self.last_changed_rows = None
+
+    def _rules(self):
+        return self.rules or load_scoring().RULES
+
+    def _input_columns(self, rules):
+        columns = ['Theme'] if rules.theme_overrides else []
+        for metric in rules.profile().metrics:
+            columns.extend(col for col in metric.columns if col not in columns)
+        return columns
+
+    def _full(self, data, rules):
+        self.matrix, totals = rules.score(data)
+        self.rank_index = RankIndex(totals)
+        self.last_changed_rows = np.arange(len(data))
+
+    def _incremental(self, data, rules, columns):
+        metrics = rules.profile().metrics
+        changed_inputs = {col: ~_same(self.inputs[col].to_numpy(), data[col].to_numpy()) for col in columns}
+        theme_changed = changed_inputs.get('Theme', np.zeros(len(data), dtype=bool))
+
+        changed_rows = np.zeros(len(data), dtype=bool)
+        for index, metric in enumerate(metrics):
+            rows = theme_changed.copy()
+            for col in metric.columns:
+                rows |= changed_inputs[col]
+            if rows.any():
+                scores = rules.score_metric(data[rows], index)
+                self.matrix = self.matrix.astype(np.result_type(self.matrix, scores), copy=False)
+                self.matrix[index, rows] = scores
+                changed_rows |= rows
+
+        rows = np.flatnonzero(changed_rows)
+        if len(rows):
+            totals = rules.weighted_total(data.iloc[rows], self.matrix[:, rows])
+            self.rank_index.update(rows, totals)
+        self.last_changed_rows = rows
+
+    def score(self, data):
+        """Add score columns, Total Score and Rank to a prepared frame."""
+        rules = self._rules()
+        columns = self._input_columns(rules)
+        symbols = data['Stock Symbol'].to_numpy()
+
+        if self.symbols is None or len(symbols) != len(self.symbols) or not (symbols == self.symbols).all():
+            self._full(data, rules)
+        else:
+            self._incremental(data, rules, columns)
+
+        self.symbols = symbols
+        self.inputs = data[columns].copy()
+
+        for name, scores in zip(rules.names, self.matrix):
+            data[name] = scores
+        data['Total Score'] = self.rank_index.totals
+        data['Rank'] = self.rank_index.ranks
+        return data
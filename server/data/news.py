@@ -1,24 +1,41 @@
+import os
+import time
+from urllib.parse import urlsplit
+
 import pandas as pd
 import requests
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-
-# Load the CSV file
-csv_file = "Largecap.csv"  # Update with your CSV path
-stocks_df = pd.read_csv(csv_file)
-
-# Initialize a **financial-specific sentiment analysis model**
-finbert_model = "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"
-sentiment_analysis = pipeline(
-    "sentiment-analysis",
-    model=finbert_model,
-    tokenizer=finbert_model
-)
-
-# Function to fetch news articles (with error handling)
-def fetch_news(stock_name, api_key):
-    url = f'https://newsapi.org/v2/everything?q={stock_name}&language=en&sortBy=publishedAt&apiKey={api_key}'
+
+import sentiment_service
+from fetch_engine import FetchEngine
+from news_store import NewsStore, DEFAULT_STORE_DIR
+from sentiment import SentimentCache, classify_texts, DEFAULT_BACKEND, DEFAULT_BATCH_SIZE, DEFAULT_CACHE_FILE
+
+ARTICLES_PER_STOCK = 5  # Analyze top 5 articles to avoid rate limits
+
+# NewsAPI endpoint; point it at a local stand-in server when testing
+NEWSAPI_BASE = os.environ.get('NEWSAPI_BASE', 'https://newsapi.org').rstrip('/')
+NEWSAPI_RATE = (5, 5)  # Requests per second, burst
+NEWSAPI_CONCURRENCY = 4
+RATE_LIMIT_RETRIES = 3
+
+# Function to fetch news articles (with error handling).
+# `since` asks only for articles published at or after that publishedAt; a
+# 429 is retried after its Retry-After, holding back the whole engine.
+def fetch_news(stock_name, api_key, session=requests, since=None):
+    url = f'{NEWSAPI_BASE}/v2/everything'
+    params = {'q': stock_name, 'language': 'en', 'sortBy': 'publishedAt', 'apiKey': api_key}
+    if since:
+        params['from'] = since
     try:
-        response = requests.get(url)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            response = session.get(url, params=params)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                break
+            wait = float(response.headers.get('Retry-After', 1))
+            if hasattr(session, 'backoff'):
+                session.backoff(url, wait)
+            else:
+                time.sleep(wait)
         response.raise_for_status()  # Raise error for bad status codes
         news_data = response.json()
         return news_data.get('articles', [])
@@ -26,51 +43,49 @@ def fetch_news(stock_name, api_key):
         print(f"Error fetching news for {stock_name}: {e}")
         return []
 
-# Function to analyze sentiment (with detailed debugging)
-def analyze_sentiment(articles):
-    if not articles:
-        return "No News"  # Handle empty news case
-    
-    positive_count = 0
-    negative_count = 0
-    neutral_count = 0
-    
-    for article in articles[:5]:  # Analyze top 5 articles to avoid rate limits
-        title = article.get('title', '')
-        description = article.get('description', '')
-        combined_text = f"{title}. {description}".strip()
-        
-        if not combined_text:
-            continue
-        
-        try:
-            # Get sentiment (financial model returns 'positive', 'negative', or 'neutral')
-            sentiment_result = sentiment_analysis(combined_text, truncation=True, max_length=512)
-            sentiment = sentiment_result[0]['label'].lower()
-            
-            # Debug print (comment out later)
-            print(f"\nText: {combined_text[:100]}...\nSentiment: {sentiment}")
-            
-            if sentiment == 'positive':
-                positive_count += 1
-            elif sentiment == 'negative':
-                negative_count += 1
-            else:
-                neutral_count += 1
-        except Exception as e:
-            print(f"Error analyzing sentiment: {e}")
-            continue
-    
+# Function to fetch every company's new articles concurrently into the store.
+# Returns {name: articles not seen before, newest first}.
+def fetch_new_articles(stock_names, api_key, store, engine=None):
+    own_engine = engine is None
+    if own_engine:
+        engine = FetchEngine(host_limits={urlsplit(NEWSAPI_BASE).netloc: NEWSAPI_CONCURRENCY},
+                             host_rates={urlsplit(NEWSAPI_BASE).netloc: NEWSAPI_RATE})
+
+    def fetch_one(stock_name):
+        since = store.latest(stock_name)
+        new = store.merge(stock_name, fetch_news(stock_name, api_key, engine, since))
+        print(f"Fetched news for {stock_name}: {len(new)} new articles" + (f" since {since}" if since else ""))
+        return new
+
+    try:
+        futures = {name: engine.submit(fetch_one, name) for name in dict.fromkeys(stock_names)}
+        return {name: future.result() for name, future in futures.items()}
+    finally:
+        if own_engine:
+            engine.close()
+
+# Function to get the text scored for an article
+def article_text(article):
+    title = article.get('title', '')
+    description = article.get('description', '')
+    return f"{title}. {description}".strip()
+
+# Function to turn per-article labels into the overall sentiment (with threshold)
+def summarize_sentiment(labels):
+    labels = [label for label in labels if label is not None]
+    positive_count = labels.count('positive')
+    negative_count = labels.count('negative')
+    neutral_count = len(labels) - positive_count - negative_count
+
     print(f"Results: Positive={positive_count}, Negative={negative_count}, Neutral={neutral_count}")
-    
-    # Determine overall sentiment (with threshold)
+
     total = positive_count + negative_count + neutral_count
     if total == 0:
         return "No News"
-    
+
     positive_ratio = positive_count / total
     negative_ratio = negative_count / total
-    
+
     if positive_ratio > 0.5:
         return "Positive"
     elif negative_ratio > 0.5:
@@ -78,19 +93,88 @@ def analyze_sentiment(articles):
     else:
         return "Neutral"
 
-# API Key for NewsAPI (replace with your actual key)
-api_key = 'bc6b7b73046b4c1397b4d153e027dcd4'  # This is a placeholder - use your own key
+# Function to analyze sentiment of one stock's articles
+def analyze_sentiment(articles, classifier=None, cache=None):
+    if not articles:
+        return "No News"  # Handle empty news case
+    return sentiment_by_stock({None: articles}, classifier, cache)[None]
+
+# Function to analyze every stock's articles in one batched, cached model run.
+# `articles_by_stock` maps any stock key to its articles; returns {key: sentiment}.
+def sentiment_by_stock(articles_by_stock, classifier=None, cache=None, batch_size=DEFAULT_BATCH_SIZE):
+    texts_by_stock = {}
+    for stock, articles in articles_by_stock.items():
+        texts = (article_text(article) for article in (articles or [])[:ARTICLES_PER_STOCK])
+        texts_by_stock[stock] = [text for text in texts if text]
+
+    all_texts = [text for texts in texts_by_stock.values() for text in texts]
+    labels = iter(classify_texts(all_texts, classifier, cache, batch_size))
+
+    sentiments = {}
+    for stock, texts in texts_by_stock.items():
+        if not articles_by_stock[stock]:
+            sentiments[stock] = "No News"
+            continue
+        sentiments[stock] = summarize_sentiment([next(labels) for _ in texts])
+    return sentiments
+
+# Function to label the stored top articles of each company that have no label yet.
+# Only the delta since the last run (plus earlier failures) reaches the model.
+def score_stored_articles(store, stock_names, classifier=None, cache=None, batch_size=DEFAULT_BATCH_SIZE,
+                          backend=DEFAULT_BACKEND):
+    pending = {}
+    for stock_name in dict.fromkeys(stock_names):
+        for article in store.articles(stock_name)[:ARTICLES_PER_STOCK]:
+            if article.get('sentiment') is None and article_text(article):
+                pending.setdefault(stock_name, []).append(article)
+
+    articles = [article for stock_articles in pending.values() for article in stock_articles]
+    print(f"\nScoring {len(articles)} new articles" + (f" ({len(cache)} labels cached)" if cache is not None else ""))
+    if articles:
+        labels = classify_texts([article_text(article) for article in articles], classifier, cache, batch_size,
+                                backend=backend)
+        for article, label in zip(articles, labels):
+            article['sentiment'] = label
+    return len(articles)
+
+# Function to get a company's sentiment from its stored top articles
+def stored_sentiment(store, stock_name):
+    articles = store.articles(stock_name)[:ARTICLES_PER_STOCK]
+    if not articles:
+        return "No News"
+    return summarize_sentiment([article.get('sentiment') for article in articles if article_text(article)])
 
 # Update News Sentiment in CSV
-for index, row in stocks_df.iterrows():
-    stock_name = row['Full Name']
-    print(f"\nFetching news for: {stock_name}")
-    articles = fetch_news(stock_name, api_key)
-    sentiment = analyze_sentiment(articles)
-    stocks_df.at[index, 'News Sentiment'] = sentiment
-    print(f"Final Sentiment for {stock_name}: {sentiment}")
-
-# Save the updated CSV
-updated_csv_path = "Largecap.csv"
-stocks_df.to_csv(updated_csv_path, index=False)
-print(f"\nUpdated CSV saved as '{updated_csv_path}'")
\ No newline at end of file
+def update_news_sentiment(csv_file, api_key, cache_file=DEFAULT_CACHE_FILE, batch_size=DEFAULT_BATCH_SIZE,
+                          store_dir=DEFAULT_STORE_DIR, engine=None, classifier=None, backend=DEFAULT_BACKEND):
+    stocks_df = pd.read_csv(csv_file)
+    stock_names = list(stocks_df['Full Name'])
+
+    store = NewsStore(store_dir)
+    fetch_new_articles(stock_names, api_key, store, engine)
+    if classifier is None:
+        # Prefer a running sentiment service's warm model over loading one here
+        classifier = sentiment_service.connect()
+        if classifier is not None:
+            print(f"Using the sentiment service on {classifier.path}")
+    score_stored_articles(store, stock_names, classifier, SentimentCache(cache_file), batch_size, backend)
+
+    sentiments = {}
+    for stock_name in dict.fromkeys(stock_names):
+        store.save(stock_name)
+        sentiments[stock_name] = stored_sentiment(store, stock_name)
+
+    for index, row in stocks_df.iterrows():
+        stocks_df.at[index, 'News Sentiment'] = sentiments[row['Full Name']]
+        print(f"Final Sentiment for {row['Full Name']}: {sentiments[row['Full Name']]}")
+
+    # Save the updated CSV
+    stocks_df.to_csv(csv_file, index=False)
+    print(f"\nUpdated CSV saved as '{csv_file}'")
+
+
+if __name__ == "__main__":
+    # API Key for NewsAPI (replace with your actual key)
+    api_key = os.environ.get('NEWSAPI_KEY', 'bc6b7b73046b4c1397b4d153e027dcd4')  # This is a placeholder - use your own key
+
+    update_news_sentiment("Largecap.csv", api_key)  # Update with your CSV path
@@ -0,0 +1,95 @@
+"""Local store of NewsAPI articles per company, newest first.
+
+Each company's articles live in `<root>/<sha256 of query>.json`:
+
+    {"version": 1, "query": "Reliance Industries",
+     "articles": [{"publishedAt": ..., "url": ..., "title": ..., "description": ...,
+                   "sentiment": "positive"}, ...]}
+
+sorted by publishedAt, newest first, and capped at MAX_ARTICLES. The first
+entry's publishedAt is the cursor for the next fetch, so a run only asks
+NewsAPI for articles newer than the last one seen. Articles are keyed by
+URL: NewsAPI's `from` is inclusive, so the cursor article comes back and is
+dropped here. The per-article sentiment label is stored next to it so only
+new articles are ever scored.
+"""
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_STORE_DIR = '.news_store'
+MAX_ARTICLES = 100
+STORE_VERSION = 1
+
+# The fields of a NewsAPI article worth keeping
+ARTICLE_FIELDS = ('publishedAt', 'url', 'title', 'description')
+
+
+def article_key(article):
+    return article.get('url') or f"{article.get('publishedAt')}\0{article.get('title')}"
+
+
+class NewsStore:
+    """Articles already fetched for each company, loaded lazily and saved atomically."""
+
+    def __init__(self, root=DEFAULT_STORE_DIR, max_articles=MAX_ARTICLES):
+        self.root = root
+        self.max_articles = max_articles
+        self._articles = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, query):
+        return os.path.join(self.root, hashlib.sha256(query.encode('utf-8')).hexdigest() + '.json')
+
+    def articles(self, query):
+        """Stored articles for a company, newest first."""
+        with self._lock:
+            if query not in self._articles:
+                self._articles[query] = self._load(query)
+            return self._articles[query]
+
+    def _load(self, query):
+        path = self._path(query)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == STORE_VERSION and data.get('query') == query:
+                return data['articles']
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable news store entry {path}: {e}")
+        return []
+
+    def latest(self, query):
+        """publishedAt of the newest stored article, or None if nothing is stored."""
+        articles = self.articles(query)
+        return articles[0]['publishedAt'] if articles else None
+
+    def merge(self, query, fetched):
+        """Add fetched articles for a company and return the ones not seen before, newest first."""
+        stored = self.articles(query)
+        seen = {article_key(article) for article in stored}
+        new = []
+        for article in fetched:
+            key = article_key(article)
+            if key in seen or not article.get('publishedAt'):
+                continue
+            seen.add(key)
+            new.append({field: article.get(field) for field in ARTICLE_FIELDS})
+        if new:
+            merged = sorted(new + stored, key=lambda a: a['publishedAt'], reverse=True)
+            with self._lock:
+                self._articles[query] = merged[:self.max_articles]
+        new.sort(key=lambda a: a['publishedAt'], reverse=True)
+        return new
+
+    def save(self, query):
+        articles = self.articles(query)
+        path = self._path(query)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': STORE_VERSION, 'query': query, 'articles': articles}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,125 @@
+"""Local stand-in for NewsAPI's /v2/everything, for testing news.py offline.
+
+Every query gets a deterministic set of articles; publish() adds newer ones
+as time goes by. The server honours `q`, `from` (inclusive) and `pageSize`,
+returns articles newest first, answers with a fixed latency, and replies
+429 with a Retry-After once a client goes over `rate` requests per second,
+like the real API does.
+
+Usage: python newsapi_standin.py [port] [articles per query]   (default: 8765 20)
+       NEWSAPI_BASE=http://127.0.0.1:8765 python news.py
+"""
+import datetime
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fetch_engine import TokenBucket
+
+EPOCH = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+HEADLINES = ['{q} shares rally after strong quarterly results', '{q} misses estimates as margins shrink',
+             '{q} announces board meeting date', '{q} wins large order, stock hits record high',
+             '{q} faces regulatory probe over disclosures', '{q} holds annual general meeting']
+
+
+def published_at(minutes):
+    return (EPOCH + datetime.timedelta(minutes=int(minutes))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class StandInNewsAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, articles_per_query=20, latency=0.05, rate=None, burst=None):
+        super().__init__(('127.0.0.1', port), NewsAPIHandler)
+        self.articles_per_query = articles_per_query
+        self.latency = latency
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.published = {}  # query -> extra articles published via publish()
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def _seed(self, query):
+        return int(hashlib.sha256(query.encode('utf-8')).hexdigest()[:8], 16)
+
+    def articles(self, query):
+        """Every article for a query, newest first"""
+        seed = self._seed(query)
+        slug = ''.join(c if c.isalnum() else '-' for c in query.lower())
+        count = self.articles_per_query + self.published.get(query, 0)
+        articles = []
+        for i in range(count):
+            headline = HEADLINES[(seed + i) % len(HEADLINES)].format(q=query)
+            articles.append({'source': {'id': None, 'name': 'Stand-in Wire'}, 'author': None,
+                             'title': headline, 'description': f"{headline}. Story {i} about {query}.",
+                             'url': f"https://news.example/{slug}/{i}",
+                             'publishedAt': published_at(seed % 1000 + 60 * i), 'content': None})
+        return articles[::-1]
+
+    def publish(self, query, count=1):
+        """Make `count` newer articles appear for a query"""
+        with self._lock:
+            self.published[query] = self.published.get(query, 0) + count
+
+    def admit(self):
+        """Count a request; False if it is over the rate limit"""
+        with self._lock:
+            self.requests += 1
+        if self.bucket is not None and self.bucket.try_acquire():
+            with self._lock:
+                self.rate_limited += 1
+            return False
+        return True
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class NewsAPIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=()):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        parts = urlsplit(self.path)
+        if parts.path != '/v2/everything':
+            return self._reply(404, {'status': 'error', 'code': 'notFound', 'message': parts.path})
+        if not server.admit():
+            return self._reply(429, {'status': 'error', 'code': 'rateLimited', 'message': 'Too many requests'},
+                               [('Retry-After', '1')])
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if not query.get('apiKey'):
+            return self._reply(401, {'status': 'error', 'code': 'apiKeyMissing', 'message': 'No API key'})
+        articles = server.articles(query.get('q', ''))
+        if query.get('from'):
+            articles = [a for a in articles if a['publishedAt'] >= query['from']]
+        page_size = int(query.get('pageSize', 100))
+        self._reply(200, {'status': 'ok', 'totalResults': len(articles), 'articles': articles[:page_size]})
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    port, articles_per_query = args + [8765, 20][len(args):]
+    server = StandInNewsAPI(port, articles_per_query)
+    print(f"Stand-in NewsAPI on {server.base_url}/v2/everything")
+    server.serve_forever()
@@ -1,45 +1,116 @@
+import os
 import pandas as pd
-import numpy as np
-
-# Load the original CSV file
-file_path = 'sm.csv'  # Replace with your original file path
-df = pd.read_csv(file_path)
-
-# Clean the Theme column by stripping whitespace and converting to lowercase for consistent comparison
-df['Theme'] = df['Theme'].str.strip().str.lower()
-
-# Get all unique themes in the dataset
-all_themes = df['Theme'].unique()
-
-# Process each theme separately
-for theme in all_themes:
-    if pd.isna(theme):  # Skip if theme is NaN
-        continue
-        
-    # Filter only stocks that match the current theme
-    filtered_df = df[df['Theme'] == theme].copy()
-    
-    # Replace placeholders with NaN in the copied DataFrame
-    filtered_df.replace(['n/a', 'Data not found', '-', ''], np.nan, inplace=True)
-    
-    # Remove commas and % from all string/object columns
-    filtered_df = filtered_df.apply(lambda x: x.str.replace(',', '', regex=True) if x.dtype == 'object' else x)
-    filtered_df = filtered_df.apply(lambda x: x.str.replace('%', '', regex=True) if x.dtype == 'object' else x)
-    
-    # Columns to exclude from conversion
-    exclude_columns = ['Stock Symbol', 'Theme', 'Full Name', 'Expert Recommendation', 'News Sentiment']
-    
-    # Convert all other columns to float and round to 2 decimal places
-    for column in filtered_df.columns:
-        if column not in exclude_columns:
-            filtered_df[column] = pd.to_numeric(filtered_df[column], errors='coerce').round(2)
-    
-    # Capitalize the theme name for the filename
-    theme_filename = f"{theme.capitalize()}.csv"
-    
-    # Save the cleaned and filtered data to a new CSV file
-    filtered_df.to_csv(theme_filename, index=False)
-    
-    print(f"Filtered and cleaned data for theme '{theme}' has been saved to '{theme_filename}'")
-
-print("Processing complete. Separate CSV files have been created for each theme.")
\ No newline at end of file
+
+import snapshot_store
+
+# Columns to exclude from conversion
+EXCLUDE_COLUMNS = ['Stock Symbol', 'Theme', 'Full Name', 'Expert Recommendation', 'News Sentiment']
+
+
+def theme_filename(theme, output_dir='.'):
+    """File a cleaned theme is written to (the theme name is capitalized)."""
+    return os.path.join(output_dir, f"{theme.capitalize()}.csv")
+
+
+# Values treated as missing before any stripping
+PLACEHOLDERS = ['n/a', 'Data not found', '-', '']
+
+# What to_numeric turns into int64 rather than float64
+_INTEGER_PATTERN = r'[+-]?\d+'
+
+
+def _clean_frame(df):
+    """clean_frame() that also returns the stripped text of every column it converted."""
+    df = df.copy()
+    texts = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == 'object':
+            # Replace placeholders with NaN, then remove commas and % (plain substring replaces)
+            values = values.where(~values.isin(PLACEHOLDERS))
+            values = values.str.replace(',', '', regex=False).str.replace('%', '', regex=False)
+            if column not in EXCLUDE_COLUMNS:
+                texts[column] = values
+        if column not in EXCLUDE_COLUMNS:
+            # Convert all other columns to float and round to 2 decimal places
+            values = pd.to_numeric(values, errors='coerce').round(2)
+        df[column] = values
+    return df, texts
+
+
+def clean_frame(df):
+    """Normalize placeholders, strip ',' and '%' and convert the numeric columns.
+
+    Every column is handled once, with vectorized operations over the whole
+    frame, so the cost does not grow with the number of themes.
+    """
+    return _clean_frame(df)[0]
+
+
+def _restore_integer_columns(frame, texts):
+    """Give a theme the int64 columns converting it on its own would have produced.
+
+    to_numeric yields int64 when every value of a column is a plain integer;
+    over the whole universe a NaN elsewhere forces float64 for everyone.
+    """
+    for column, text in texts.items():
+        values = frame[column]
+        if values.dtype != 'float64' or values.isna().any() or (values % 1 != 0).any():
+            continue
+        if text.loc[frame.index].str.fullmatch(_INTEGER_PATTERN).all():
+            frame = frame.astype({column: 'int64'})
+    return frame
+
+
+def split_frame_by_theme(df):
+    """Clean the whole snapshot once and split it with a single groupby; returns {theme: frame}."""
+    df = df.copy()
+    # Clean the Theme column by stripping whitespace and converting to lowercase for consistent comparison
+    df['Theme'] = df['Theme'].str.strip().str.lower()
+
+    cleaned, texts = _clean_frame(df)
+
+    # Rows without a theme are dropped by the groupby
+    return {
+        theme: _restore_integer_columns(filtered_df, texts)
+        for theme, filtered_df in cleaned.groupby('Theme', sort=False)
+    }
+
+
+def split_by_theme(file_path='sm.csv', output_dir='.', snapshots=True, symbols=None):
+    """Clean the scraped snapshot and write one CSV per theme; return the files written.
+
+    With `snapshots` each theme is also stored as a typed snapshot next to its
+    CSV, so later stages can skip parsing the text again. Given `symbols`
+    (e.g. the stocks in the scraper's change log), only the themes holding
+    one of them, or whose file does not exist yet, are cleaned and rewritten.
+    """
+    # Load the original CSV file
+    df = pd.read_csv(file_path)
+
+    if symbols is not None:
+        themes = df['Theme'].str.strip().str.lower()
+        missing = {theme for theme in themes.dropna().unique()
+                   if not os.path.exists(theme_filename(theme, output_dir))}
+        affected = set(themes[df['Stock Symbol'].isin(set(symbols))].dropna()) | missing
+        df = df[themes.isin(affected)]
+
+    written = []
+    for theme, filtered_df in split_frame_by_theme(df).items():
+        # Capitalize the theme name for the filename
+        output_file = theme_filename(theme, output_dir)
+
+        # Save the cleaned and filtered data to a new CSV file
+        filtered_df.to_csv(output_file, index=False)
+        if snapshots:
+            snapshot_store.write_snapshot(filtered_df, snapshot_store.snapshot_path(output_file), source_csv=output_file)
+        written.append(output_file)
+
+        print(f"Filtered and cleaned data for theme '{theme}' has been saved to '{output_file}'")
+
+    print("Processing complete. Separate CSV files have been created for each theme.")
+    return written
+
+
+if __name__ == "__main__":
+    split_by_theme('sm.csv')  # Replace with your original file path
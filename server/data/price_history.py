@@ -0,0 +1,273 @@
+"""Append-only store of daily prices and scraped fundamentals per symbol.
+
+    price_history/
+        manifest.json           {"version": 1, "symbols": [...], "parts": [
+                                    {"dir": "2024-000012", "year": 2024, "seq": 12,
+                                     "rows": 250000, "fields": ["Open", ..., "Close", "Beta"]}, ...]}
+        2024-000012/
+            symbol.npy          int32 symbol id per row (id = position in "symbols")
+            day.npy             int32 day per row
+            values.npy          float64 (fields x rows), one contiguous row per field
+            offsets.npy         rows of symbol id i are offsets[i]:offsets[i + 1]
+
+`day` is the proleptic Gregorian ordinal (datetime.date.toordinal()). Rows of
+a part are sorted by (symbol, day) and unique, so offsets.npy is the
+(symbol, day) index: a symbol's rows are one slice and its days a sorted run.
+
+Every append writes new parts, one per calendar year it touches, and then
+swaps in a new manifest; files are never modified in place. For one
+(symbol, day) the latest non-missing value of each field wins, so a
+refresh of some fields does not erase the others. Once a year has
+COMPACT_AFTER parts they are merged into one. Readers memory-map only the
+parts of the years they ask for.
+"""
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_DIR = os.path.join(DATA_DIR, 'price_history')
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+COMPACT_AFTER = 8  # Parts a year may have before they are merged into one
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def as_day(day):
+    """Day ordinal of a date, datetime or ordinal"""
+    if isinstance(day, (datetime.date, datetime.datetime)):
+        return day.toordinal()
+    return int(day)
+
+
+def _years(days):
+    """Calendar year of each day ordinal"""
+    dates = (np.asarray(days, dtype=np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+    return dates.astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _merge_rows(symbol, day, values):
+    """Sort rows by (symbol, day) and collapse duplicates.
+
+    Rows must be in append order; per field, the last non-missing value of
+    each (symbol, day) is kept.
+    """
+    order = np.lexsort((np.arange(len(day)), day, symbol))
+    symbol, day, values = symbol[order], day[order], values[:, order]
+    last = np.ones(len(day), dtype=bool)
+    last[:-1] = (symbol[1:] != symbol[:-1]) | (day[1:] != day[:-1])
+    if last.all():
+        return symbol, day, values
+    first = np.ones(len(day), dtype=bool)
+    first[1:] = last[:-1]
+    positions = np.arange(len(day))
+    merged = np.empty((values.shape[0], int(last.sum())))
+    for i, field_values in enumerate(values):
+        # Forward-fill each field within its (symbol, day) group, then take the group's last row
+        source = np.maximum.accumulate(np.where(~np.isnan(field_values) | first, positions, 0))
+        merged[i] = field_values[source][last]
+    return symbol[last], day[last], merged
+
+
+class PriceHistory:
+    """One price-history directory: bulk appends and (days x symbols) range reads"""
+
+    def __init__(self, root=DEFAULT_HISTORY_DIR):
+        self.root = root
+        self._load_manifest()
+
+    def _load_manifest(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        manifest = {'version': MANIFEST_VERSION, 'symbols': [], 'parts': []}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MANIFEST_VERSION:
+                raise ValueError(f"{self.root}: unsupported price history version {manifest.get('version')}")
+        self.symbols = manifest['symbols']
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.parts = manifest['parts']
+
+    def _save_manifest(self):
+        manifest = {'version': MANIFEST_VERSION, 'symbols': self.symbols, 'parts': self.parts}
+        tmp_path = os.path.join(self.root, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.root, MANIFEST_FILE))
+
+    @property
+    def fields(self):
+        """Every field stored in any part, in first-seen order"""
+        return list(dict.fromkeys(field for part in self.parts for field in part['fields']))
+
+    def _write_part(self, name, year, seq, fields, symbol, day, values):
+        tmp_path = os.path.join(self.root, f"{name}.{os.getpid()}.tmp")
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        offsets = np.searchsorted(symbol, np.arange(len(self.symbols) + 1)).astype(np.int64)
+        for file, array in (('symbol', symbol.astype(np.int32)), ('day', day.astype(np.int32)),
+                            ('values', np.ascontiguousarray(values, dtype=np.float64)), ('offsets', offsets)):
+            np.save(os.path.join(tmp_path, f"{file}.npy"), array)
+        os.replace(tmp_path, os.path.join(self.root, name))
+        return {'dir': name, 'year': int(year), 'seq': seq, 'rows': len(day), 'fields': list(fields)}
+
+    def _open_part(self, part, mmap=True):
+        path = os.path.join(self.root, part['dir'])
+        return {file: np.load(os.path.join(path, f"{file}.npy"), mmap_mode='r' if mmap else None)
+                for file in ('symbol', 'day', 'values', 'offsets')}
+
+    def append(self, symbols, days, fields):
+        """Append rows given as parallel sequences of symbols and days plus {field: values}.
+
+        Days may be dates or ordinals. Missing values (NaN) never overwrite
+        stored ones.
+        """
+        days = np.array([as_day(day) for day in days], dtype=np.int64)
+        if len(days) == 0:
+            return
+        names = list(fields)
+        values = np.empty((len(names), len(days)))
+        for i, name in enumerate(names):
+            values[i] = np.asarray(fields[name], dtype=np.float64)
+
+        os.makedirs(self.root, exist_ok=True)
+        symbol = np.fromiter((self.symbol_ids.setdefault(s, len(self.symbol_ids)) for s in symbols),
+                             dtype=np.int64, count=len(days))
+        self.symbols = list(self.symbol_ids)
+        seq = max((part['seq'] for part in self.parts), default=0)
+        years = _years(days)
+        for year in np.unique(years).tolist():
+            in_year = years == year
+            seq += 1
+            merged = _merge_rows(symbol[in_year], days[in_year], values[:, in_year])
+            self.parts.append(self._write_part(f"{year}-{seq:06d}", year, seq, names, *merged))
+        self._save_manifest()
+
+        for year in np.unique(years).tolist():
+            if sum(part['year'] == year for part in self.parts) >= COMPACT_AFTER:
+                self.compact(year)
+
+    def append_day(self, day, frame, symbol_column='Stock Symbol'):
+        """Append one row per symbol of a frame for `day`; every numeric column becomes a field"""
+        numeric = [c for c in frame.columns if c != symbol_column and frame[c].dtype.kind in 'fiub']
+        symbols = frame[symbol_column].astype(str).tolist()
+        self.append(symbols, [as_day(day)] * len(symbols),
+                    {column: frame[column].to_numpy(dtype=np.float64) for column in numeric})
+
+    def compact(self, year=None):
+        """Merge the parts of a year (default: every year) into one"""
+        years = sorted({part['year'] for part in self.parts}) if year is None else [year]
+        for year in years:
+            merging = sorted((part for part in self.parts if part['year'] == year), key=lambda part: part['seq'])
+            if len(merging) < 2:
+                continue
+            names = list(dict.fromkeys(field for part in merging for field in part['fields']))
+            symbols, days, blocks = [], [], []
+            for part in merging:
+                arrays = self._open_part(part, mmap=False)
+                block = np.full((len(names), part['rows']), np.nan)
+                for i, field in enumerate(part['fields']):
+                    block[names.index(field)] = arrays['values'][i]
+                symbols.append(arrays['symbol'])
+                days.append(arrays['day'])
+                blocks.append(block)
+            merged = _merge_rows(np.concatenate(symbols).astype(np.int64), np.concatenate(days).astype(np.int64),
+                                 np.concatenate(blocks, axis=1))
+            # The merged part keeps the newest seq, so it still orders before later appends
+            seq = merging[-1]['seq']
+            compacted = self._write_part(f"{year}-{seq:06d}c", year, seq, names, *merged)
+            merged_dirs = {part['dir'] for part in merging}
+            self.parts = [part for part in self.parts if part['dir'] not in merged_dirs] + [compacted]
+            self._save_manifest()
+            for name in merged_dirs:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def read(self, symbols, start, end, fields=PRICE_FIELDS):
+        """Values of `fields` for `symbols` over the days start..end (inclusive).
+
+        Returns (days, {field: (days x symbols) matrix}) where `days` are the
+        ordinals any stored row falls on; missing values are NaN.
+        """
+        for attempt in range(3):
+            try:
+                return self._read(list(symbols), as_day(start), as_day(end), list(fields))
+            except FileNotFoundError:
+                # Another process compacted the parts we were reading; pick up its manifest
+                if attempt == 2:
+                    raise
+                self._load_manifest()
+
+    def _read(self, symbols, start, end, fields):
+        span = max(end - start + 1, 0)
+        out = {field: np.full((span, len(symbols)), np.nan) for field in fields}
+        present = np.zeros(span, dtype=bool)
+        ids = np.array([self.symbol_ids.get(s, -1) for s in symbols], dtype=np.int64)
+        known = np.flatnonzero(ids >= 0)
+
+        first_year, last_year = _years([start, end]).tolist() if span else (0, -1)
+        parts = sorted((part for part in self.parts if first_year <= part['year'] <= last_year),
+                       key=lambda part: part['seq'])
+        for part in parts:
+            arrays = self._open_part(part)
+            offsets = arrays['offsets']
+            # Symbols added after this part was written have no rows in it
+            columns = known[ids[known] < len(offsets) - 1]
+            starts, lengths = offsets[ids[columns]], offsets[ids[columns] + 1] - offsets[ids[columns]]
+            # Row numbers of every requested symbol's slice, gathered in one go
+            rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            column = np.repeat(columns, lengths)
+            day = arrays['day'][rows]
+            if day.size and (day.min() < start or day.max() > end):
+                in_range = (day >= start) & (day <= end)
+                rows, column, day = rows[in_range], column[in_range], day[in_range]
+            position = day - start
+            present[position] = True
+            # Flat offsets into the (days x symbols) matrices
+            cells = position * len(symbols) + column
+            for field in fields:
+                if field not in part['fields']:
+                    continue
+                values = arrays['values'][part['fields'].index(field)][rows]
+                valid = ~np.isnan(values)
+                out[field].ravel()[cells[valid]] = values[valid]
+
+        days = (np.flatnonzero(present) + start).astype(np.int32)
+        return days, {field: matrix[present] for field, matrix in out.items()}
+
+
+def load_closes(symbols, lookback_days=3 * 365, end=None, root=DEFAULT_HISTORY_DIR):
+    """Close prices as a (days x symbols) matrix over the `lookback_days` calendar days up to `end`"""
+    end_day = as_day(end or datetime.date.today())
+    days, fields = PriceHistory(root).read(symbols, end_day - lookback_days, end_day, ['Close'])
+    return days, fields['Close']
+
+
+def append_closes(day, closes, root=DEFAULT_HISTORY_DIR):
+    """Record one day's closing price for each symbol of {symbol: close}"""
+    PriceHistory(root).append(list(closes), [as_day(day)] * len(closes),
+                              {'Close': [np.nan if close is None else close for close in closes.values()]})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or compact a price history store")
+    parser.add_argument('--root', default=DEFAULT_HISTORY_DIR)
+    parser.add_argument('--compact', action='store_true', help="Merge the parts of every year")
+    args = parser.parse_args()
+
+    store = PriceHistory(args.root)
+    if args.compact:
+        store.compact()
+    print(f"{args.root}: {len(store.symbols)} symbols, {len(store.parts)} parts, fields {store.fields}")
+    for part in sorted(store.parts, key=lambda part: (part['year'], part['seq'])):
+        print(f"  {part['dir']:<16}{part['rows']:>10} rows  {len(part['fields'])} fields")
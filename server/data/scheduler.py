@@ -0,0 +1,174 @@
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+
+# NSE cash market session (holidays are not modelled)
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+# Quarterly results windows as ((month, day), (month, day)) in IST
+RESULTS_SEASONS = [
+    ((1, 10), (2, 20)),
+    ((4, 10), (5, 20)),
+    ((7, 10), (8, 20)),
+    ((10, 10), (11, 20)),
+]
+
+# Refresh interval per field family in seconds; None means "follow results season"
+REFRESH_INTERVALS = {
+    'price': 5 * MINUTE,
+    'ratios': DAY,
+    'analyst': DAY,
+    'financials': None,
+}
+
+# Seconds before families whose refresh raised are tried again
+RETRY_DELAY = MINUTE
+
+DEFAULT_STATE_FILE = 'scheduler_state.json'
+
+
+def is_market_open(ts):
+    """Check whether the NSE session is open at epoch time `ts`."""
+    now = datetime.fromtimestamp(ts, IST)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+def next_market_open(ts):
+    """Epoch time of the next session open at or after `ts`."""
+    now = datetime.fromtimestamp(ts, IST)
+    candidate = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if candidate < now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+def market_close_at(ts):
+    """Epoch time at which the session containing `ts` closes."""
+    now = datetime.fromtimestamp(ts, IST)
+    return now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0).timestamp()
+
+
+def _season_bounds(year):
+    for (start_month, start_day), (end_month, end_day) in RESULTS_SEASONS:
+        start = datetime(year, start_month, start_day, tzinfo=IST)
+        end = datetime(year, end_month, end_day, 23, 59, 59, tzinfo=IST)
+        yield start.timestamp(), end.timestamp()
+
+
+def next_financials_due(last_run, now):
+    """Financials are refreshed daily during a results season and once after it ends."""
+    year = datetime.fromtimestamp(now, IST).year
+    seasons = sorted(
+        bounds for y in (year - 1, year, year + 1) for bounds in _season_bounds(y)
+    )
+    for start, end in seasons:
+        if start <= now <= end:
+            return (last_run or 0) + DAY
+    last_end = max(end for start, end in seasons if end < now)
+    if last_run is None or last_run < last_end:
+        return now
+    return min(start for start, end in seasons if start > now)
+
+
+class RefreshScheduler:
+    """Priority queue of field families, each refreshed at its own cadence.
+
+    `run_families(families)` does the actual work for every family due at
+    once, so families that fall due together share one pipeline pass. The
+    time each family last ran is kept in a JSON state file so a restart picks
+    up where it left off instead of re-scraping everything. If a pass raises,
+    the error is logged and its families are retried after `retry_delay`
+    seconds without being marked as run.
+    """
+
+    def __init__(self, run_families, intervals=REFRESH_INTERVALS, state_file=DEFAULT_STATE_FILE,
+                 clock=time.time, sleep=time.sleep, retry_delay=RETRY_DELAY):
+        self.run_families = run_families
+        self.retry_delay = retry_delay
+        self.intervals = intervals
+        self.state_file = state_file
+        self.clock = clock
+        self.sleep = sleep
+        self.last_run = self._load_state()
+        self.queue = []
+        now = self.clock()
+        for family in self.intervals:
+            heapq.heappush(self.queue, (self.next_due(family, now), family))
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable scheduler state {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.last_run, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def next_due(self, family, now):
+        last_run = self.last_run.get(family)
+        interval = self.intervals[family]
+        if interval is None:
+            return next_financials_due(last_run, now)
+        if last_run is None:
+            return now
+        return last_run + interval
+
+    def run_pending(self):
+        """Run every family that is due now; return the families that ran (none if the pass failed)."""
+        now = self.clock()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue)[1])
+        if not due:
+            return due
+
+        print(f"Refreshing {', '.join(due)}...")
+        try:
+            self.run_families(due)
+        except Exception as e:
+            # The stages run in this process, so a failed pass must not stop the loop
+            retry_at = self.clock() + self.retry_delay
+            print(f"Refreshing {', '.join(due)} failed: {e!r}; retrying in {self.retry_delay:.0f}s")
+            for family in due:
+                heapq.heappush(self.queue, (retry_at, family))
+            return []
+        finished = self.clock()
+        for family in due:
+            self.last_run[family] = finished
+            heapq.heappush(self.queue, (self.next_due(family, finished), family))
+        self._save_state()
+        return due
+
+    def run_forever(self):
+        while True:
+            now = self.clock()
+            if not is_market_open(now):
+                wake_at = next_market_open(now)
+                print(f"Market closed, sleeping until {datetime.fromtimestamp(wake_at, IST):%Y-%m-%d %H:%M} IST\n")
+                self.sleep(max(wake_at - now, 1))
+                continue
+
+            self.run_pending()
+
+            now = self.clock()
+            wake_at = min(self.queue[0][0], market_close_at(now))
+            if wake_at > now:
+                self.sleep(wake_at - now)
@@ -0,0 +1,203 @@
+"""Declarative scoring rules compiled into vectorized evaluators.
+
+A rules file (see scoring_rules.json) lists every score column with its input
+columns, weight and either numeric bins or categorical labels:
+
+    "Beta Score": {
+        "columns": ["Beta"],
+        "weight": 0.05,
+        "bins": [{"ge": 0.8, "le": 1.2, "score": 10}, ...],
+        "default": 4
+    }
+
+Bins are tried in order and the first match wins; each bin may bound the
+value with any of "gt", "ge", "lt" and "le". Values matching no bin get
+"default"; missing inputs (NaN or '-') get "missing" (0 unless given).
+"transform": "upside" scores the percentage gap between the two input
+columns (current price, target price) instead of a raw column.
+
+Per-theme overrides live under "themes", keyed by the lower-case theme name
+used in the Theme column. They may replace any field of a metric or adjust
+weights:
+
+    "themes": {"it": {"metrics": {"Beta Score": {"bins": [...]}}}}
+"""
+import copy
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoring_rules.json')
+
+_COMPARATORS = {
+    'gt': np.greater,
+    'ge': np.greater_equal,
+    'lt': np.less,
+    'le': np.less_equal,
+}
+
+
+def _as_float_array(values):
+    """Coerce a column to float64, turning '-' and other non-numeric entries into NaN."""
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+
+def _upside(current_price, target_price):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (target_price - current_price) / current_price * 100
+
+
+_TRANSFORMS = {'upside': _upside}
+
+
+class CompiledMetric:
+    """One score column: inputs, weight and a vectorized evaluator."""
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.columns = list(spec['columns'])
+        self.weight = float(spec['weight'])
+        self.default = spec.get('default', 0)
+        self.missing = spec.get('missing', 0)
+
+        if 'categories' in spec:
+            self.categories = dict(spec['categories'])
+            self.evaluate = self._evaluate_categories
+            return
+
+        transform = spec.get('transform')
+        if transform is None and len(self.columns) != 1:
+            raise ValueError(f"{name}: several input columns need a transform")
+        if transform is not None and transform not in _TRANSFORMS:
+            raise ValueError(f"{name}: unknown transform {transform!r}")
+        self.transform = _TRANSFORMS.get(transform)
+
+        self.bins = []
+        for bin_spec in spec.get('bins', []):
+            bounds = [(_COMPARATORS[op], float(bin_spec[op])) for op in _COMPARATORS if op in bin_spec]
+            unknown = set(bin_spec) - set(_COMPARATORS) - {'score'}
+            if unknown:
+                raise ValueError(f"{name}: unknown bin keys {sorted(unknown)}")
+            self.bins.append((bounds, bin_spec['score']))
+        self.evaluate = self._evaluate_bins
+
+    def _evaluate_bins(self, *columns):
+        inputs = [_as_float_array(values) for values in columns]
+        missing = np.zeros(len(inputs[0]), dtype=bool)
+        for values in inputs:
+            missing |= np.isnan(values)
+        v = self.transform(*inputs) if self.transform else inputs[0]
+
+        conditions = [missing]
+        for bounds, _ in self.bins:
+            condition = np.ones(len(v), dtype=bool)
+            for compare, threshold in bounds:
+                condition &= compare(v, threshold)
+            conditions.append(condition)
+        # NaN produced by a transform (e.g. 0/0 upside) fails every bin and gets the default
+        return np.select(conditions, [self.missing, *(score for _, score in self.bins)], self.default)
+
+    def _evaluate_categories(self, values):
+        scores = pd.Series(values).map(self.categories)
+        scores[pd.isna(values)] = self.missing
+        return scores.fillna(self.default).to_numpy(dtype=np.result_type(self.default, self.missing, *self.categories.values()))
+
+
+class ScoringProfile:
+    """A compiled set of metrics and weights that scores in-memory frames."""
+
+    def __init__(self, metric_specs):
+        self.metrics = [CompiledMetric(name, spec) for name, spec in metric_specs.items()]
+        self.names = [metric.name for metric in self.metrics]
+        self.weights = np.array([metric.weight for metric in self.metrics], dtype=float)
+
+    def score_matrix(self, data):
+        """Evaluate every metric over the frame; returns a (metrics x stocks) matrix."""
+        return np.vstack([
+            metric.evaluate(*(data[col].to_numpy() for col in metric.columns))
+            for metric in self.metrics
+        ])
+
+    def weighted_total(self, score_matrix):
+        """Weighted sum of the score matrix rows, one vectorized add per metric.
+
+        Adding the weighted rows one after another reproduces the float
+        rounding of a sequential `sum(score * weight ...)` exactly, whatever the
+        number of stocks. A BLAS dot product, or numpy's pairwise .sum() on a
+        narrow matrix, may reorder the additions and shift tied totals.
+        """
+        totals = np.zeros(score_matrix.shape[1], dtype=float)
+        for scores, weight in zip(score_matrix, self.weights):
+            totals += scores * weight
+        return totals
+
+
+class RuleSet:
+    """Parsed rules file; compiles the default and per-theme profiles on demand."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.theme_overrides = {theme.lower(): override for theme, override in spec.get('themes', {}).items()}
+        self._profiles = {}
+
+    def profile(self, theme=None):
+        key = theme.lower() if isinstance(theme, str) and theme.lower() in self.theme_overrides else None
+        if key not in self._profiles:
+            metrics = copy.deepcopy(self.spec['metrics'])
+            if key is not None:
+                override = self.theme_overrides[key]
+                for name, fields in override.get('metrics', {}).items():
+                    if name not in metrics:
+                        raise ValueError(f"Theme {key!r} overrides unknown metric {name!r}")
+                    metrics[name].update(fields)
+                for name, weight in override.get('weights', {}).items():
+                    if name not in metrics:
+                        raise ValueError(f"Theme {key!r} weights unknown metric {name!r}")
+                    metrics[name]['weight'] = weight
+            self._profiles[key] = ScoringProfile(metrics)
+        return self._profiles[key]
+
+    @property
+    def names(self):
+        return self.profile().names
+
+    def _theme_overrides_in(self, data):
+        """Yield (profile, row mask) for every overridden theme present in the frame."""
+        if not self.theme_overrides or 'Theme' not in data.columns:
+            return
+        themes = data['Theme'].astype(str).str.strip().str.lower().to_numpy()
+        for theme in self.theme_overrides:
+            mask = themes == theme
+            if mask.any():
+                yield self.profile(theme), mask
+
+    def score_metric(self, data, index):
+        """Evaluate one metric (by position) over the frame, honouring theme overrides."""
+        metric = self.profile().metrics[index]
+        scores = metric.evaluate(*(data[col].to_numpy() for col in metric.columns))
+        for profile, mask in self._theme_overrides_in(data):
+            theme_metric = profile.metrics[index]
+            theme_scores = theme_metric.evaluate(*(data.loc[mask, col].to_numpy() for col in theme_metric.columns))
+            scores = scores.astype(np.result_type(scores, theme_scores), copy=False)
+            scores[mask] = theme_scores
+        return scores
+
+    def weighted_total(self, data, score_matrix):
+        """Total score per row, using each row's theme weights."""
+        totals = self.profile().weighted_total(score_matrix)
+        for profile, mask in self._theme_overrides_in(data):
+            totals[mask] = profile.weighted_total(score_matrix[:, mask])
+        return totals
+
+    def score(self, data):
+        """Score a frame, applying theme overrides per row; returns (score matrix, totals)."""
+        matrix = np.vstack([self.score_metric(data, i) for i in range(len(self.names))])
+        return matrix, self.weighted_total(data, matrix)
+
+
+def load_rules(path=DEFAULT_RULES_FILE):
+    """Read and compile a rules file."""
+    with open(path, 'r') as f:
+        return RuleSet(json.load(f))
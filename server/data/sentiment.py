@@ -0,0 +1,224 @@
+"""Batched, cached financial-news sentiment classification.
+
+Texts are deduplicated, looked up in a persistent cache keyed by the
+SHA-256 of (model, text), and only the misses go through the model, in
+batches of similar length so little of each batch is padding. The model
+is loaded on first use, so a run where every headline is cached never
+loads it.
+
+The model runs on one of several CPU backends (SENTIMENT_BACKEND):
+
+    pytorch    the transformers pipeline in fp32 (the reference)
+    quantized  the same pipeline with its Linear layers dynamically quantized to int8
+    onnx       the model exported once to an ONNX graph under MODEL_DIR, run by onnxruntime
+    onnx-int8  that graph with dynamically quantized int8 weights
+
+torch, transformers and onnxruntime are only imported when a backend is
+loaded. Cached labels are keyed by model, not backend. bench_sentiment.py checks each backend's labels against pytorch's
+and measures articles per second.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FINBERT_MODEL = "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"
+
+BACKENDS = ('pytorch', 'quantized', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'pytorch')
+DEFAULT_THREADS = int(os.environ.get('SENTIMENT_THREADS', 0)) or None  # None: every core we may run on
+MODEL_DIR = '.sentiment_models'
+ONNX_OPSET = 14
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_CACHE_FILE = '.sentiment_cache.json'
+CACHE_VERSION = 1
+
+_classifiers = {}
+
+
+def pin_threads(threads=None):
+    """Pin this process to `threads` cores and size torch's thread pools to match.
+
+    Returns the thread count used. Intra-op parallelism gets one thread per
+    pinned core; inter-op parallelism is off, since a batch is one graph.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    threads = min(threads or len(cores), len(cores))
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores[:threads])
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    try:
+        import torch
+    except ImportError:
+        return threads
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set once this process has run a model
+    return threads
+
+
+def load_classifier(model=FINBERT_MODEL, backend=DEFAULT_BACKEND, threads=DEFAULT_THREADS):
+    """The sentiment classifier for a model and backend, loaded once per process.
+
+    Every backend is called like the transformers pipeline:
+    classifier(texts, batch_size=..., truncation=True, max_length=512) -> [{'label', 'score'}].
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {backend!r}; expected one of {BACKENDS}")
+    if (model, backend) not in _classifiers:
+        threads = pin_threads(threads)
+        if backend in ('onnx', 'onnx-int8'):
+            _classifiers[model, backend] = OnnxClassifier(model, threads, quantize=backend == 'onnx-int8')
+        else:
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+            network = AutoModelForSequenceClassification.from_pretrained(model).eval()
+            if backend == 'quantized':
+                import torch
+                network = torch.quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8)
+            _classifiers[model, backend] = pipeline("sentiment-analysis", model=network,
+                                                    tokenizer=AutoTokenizer.from_pretrained(model), device=-1)
+    return _classifiers[model, backend]
+
+
+def export_onnx(model=FINBERT_MODEL, model_dir=MODEL_DIR, quantize=False):
+    """Path of the model's ONNX graph, exporting (and quantizing) it on first use."""
+    name = model.replace('/', '--')
+    path = os.path.join(model_dir, f"{name}.onnx")
+    if not os.path.exists(path):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        os.makedirs(model_dir, exist_ok=True)
+        network = AutoModelForSequenceClassification.from_pretrained(model, torchscript=True).eval()
+        sample = AutoTokenizer.from_pretrained(model)(["Shares rally after results"], return_tensors='pt')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(network, (sample['input_ids'], sample['attention_mask']), tmp_path,
+                              input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                              dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                                            'attention_mask': {0: 'batch', 1: 'sequence'},
+                                            'logits': {0: 'batch'}},
+                              opset_version=ONNX_OPSET)
+        os.replace(tmp_path, path)
+    if not quantize:
+        return path
+
+    quantized_path = os.path.join(model_dir, f"{name}.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+class OnnxClassifier:
+    """A sequence-classification model's ONNX graph on onnxruntime's CPU provider, called like a pipeline."""
+
+    def __init__(self, model=FINBERT_MODEL, threads=1, quantize=False, model_dir=MODEL_DIR):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.id2label = AutoConfig.from_pretrained(model).id2label
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(export_onnx(model, model_dir, quantize), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_names = {graph_input.name for graph_input in self.session.get_inputs()}
+
+    def __call__(self, texts, batch_size=DEFAULT_BATCH_SIZE, truncation=True, max_length=512):
+        results = []
+        for start in range(0, len(texts), batch_size or len(texts)):
+            encoded = self.tokenizer(texts[start:start + (batch_size or len(texts))], padding=True,
+                                     truncation=truncation, max_length=max_length, return_tensors='np')
+            feeds = {name: values.astype(np.int64) for name, values in encoded.items() if name in self.input_names}
+            logits = self.session.run(None, feeds)[0]
+            scores = np.exp(logits - logits.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+            for row in scores:
+                best = int(row.argmax())
+                results.append({'label': self.id2label[best], 'score': float(row[best])})
+        return results
+
+
+def text_key(text, model=FINBERT_MODEL):
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """Labels already computed, persisted as JSON under the hash of (model, text)."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, model=FINBERT_MODEL):
+        self.path = path
+        self.model = model
+        self.labels = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_VERSION:
+                    self.labels = data['labels']
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable sentiment cache {path}: {e}")
+
+    def get(self, text):
+        return self.labels.get(text_key(text, self.model))
+
+    def put(self, text, label):
+        self.labels[text_key(text, self.model)] = label
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'labels': self.labels}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def classify_texts(texts, classifier=None, cache=None, batch_size=DEFAULT_BATCH_SIZE, model=FINBERT_MODEL,
+                   backend=DEFAULT_BACKEND):
+    """Lower-case sentiment label ('positive', 'negative', 'neutral') of each text.
+
+    Duplicates are classified once and cached texts not at all. A batch the
+    model fails on is reported and its texts get None.
+    """
+    labels = {}
+    misses = []
+    for text in dict.fromkeys(texts):
+        label = cache.get(text) if cache is not None else None
+        if label is None:
+            misses.append(text)
+        else:
+            labels[text] = label
+
+    if misses:
+        classifier = classifier or load_classifier(model, backend)
+        misses.sort(key=len)
+        for start in range(0, len(misses), batch_size):
+            batch = misses[start:start + batch_size]
+            try:
+                results = classifier(batch, batch_size=len(batch), truncation=True, max_length=512)
+            except Exception as e:
+                print(f"Error analyzing sentiment: {e}")
+                continue
+            for text, result in zip(batch, results):
+                labels[text] = result['label'].lower()
+                if cache is not None:
+                    cache.put(text, labels[text])
+        if cache is not None:
+            cache.save()
+
+    return [labels.get(text) for text in texts]
@@ -0,0 +1,247 @@
+"""Resident sentiment service: a warm model behind a local Unix socket.
+
+The protocol is one JSON object per line each way:
+
+    {"op": "classify", "texts": ["...", ...]}  ->  {"labels": ["positive", ...]}
+    {"op": "metrics"}                          ->  {"queue_depth": 0, "latency_ms": {...}, ...}
+    {"op": "ping"}                             ->  {"ok": true}
+
+Each connection gets a thread. Texts from all connections go onto one
+queue. A single worker drains it into micro-batches: it waits at most
+`max_wait` after the first text, or until `max_batch` texts are queued.
+It runs the model once per batch and hands each caller its labels. Many
+small concurrent requests therefore share model calls instead of queueing
+for one each.
+
+Clients only need this module and the standard library, so scraping and
+scoring can ask for sentiment without importing torch. SentimentClient is
+called like the transformers pipeline, so it can be passed as the
+`classifier` of sentiment.classify_texts.
+"""
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_SOCKET = os.environ.get('SENTIMENT_SOCKET', '.sentiment.sock')
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT = 0.01  # Seconds the first queued text waits for company
+LATENCY_WINDOW = 1000  # Requests the latency percentiles are taken over
+
+
+def percentile_ms(sorted_seconds, p):
+    if not sorted_seconds:
+        return None
+    return round(1000 * sorted_seconds[min(len(sorted_seconds) - 1, len(sorted_seconds) * p // 100)], 2)
+
+
+class MicroBatcher:
+    """Queue of texts classified in batches by one worker thread."""
+
+    def __init__(self, classifier, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._started = time.monotonic()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.model_seconds = 0.0
+        self.errors = 0
+        self._worker = threading.Thread(target=self._run, name='sentiment-batcher', daemon=True)
+        self._worker.start()
+
+    def classify(self, texts):
+        """Labels of texts, blocking until every one has been through the model."""
+        start = time.monotonic()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        labels = [future.result() for future in futures]
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(time.monotonic() - start)
+        return labels
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            start = time.monotonic()
+            try:
+                results = self.classifier(texts, batch_size=len(texts), truncation=True, max_length=512)
+                labels = {text: result['label'].lower() for text, result in zip(texts, results)}
+            except Exception as e:
+                print(f"Error analyzing sentiment: {e}")
+                labels = {}
+                with self._lock:
+                    self.errors += 1
+            with self._lock:
+                self.batches += 1
+                self.texts += len(batch)
+                self.model_seconds += time.monotonic() - start
+            for text, future in batch:
+                future.set_result(labels.get(text))
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.monotonic() - self._started
+            return {'queue_depth': self._queue.qsize(), 'requests': self.requests, 'texts': self.texts,
+                    'batches': self.batches, 'errors': self.errors,
+                    'mean_batch_size': round(self.texts / self.batches, 2) if self.batches else None,
+                    'latency_ms': {f"p{p}": percentile_ms(latencies, p) for p in (50, 95, 99)},
+                    'model_utilization': round(self.model_seconds / uptime, 3) if uptime else 0.0,
+                    'uptime_s': round(uptime, 1)}
+
+
+class SentimentRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'classify':
+                    reply = {'labels': self.server.batcher.classify(list(request['texts']))}
+                elif op == 'metrics':
+                    reply = self.server.batcher.metrics()
+                elif op == 'ping':
+                    reply = {'ok': True}
+                else:
+                    reply = {'error': f"unknown op {op!r}"}
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'error': f"bad request: {e}"}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class SentimentService(socketserver.ThreadingUnixStreamServer):
+    """The socket server; `classifier` is anything called like the transformers pipeline."""
+
+    daemon_threads = True
+
+    def __init__(self, classifier, path=DEFAULT_SOCKET, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        if os.path.exists(path):
+            if connect(path) is not None:
+                raise RuntimeError(f"A sentiment service is already listening on {path}")
+            os.remove(path)  # Left behind by a service that died
+        self.path = path
+        self.batcher = MicroBatcher(classifier, max_batch, max_wait)
+        super().__init__(path, SentimentRequestHandler)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='sentiment-service', daemon=True).start()
+        return self
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SentimentClient:
+    """Connection to a running service, usable as sentiment.classify_texts' classifier."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=None):
+        self.path = path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+
+    def _call(self, request):
+        with self._lock:
+            self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError(f"Sentiment service on {self.path} closed the connection")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    def classify(self, texts):
+        return self._call({'op': 'classify', 'texts': list(texts)})['labels']
+
+    def metrics(self):
+        return self._call({'op': 'metrics'})
+
+    def __call__(self, texts, **kwargs):
+        labels = self.classify(texts)
+        if None in labels:
+            raise RuntimeError("Sentiment service failed on part of the batch")
+        return [{'label': label} for label in labels]
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def connect(path=DEFAULT_SOCKET, timeout=None):
+    """A client for the service on path, or None if none is running."""
+    if not os.path.exists(path):
+        return None
+    try:
+        client = SentimentClient(path, timeout)
+    except OSError:
+        return None
+    try:
+        client._call({'op': 'ping'})
+    except (OSError, ValueError):
+        client.close()
+        return None
+    return client
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve sentiment classification over a local socket")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument('--backend', help="Sentiment backend (see sentiment.BACKENDS)")
+    parser.add_argument('--threads', type=int, help="Cores to pin the model to")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT * 1000)
+    parser.add_argument('--metrics', action='store_true', help="Print a running service's metrics and exit")
+    args = parser.parse_args()
+
+    if args.metrics:
+        client = connect(args.socket)
+        if client is None:
+            raise SystemExit(f"No sentiment service on {args.socket}")
+        print(json.dumps(client.metrics(), indent=2))
+    else:
+        import sentiment
+        classifier = sentiment.load_classifier(backend=args.backend or sentiment.DEFAULT_BACKEND,
+                                               threads=args.threads or sentiment.DEFAULT_THREADS)
+        service = SentimentService(classifier, args.socket, args.max_batch, args.max_wait_ms / 1000)
+        print(f"Sentiment service listening on {args.socket}")
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.server_close()
@@ -0,0 +1,171 @@
+"""Typed columnar snapshots: one .npy file per column plus a JSON schema.
+
+A snapshot is a directory next to the CSV it mirrors (Auto.csv -> Auto.snapshot/):
+
+    schema.json     {"version": 1, "rows": 42, "source": {...},
+                     "columns": [{"name": "Current Price", "dtype": "float64", "file": "c003.npy"}, ...]}
+    c000.npy ...    one array per column; text columns are fixed-width unicode
+    c000.null.npy   missing-value mask, only for text columns that have gaps
+
+Numbers are parsed once, when the snapshot is written; readers memory-map the
+arrays and load only the columns they ask for. The CSV stays the
+human-readable export: "source" records its size and mtime, and a snapshot
+whose CSV was changed since (e.g. edited by hand) is no longer used.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_FILE = 'schema.json'
+SCHEMA_VERSION = 1
+
+_NUMERIC_DTYPES = {'float64', 'int64', 'bool'}
+
+
+def snapshot_path(csv_path):
+    """Directory holding the snapshot of a CSV file."""
+    return os.path.splitext(csv_path)[0] + '.snapshot'
+
+
+def source_stamp(csv_path):
+    """Size and mtime of a file, used to tell whether data derived from it is stale."""
+    if csv_path is None or not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    return {'file': os.path.basename(csv_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def write_snapshot(frame, path, source_csv=None):
+    """Write a frame as a snapshot directory, replacing any previous one.
+
+    `source_csv` is the CSV export written from the same frame; pass it after
+    writing the CSV so readers can tell whether the two are still in sync.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, name in enumerate(frame.columns):
+        values = frame[name]
+        entry = {'name': str(name), 'file': f"c{i:03d}.npy"}
+        if str(values.dtype) in _NUMERIC_DTYPES:
+            entry['dtype'] = str(values.dtype)
+            array = values.to_numpy()
+        elif values.dtype == 'object':
+            entry['dtype'] = 'str'
+            missing = values.isna().to_numpy()
+            array = np.array(['' if m else str(v) for v, m in zip(values.to_numpy(), missing)], dtype=str)
+            if missing.any():
+                entry['nulls'] = f"c{i:03d}.null.npy"
+                np.save(os.path.join(tmp_path, entry['nulls']), missing)
+        else:
+            raise ValueError(f"Column {name!r}: unsupported dtype {values.dtype}")
+        np.save(os.path.join(tmp_path, entry['file']), array)
+        columns.append(entry)
+
+    schema = {'version': SCHEMA_VERSION, 'rows': len(frame), 'source': source_stamp(source_csv), 'columns': columns}
+    with open(os.path.join(tmp_path, SCHEMA_FILE), 'w') as f:
+        json.dump(schema, f, indent=2)
+
+    replace_directory(tmp_path, path)
+
+
+def replace_directory(tmp_path, path):
+    """Swap a fully written directory into place so readers never see half of it."""
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE), 'r') as f:
+        schema = json.load(f)
+    if schema.get('version') != SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot version {schema.get('version')}")
+    return schema
+
+
+def is_current(csv_path):
+    """True if the CSV has a snapshot and the CSV was not modified after it was written."""
+    path = snapshot_path(csv_path)
+    if not os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        return False
+    try:
+        source = read_schema(path).get('source')
+    except (OSError, ValueError):
+        return False
+    stamp = source_stamp(csv_path)
+    return stamp is None or (source is not None and
+                             (source['size'], source['mtime_ns']) == (stamp['size'], stamp['mtime_ns']))
+
+
+def load_columns(path, columns=None, mmap=True):
+    """Return {name: array} for the requested columns (all by default).
+
+    Numeric arrays are memory-mapped read-only. Text columns come back as
+    object arrays with NaN for missing values, as pandas would read them.
+    """
+    schema = read_schema(path)
+    entries = {entry['name']: entry for entry in schema['columns']}
+    names = list(entries) if columns is None else list(columns)
+    missing = [name for name in names if name not in entries]
+    if missing:
+        raise KeyError(f"{path}: no column(s) {missing}")
+
+    arrays = {}
+    for name in names:
+        entry = entries[name]
+        array = np.load(os.path.join(path, entry['file']), mmap_mode='r' if mmap else None)
+        if entry['dtype'] == 'str':
+            array = array.astype(object)
+            if 'nulls' in entry:
+                array[np.load(os.path.join(path, entry['nulls']))] = np.nan
+        arrays[name] = array
+    return arrays
+
+
+def read_snapshot(path, columns=None, mmap=True):
+    """Load a snapshot (or some of its columns) as a DataFrame."""
+    arrays = load_columns(path, columns, mmap=mmap)
+    # Copy so callers may assign to the frame; the read itself was still zero-parse
+    return pd.DataFrame({name: np.array(array) for name, array in arrays.items()})
+
+
+def export_csv(path, csv_path=None):
+    """Write a snapshot back out as CSV for humans; returns the CSV path."""
+    csv_path = csv_path or os.path.splitext(path)[0] + '.csv'
+    read_snapshot(path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def read_frame(csv_path, columns=None):
+    """Read a pipeline table from its snapshot when current, else from the CSV."""
+    if is_current(csv_path):
+        return read_snapshot(snapshot_path(csv_path), columns)
+    return pd.read_csv(csv_path, usecols=columns)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or export typed snapshots")
+    parser.add_argument('snapshots', nargs='+', help="Snapshot directories (e.g. Auto.snapshot)")
+    parser.add_argument('--export', action='store_true', help="Write each snapshot back to its CSV")
+    args = parser.parse_args()
+
+    for path in args.snapshots:
+        if args.export:
+            print(f"Exported {path} to {export_csv(path)}")
+        else:
+            schema = read_schema(path)
+            print(f"{path}: {schema['rows']} rows")
+            for entry in schema['columns']:
+                print(f"  {entry['name']:<32}{entry['dtype']}")
@@ -1,21 +1,11 @@
-import subprocess
-import time
+from pipeline import Pipeline
+from scheduler import RefreshScheduler
 
-while True:
-    print("Running scripts...")
 
-
-    subprocess.run(["python", "data_update.py"])
-
-   # subprocess.run(["python", "news.py"])
-
-
-    
-    subprocess.run(["python", "preprocess.py"])
-    subprocess.run(["python", "Scoring and Ranking.py"])
-
-
-    
-
-    print("Waiting for 5 seconds...\n")
-    time.sleep(5)  # Wait for 5 seconds before running again
+if __name__ == "__main__":
+    # One long-lived process: modules and connection pools are set up once
+    pipeline = Pipeline()
+    try:
+        RefreshScheduler(pipeline.run_once).run_forever()
+    finally:
+        pipeline.close()
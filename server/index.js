@@ -1,9 +1,9 @@
 const express = require('express');
 const cors = require('cors');
-const { exec } = require('child_process');
 const path = require('path');
 const fs = require('fs');
 const cookieParser = require('cookie-parser');
+const { BasketWorker, ALLOCATION_MODES } = require('./basketWorker');
 
 const app = express();
 
@@ -38,6 +38,10 @@ const users = {
 // Track generation attempts
 let generationCounter = 0;
 
+// Resident Python worker that keeps the ranked universe in memory
+const basketWorker = new BasketWorker();
+basketWorker.start();
+
 // Enhanced login endpoint
 app.post('/login', (req, res) => {
   const { email, password } = req.body;
@@ -98,7 +102,7 @@ const authenticate = (req, res, next) => {
 // Atomic file operations
 const atomicFileWrite = (filePath, data) => {
   return new Promise((resolve, reject) => {
-    const tempPath = filePath + '.tmp';
+    const tempPath = `${filePath}.${process.pid}.${Date.now()}.${Math.random().toString(36).slice(2)}.tmp`;
     fs.writeFile(tempPath, JSON.stringify(data), (err) => {
       if (err) return reject(err);
       fs.rename(tempPath, filePath, (err) => {
@@ -111,7 +115,7 @@ const atomicFileWrite = (filePath, data) => {
 
 // Enhanced generate endpoint
 app.post('/generate', authenticate, async (req, res) => {
-  const { investment, risk } = req.body;
+  const { investment, risk, mode = 'greedy' } = req.body;
   const forceNew = req.query.force_new === 'true' || req.headers['x-force-generation'] === 'true';
 
   // Validate input
@@ -130,11 +134,16 @@ app.post('/generate', authenticate, async (req, res) => {
     });
   }
 
+  if (!ALLOCATION_MODES.includes(mode)) {
+    return res.status(400).json({
+      error: 'Invalid mode',
+      validOptions: ALLOCATION_MODES
+    });
+  }
+
   console.log(`Starting generation for ₹${investmentAmount} with ${risk} risk (forceNew: ${forceNew})`);
 
   try {
-    const pythonScript = path.join(__dirname, 'basket_generator.py');
-    const outputFile = path.join(__dirname, `baskets_${Date.now()}.json`);
     const finalFile = path.join(__dirname, 'baskets.json');
     
     // Clear previous baskets if forceNew is true
@@ -147,30 +156,8 @@ app.post('/generate', authenticate, async (req, res) => {
       }
     }
 
-    const command = `python ${pythonScript} ${investmentAmount} ${risk} ${outputFile}`;
-    
-    console.log(`Executing: ${command}`);
-
-    // Execute Python script
-    const { stdout, stderr } = await new Promise((resolve, reject) => {
-      exec(command, (error, stdout, stderr) => {
-        if (error) {
-          console.error('Generation failed:', {
-            errorCode: error.code,
-            signal: error.signal,
-            stderr: stderr.trim()
-          });
-          return reject(new Error(stderr.trim() || 'Basket generation failed'));
-        }
-        resolve({ stdout, stderr });
-      });
-    });
-
-    console.log('Python script output:', stdout.trim());
-
-    // Verify and process the generated file
-    const data = await fs.promises.readFile(outputFile, 'utf8');
-    const baskets = JSON.parse(data);
+    // Ask the resident worker; results come back directly, not via a file
+    const baskets = await basketWorker.generate(investmentAmount, risk, mode);
 
     // Validate the generated data
     if (!Array.isArray(baskets)) {
@@ -184,13 +171,10 @@ app.post('/generate', authenticate, async (req, res) => {
       timestamp: new Date().toISOString()
     }));
 
-    // Atomic write to final file
+    // Atomic write to final file (kept for GET /baskets)
     await atomicFileWrite(finalFile, enhancedBaskets);
 
     console.log(`Successfully generated ${enhancedBaskets.length} baskets (GenID: ${generationCounter})`);
-    
-    // Clean up temp file
-    fs.unlink(outputFile, () => {});
 
     res.json({
       baskets: enhancedBaskets,
@@ -0,0 +1,245 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+# Annualized portfolio volatility each risk level aims for
+RISK_TARGET_VOLS = {'low': 0.12, 'medium': 0.18, 'high': 0.25}
+
+MIN_OBSERVATIONS = 60  # Daily returns an asset needs before it is optimized
+SHRINKAGE = 0.1        # Pull of the sample covariance towards its diagonal
+
+
+def returns_from_closes(closes: np.ndarray) -> np.ndarray:
+    """Simple daily returns of a (days x assets) close matrix; NaN where either close is missing"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[1:] / closes[:-1] - 1.0
+
+
+def estimate_moments(returns: np.ndarray, shrinkage: float = SHRINKAGE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Annualized mean returns and covariance from returns with gaps.
+
+    Each pair of assets uses the days both have a return (pairwise-complete
+    covariance, one masked matrix product). The result is shrunk towards its
+    diagonal, which keeps it positive definite for short or ragged histories.
+    Returns (mean, covariance, observations per asset).
+    """
+    valid = ~np.isnan(returns)
+    observations = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+    mean = filled.sum(axis=0) / np.maximum(observations, 1)
+
+    centered = np.where(valid, returns - mean, 0.0)
+    mask = valid.astype(float)
+    pair_counts = mask.T @ mask
+    covariance = (centered.T @ centered) / np.maximum(pair_counts - 1, 1)
+
+    diagonal = np.diag(np.diag(covariance))
+    covariance = (1 - shrinkage) * covariance + shrinkage * diagonal
+    # Symmetrize and lift the smallest eigenvalues in case pairwise estimates broke definiteness
+    covariance = (covariance + covariance.T) / 2
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    floor = 1e-10 * max(eigenvalues.max(initial=0.0), 1e-12)
+    if eigenvalues.min(initial=floor) < floor:
+        covariance = (eigenvectors * np.maximum(eigenvalues, floor)) @ eigenvectors.T
+    return mean * TRADING_DAYS, covariance * TRADING_DAYS, observations
+
+
+def project_capped_simplex(v: np.ndarray, cap: float = 1.0, iterations: int = 30) -> np.ndarray:
+    """Euclidean projection of each column of v onto {w : sum(w) = 1, 0 <= w <= cap}.
+
+    The answer is clip(v - tau, 0, cap) for a per-column shift tau. A short
+    bisection, run on every column at once, finds which entries are free,
+    clipped at 0 or at the cap; tau then follows exactly from that split.
+    """
+    v = v[:, None] if v.ndim == 1 else v
+    n = v.shape[0]
+    cap = max(cap, 1.0 / n)
+    low = v.min(axis=0) - cap
+    high = v.max(axis=0)
+    for _ in range(iterations):
+        tau = (low + high) / 2
+        too_much = np.clip(v - tau, 0.0, cap).sum(axis=0) > 1.0
+        low = np.where(too_much, tau, low)
+        high = np.where(too_much, high, tau)
+    tau = (low + high) / 2
+
+    shifted = v - tau
+    free = (shifted > 0) & (shifted < cap)
+    free_count = free.sum(axis=0)
+    exact = (np.where(free, v, 0.0).sum(axis=0) + cap * (shifted >= cap).sum(axis=0) - 1.0) / np.maximum(free_count, 1)
+    tau = np.where(free_count > 0, exact, tau)
+    return np.clip(v - tau, 0.0, cap)
+
+
+def _mean_variance_active_set(mean: np.ndarray, covariance: np.ndarray, aversion: float, cap: float,
+                              start: np.ndarray, max_iterations: Optional[int] = None) -> np.ndarray:
+    """Long-only weights maximizing mean'w - a/2 w'Cw with sum(w) = 1 and w <= cap.
+
+    Primal active-set method: the assets sitting at 0 or at the cap are held
+    fixed while the free ones solve a small equality-constrained system;
+    blocking bounds are added and bounds with the wrong multiplier sign are
+    released. Optimal portfolios hold few assets, so each system is tiny
+    and a warm start from a nearby aversion needs only a few iterations.
+    """
+    n = len(mean)
+    cap = max(cap, 1.0 / n)
+    w = start.astype(float).copy()
+    tolerance = 1e-12
+    at_lower = w <= tolerance
+    at_upper = w >= cap - tolerance
+    w[at_lower], w[at_upper] = 0.0, cap
+
+    for _ in range(max_iterations or 4 * n + 20):
+        gradient = aversion * (covariance @ w) - mean
+        free = ~(at_lower | at_upper)
+        if not free.any():
+            # Release the bound that most wants to move; a lone free asset then gives nu
+            if at_lower.any():
+                candidates = np.flatnonzero(at_lower)
+                release = candidates[np.argmin(gradient[candidates])]
+                at_lower[release] = False
+            else:
+                candidates = np.flatnonzero(at_upper)
+                release = candidates[np.argmax(gradient[candidates])]
+                at_upper[release] = False
+            continue
+
+        index = np.flatnonzero(free)
+        k = len(index)
+        kkt = np.zeros((k + 1, k + 1))
+        kkt[:k, :k] = aversion * covariance[np.ix_(index, index)]
+        kkt[:k, k] = -1.0
+        kkt[k, :k] = 1.0
+        solution = np.linalg.solve(kkt, np.append(-gradient[index], 0.0))
+        step, nu = solution[:k], solution[k]
+
+        if np.abs(step).max() <= 1e-12:
+            # Multipliers of the bounds: lower needs g - nu >= 0, upper needs g - nu <= 0
+            lower_violation = np.where(at_lower, nu - gradient, 0.0)
+            upper_violation = np.where(at_upper, gradient - nu, 0.0)
+            worst_lower, worst_upper = lower_violation.argmax(), upper_violation.argmax()
+            if max(lower_violation[worst_lower], upper_violation[worst_upper]) <= 1e-12:
+                break
+            if lower_violation[worst_lower] >= upper_violation[worst_upper]:
+                at_lower[worst_lower] = False
+            else:
+                at_upper[worst_upper] = False
+            continue
+
+        # Longest step along `step` that stays within [0, cap]
+        current = w[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(step < 0, -current / step, np.where(step > 0, (cap - current) / step, np.inf))
+        blocking = ratios.argmin()
+        alpha = min(1.0, ratios[blocking])
+        w[index] = current + alpha * step
+        if alpha < 1.0:
+            blocked = index[blocking]
+            if step[blocking] < 0:
+                w[blocked], at_lower[blocked] = 0.0, True
+            else:
+                w[blocked], at_upper[blocked] = cap, True
+    return w
+
+
+def portfolio_volatility(weights: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+    """Annualized volatility of each weight column"""
+    return np.sqrt(np.einsum('ik,ij,jk->k', weights, covariance, weights))
+
+
+def max_return_weights(mean: np.ndarray, cap: float = 1.0) -> np.ndarray:
+    """The risk-neutral corner: fill the highest expected returns up to the cap"""
+    n = len(mean)
+    cap = max(cap, 1.0 / n)
+    weights = np.zeros(n)
+    order = np.argsort(-mean, kind='stable')
+    filled = np.minimum(cap, np.maximum(1.0 - cap * np.arange(n), 0.0))
+    weights[order] = filled
+    return weights
+
+
+def mean_variance_weights(mean: np.ndarray, covariance: np.ndarray, target_vol: float,
+                          cap: float = 1.0, steps: int = 20) -> np.ndarray:
+    """Highest-return long-only, fully invested weights whose volatility is at most target_vol.
+
+    If the risk-neutral corner already meets the target it is the answer.
+    Otherwise the risk aversion is bisected (on a log scale), each
+    active-set solve warm-started from the previous weights, keeping the least risk-averse
+    portfolio within the target. If even the most risk-averse one is above
+    the target, that portfolio is returned.
+    """
+    corner = max_return_weights(mean, cap)
+    if portfolio_volatility(corner[:, None], covariance)[0] <= target_vol:
+        return corner
+
+    scale = np.trace(covariance) / len(mean) + 1e-12
+    low, high = np.log(1e-2 / scale), np.log(1e5 / scale)
+    best = _mean_variance_active_set(mean, covariance, np.exp(high), cap, corner)
+    if portfolio_volatility(best[:, None], covariance)[0] > target_vol:
+        return best
+
+    current = best
+    for _ in range(steps):
+        middle = (low + high) / 2
+        current = _mean_variance_active_set(mean, covariance, np.exp(middle), cap, current)
+        if portfolio_volatility(current[:, None], covariance)[0] <= target_vol:
+            best, high = current, middle
+        else:
+            low = middle
+    return best
+
+
+def risk_parity_weights(covariance: np.ndarray, budgets: Optional[np.ndarray] = None,
+                        iterations: int = 1000, tolerance: float = 1e-10) -> np.ndarray:
+    """Long-only weights whose risk contributions w_i (Cw)_i are proportional to `budgets`.
+
+    Solves min 1/2 y'Cy - sum(b log y) with damped Jacobi sweeps of the
+    closed-form coordinate update (all coordinates at once), then normalizes.
+    """
+    n = covariance.shape[0]
+    b = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=float) / np.sum(budgets)
+    diagonal = np.diag(covariance)
+    y = 1.0 / np.sqrt(diagonal)
+    y *= np.sqrt(1.0 / (y @ covariance @ y))
+    for _ in range(iterations):
+        off_diagonal = covariance @ y - diagonal * y
+        update = (-off_diagonal + np.sqrt(off_diagonal ** 2 + 4 * diagonal * b)) / (2 * diagonal)
+        y_next = 0.5 * y + 0.5 * update
+        converged = np.abs(y_next - y).max() < tolerance * y.max()
+        y = y_next
+        if converged:
+            break
+    return y / y.sum()
+
+
+def target_weights(closes: np.ndarray, method: str, target_vol: float, cap: float = 1.0,
+                   min_observations: int = MIN_OBSERVATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Weights for the assets (columns) of a close matrix that have enough history.
+
+    Returns (weights, usable) where `usable` marks the columns that were
+    optimized; weights of the other columns are 0. Mean-variance weights are
+    fully invested; risk parity weights are scaled down when the portfolio's
+    volatility exceeds the target, leaving the rest uninvested.
+    """
+    returns = returns_from_closes(closes)
+    usable = (~np.isnan(returns)).sum(axis=0) >= min_observations
+    weights = np.zeros(closes.shape[1])
+    if usable.sum() == 0:
+        return weights, usable
+
+    mean, covariance, _ = estimate_moments(returns[:, usable])
+    if method == 'mean_variance':
+        chosen = mean_variance_weights(mean, covariance, target_vol, cap)
+    elif method == 'risk_parity':
+        chosen = risk_parity_weights(covariance)
+        if cap < 1.0:
+            chosen = project_capped_simplex(chosen, cap)[:, 0]
+        vol = portfolio_volatility(chosen[:, None], covariance)[0]
+        if vol > target_vol:
+            chosen = chosen * (target_vol / vol)
+    else:
+        raise ValueError(f"Unknown optimizer method: {method}")
+    weights[usable] = np.ravel(chosen)
+    return weights, usable
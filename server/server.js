@@ -4,8 +4,7 @@ const cors = require("cors");
 const bcrypt = require("bcrypt");
 const jwt = require("jsonwebtoken");
 const cookieParser = require("cookie-parser");
-const { exec } = require("child_process");
-const path = require("path");
+const { BasketWorker, ALLOCATION_MODES } = require("./basketWorker");
 require("dotenv").config();
 
 const app = express();
@@ -106,8 +105,11 @@ app.post("/logout", (req, res) => {
 });
 
 // ✅ Basket Generation Endpoint
+const basketWorker = new BasketWorker();
+basketWorker.start();
+
 app.post("/generate", authenticateToken, async (req, res) => {
-  const { investment, risk } = req.body;
+  const { investment, risk, mode = 'greedy' } = req.body;
 
   if (!investment || isNaN(investment)) {
     return res.status(400).json({ error: "Valid investment amount required" });
@@ -116,31 +118,17 @@ app.post("/generate", authenticateToken, async (req, res) => {
   if (!["low", "medium", "high"].includes(risk)) {
     return res.status(400).json({ error: "Invalid risk level" });
   }
+  if (!ALLOCATION_MODES.includes(mode)) {
+    return res.status(400).json({ error: "Invalid mode" });
+  }
 
   try {
-    const pythonScriptPath = path.join(__dirname, "basket_generator.py");
-    
-    exec(`python ${pythonScriptPath} ${investment} ${risk}`, 
-      { cwd: __dirname },
-      (error, stdout, stderr) => {
-        if (error) {
-          console.error("Generation failed:", stderr);
-          return res.status(500).json({ error: "Basket generation failed" });
-        }
-
-        try {
-          const baskets = require("./baskets.json");
-          console.log("Generated baskets:", baskets.length);
-          res.json(baskets);
-        } catch (e) {
-          console.error("JSON read error:", e);
-          res.status(500).json({ error: "Failed to process results" });
-        }
-      }
-    );
+    const baskets = await basketWorker.generate(parseFloat(investment), risk, mode);
+    console.log("Generated baskets:", baskets.length);
+    res.json(baskets);
   } catch (err) {
-    console.error("Server error:", err);
-    res.status(500).json({ error: "Server error during generation" });
+    console.error("Generation failed:", err);
+    res.status(500).json({ error: "Basket generation failed" });
   }
 });
 
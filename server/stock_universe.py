@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import snapshot_store
+
+UNIVERSE_VERSION = 1
+
+# Parallel arrays, one entry per (theme, stock) row; rows of a theme are contiguous
+ARRAY_FIELDS = ['theme_id', 'symbol_id', 'name_id', 'price', 'rank', 'low', 'high']
+
+
+class SymbolTable:
+    """Interned strings: every distinct value is stored once and referred to by id"""
+
+    def __init__(self, values=()):
+        self.values: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def intern_all(self, values) -> np.ndarray:
+        return np.fromiter((self.intern(v) for v in values), dtype=np.int32, count=len(values))
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[index]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class Universe:
+    """Ranked stocks of every theme as parallel NumPy arrays plus symbol and name tables.
+
+    Basket generation works on row indices: per theme it keeps the rows with
+    rank <= max_rank sorted by rank ('eligible') and a rank -> rows map. Full
+    stock dicts are only built by record() for stocks that end up in a basket.
+    `as_of` is the day (ordinal) a historical universe describes, None for today.
+    A compiled universe can be saved and reopened memory-mapped, so loading
+    does not parse or copy the arrays.
+    """
+
+    def __init__(self, themes: List[str], arrays: Dict[str, np.ndarray], symbols: SymbolTable,
+                 names: SymbolTable, integer_ranks: List[bool], max_rank: float, sources=None,
+                 as_of: Optional[int] = None):
+        self.themes = list(themes)
+        self.theme_ids = {theme: i for i, theme in enumerate(self.themes)}
+        for field in ARRAY_FIELDS:
+            setattr(self, field, arrays[field])
+        self.symbols = symbols
+        self.names = names
+        self.integer_ranks = list(integer_ranks)
+        self.max_rank = max_rank
+        self.sources = sources
+        self.as_of = as_of
+        self._build_index()
+
+    @classmethod
+    def from_columns(cls, theme_columns: Dict[str, dict], max_rank: float, sources=None) -> 'Universe':
+        """Build from {theme: {'symbol', 'name', 'price', 'rank', 'low', 'high', 'integer_ranks'}}"""
+        symbols, names = SymbolTable(), SymbolTable()
+        parts = {field: [] for field in ARRAY_FIELDS}
+        integer_ranks = []
+        for theme_id, columns in enumerate(theme_columns.values()):
+            rows = len(columns['symbol'])
+            parts['theme_id'].append(np.full(rows, theme_id, dtype=np.int32))
+            parts['symbol_id'].append(symbols.intern_all(columns['symbol']))
+            parts['name_id'].append(names.intern_all(columns['name']))
+            for field in ('price', 'rank', 'low', 'high'):
+                parts[field].append(np.asarray(columns[field], dtype=np.float64))
+            integer_ranks.append(bool(columns.get('integer_ranks', False)))
+        arrays = {
+            field: np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32 if field.endswith('_id') else np.float64)
+            for field, chunks in parts.items()
+        }
+        return cls(list(theme_columns), arrays, symbols, names, integer_ranks, max_rank, sources)
+
+    def _build_index(self):
+        bounds = np.searchsorted(self.theme_id, np.arange(len(self.themes) + 1))
+        self.bounds = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        self.eligible: List[List[int]] = []
+        self.by_rank: List[Dict[float, List[int]]] = []
+        for start, stop in self.bounds:
+            ranks = self.rank[start:stop]
+            rows = np.flatnonzero(ranks <= self.max_rank)
+            rows = rows[np.argsort(ranks[rows], kind='stable')] + start
+            eligible = rows.tolist()
+            by_rank: Dict[float, List[int]] = {}
+            for row in eligible:
+                by_rank.setdefault(self.rank[row].item(), []).append(row)
+            self.eligible.append(eligible)
+            self.by_rank.append(by_rank)
+
+    def theme_size(self, theme_id: int) -> int:
+        start, stop = self.bounds[theme_id]
+        return stop - start
+
+    def __len__(self) -> int:
+        return len(self.theme_id)
+
+    def record(self, row: int) -> dict:
+        """The stock dict baskets carry, as load_stocks_from_csv used to build it"""
+        theme_id = int(self.theme_id[row])
+        price = self.price[row].item()
+        rank = self.rank[row].item()
+        return {
+            'symbol': self.symbols[self.symbol_id[row]],
+            'name': self.names[self.name_id[row]],
+            'price': price,
+            'rank': int(rank) if self.integer_ranks[theme_id] else rank,
+            'theme': self.themes[theme_id],
+            '52_week_low': self.low[row].item(),
+            '52_week_high': self.high[row].item(),
+            'current_price': price
+        }
+
+    def save(self, path: str):
+        """Write the compiled universe as a directory of .npy arrays and a JSON header"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for field in ARRAY_FIELDS:
+            np.save(os.path.join(tmp_path, f"{field}.npy"), np.asarray(getattr(self, field)))
+        for field, table in (('symbols', self.symbols), ('names', self.names)):
+            np.save(os.path.join(tmp_path, f"{field}.npy"), np.array(table.values, dtype=str))
+        meta = {
+            'version': UNIVERSE_VERSION,
+            'themes': self.themes,
+            'integer_ranks': self.integer_ranks,
+            'sources': self.sources,
+        }
+        with open(os.path.join(tmp_path, 'universe.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        snapshot_store.replace_directory(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str, max_rank: float) -> 'Universe':
+        """Reopen a saved universe with its arrays memory-mapped read-only"""
+        with open(os.path.join(path, 'universe.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != UNIVERSE_VERSION:
+            raise ValueError(f"{path}: unsupported universe version {meta.get('version')}")
+        arrays = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r') for field in ARRAY_FIELDS}
+        symbols, names = (SymbolTable(np.load(os.path.join(path, f"{field}.npy")).tolist())
+                          for field in ('symbols', 'names'))
+        return cls(meta['themes'], arrays, symbols, names, meta['integer_ranks'], max_rank, meta.get('sources'))
+
+
+def theme_sources(theme_files: List[str]) -> List[Optional[dict]]:
+    """Stamps of the theme files a universe was built from"""
+    return [snapshot_store.source_stamp(path) for path in theme_files]